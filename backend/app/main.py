@@ -7,6 +7,7 @@ TIBR Backend - Main FastAPI Application
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timedelta
+from typing import List
 import random
 
 app = FastAPI(title="TIBR API", version="2.0")
@@ -111,29 +112,23 @@ def get_bot(bot_id: str):
     return {"error": "Bot not found"}
 
 @app.post("/api/backtest/run")
-def run_backtest(start_date: str = "2024-01-01", initial_capital: float = 100000, market: str = "saudi"):
+def run_backtest(start_date: str = "2024-01-01", initial_capital: float = 100000, market: str = "saudi",
+                 parallel: bool = False, profile: bool = False):
     """
     ⚠️ محاكاة آلة الزمن - بيانات حقيقية 100% من Yahoo Finance
+    
+    parallel: توزيع الروبوتات على عدة أنوية
+    profile: تشغيل المحاكاة تحت cProfile (بدون الكاش) وإرجاع التقرير تحت profile
+    
+    أزمنة المراحل والعدادات في النتيجة تحت timings
+    
+    النتائج تُخزن حسب (السوق، تاريخ البداية، رأس المال، إصدار المحرك، بصمة البيانات، اليوم)
+    فتكرار نفس الطلب يعود فوراً دون إعادة المحاكاة
     """
-    from app.services.backtest_engine import BacktestEngine
+    from app.services.backtest_jobs import run_cached_backtest
     
     try:
-        # إنشاء محرك الباك تيست مع تحديد نوع السوق
-        engine = BacktestEngine(start_date=start_date, initial_capital=initial_capital, market_type=market)
-        
-        # تشغيل المحاكاة
-        results = engine.run()
-        results["market_type"] = market
-        
-        # إضافة معلومات مصدر البيانات
-        results["data_source"] = {
-            "provider": "Yahoo Finance",
-            "type": "real_historical_data",
-            "disclaimer": "⚠️ تحذير: النتائج التاريخية لا تضمن الأداء المستقبلي. استثمر بحكمة.",
-            "stocks_used": getattr(engine, 'available_stocks', [])
-        }
-        
-        return results
+        return run_cached_backtest(start_date, initial_capital, market, parallel=parallel, profile=profile)
         
     except Exception as e:
         return {
@@ -143,6 +138,90 @@ def run_backtest(start_date: str = "2024-01-01", initial_capital: float = 100000
         }
 
 
+@app.post("/api/backtest/batch")
+def run_backtest_batch(runs: List[dict], parallel: bool = False, summary_only: bool = False):
+    """
+    تشغيل عدة إعدادات محاكاة في طلب واحد (لشاشات مقارنة الاستراتيجيات)
+    
+    Body: قائمة إعدادات، كل إعداد:
+        {"start_date": "2024-01-01", "initial_capital": 100000, "market": "saudi",
+         "strategy_overrides": {"al_qannas": {"take_profit": 8.0, "stop_loss": -3.0, "max_days": 10}}}
+    
+    الأسعار والمؤشرات تُحمّل مرة واحدة لكل سوق
+    parallel: توزيع التشغيلات على مجمع العمليات المشترك (حتى MAX_BATCH_WORKERS عملية للطلب)
+    summary_only: حذف تفاصيل الصفقات من النتائج
+    """
+    from app.services.backtest_batch import run_batch
+    
+    try:
+        outputs = run_batch(runs, parallel=parallel, summary_only=summary_only)
+        return {"success": True, "data": outputs, "count": len(outputs)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/api/backtest/sweep")
+def run_parameter_sweep(grids: dict, market: str = "saudi", top: int = 20, verify_top: int = 0):
+    """
+    مسح معاملات الخروج (take_profit / stop_loss / max_days) لكل روبوت
+    
+    Body: {"al_qannas": {"take_profit": [4, 6, 8], "stop_loss": [-2, -3], "max_days": [5, 7, 10]}}
+    
+    يعيد جدولاً مرتباً لكل روبوت حسب العائد المركب التقريبي
+    verify_top: تأكيد أفضل N تركيبات لكل روبوت بمحاكاة كاملة
+    """
+    from app.services.parameter_sweep import run_sweep
+    
+    try:
+        return {"success": True, "data": run_sweep(market, grids, top=top, verify_top=min(verify_top, 5))}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/api/backtest/jobs")
+def create_backtest_job(start_date: str = "2024-01-01", initial_capital: float = 100000, market: str = "saudi",
+                        parallel: bool = False):
+    """
+    بدء محاكاة في الخلفية وإرجاع معرف المهمة فوراً
+    
+    التقدم والنتيجة عبر GET /api/backtest/jobs/{job_id}
+    """
+    from app.services.backtest_jobs import backtest_jobs
+    
+    job = backtest_jobs.submit(start_date, initial_capital, market, parallel=parallel)
+    return {"success": True, "data": job.to_dict(include_result=False)}
+
+
+@app.get("/api/backtest/jobs")
+def list_backtest_jobs():
+    from app.services.backtest_jobs import backtest_jobs
+    
+    jobs = backtest_jobs.list_jobs()
+    return {"data": jobs, "count": len(jobs)}
+
+
+@app.get("/api/backtest/jobs/{job_id}")
+def get_backtest_job(job_id: str):
+    """حالة المهمة وتقدمها (والنتيجة عند الاكتمال)"""
+    from app.services.backtest_jobs import backtest_jobs
+    
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        return {"success": False, "error": "المهمة غير موجودة"}
+    return {"success": True, "data": job.to_dict()}
+
+
+@app.delete("/api/backtest/jobs/{job_id}")
+def cancel_backtest_job(job_id: str):
+    """إلغاء مهمة محاكاة (في الانتظار أو أثناء التشغيل)"""
+    from app.services.backtest_jobs import backtest_jobs
+    
+    job = backtest_jobs.cancel(job_id)
+    if job is None:
+        return {"success": False, "error": "المهمة غير موجودة"}
+    return {"success": True, "data": job.to_dict(include_result=False)}
+
+
 @app.get("/api/news")
 def get_news():
     return {
@@ -266,28 +345,54 @@ def verify_trade(trade_data: dict):
 
 
 @app.post("/api/verify/trades")
-def verify_trades(bot_id: str = None, limit: int = 5):
+def verify_trades(bot_id: str = None, limit: int = 5, simulation_id: str = None,
+                  start_date: str = None, initial_capital: float = 100000, market: str = "saudi"):
     """
     التحقق من عدة صفقات من بيانات المحاكاة
     
+    يعيد استخدام محاكاة مخزنة بدلاً من تشغيل محاكاة جديدة في كل طلب:
+    1. simulation_id (من نتيجة /api/backtest/run)
+    2. أو المعاملات (start_date, initial_capital, market)
+    3. أو آخر محاكاة مكتملة
+    وتُشغل محاكاة جديدة فقط إذا لم يوجد شيء منها
+    
     Args:
         bot_id: معرف الروبوت (اختياري)
         limit: عدد الصفقات للتحقق
+        simulation_id: معرف محاكاة سابقة (اختياري)
     """
     from app.services.price_verifier import price_verifier
     from app.services.backtest_engine import BacktestEngine
+    from app.services.result_cache import backtest_cache
+    
+    simulation_results = None
+    if simulation_id:
+        simulation_results = backtest_cache.get(simulation_id)
+        if simulation_results is None:
+            return {"success": False, "error": "المحاكاة غير موجودة أو انتهت صلاحيتها"}
+    elif start_date:
+        simulation_results = backtest_cache.get(backtest_cache.make_key(
+            market, start_date, initial_capital,
+            BacktestEngine.ENGINE_VERSION, BacktestEngine.data_fingerprint(market)
+        ))
+    else:
+        simulation_results = backtest_cache.latest()
+    
+    if simulation_results is None:
+        # لا توجد محاكاة مخزنة - تشغيل واحدة (وتخزينها للطلبات التالية)
+        simulation_results = run_backtest(start_date=start_date or "2024-01-01",
+                                          initial_capital=initial_capital, market=market)
+        if simulation_results.get("error"):
+            return {"success": False, "error": simulation_results.get("message")}
     
-    # تشغيل محاكاة للحصول على الصفقات
-    engine = BacktestEngine(start_date="2024-01-01", initial_capital=100000)
-    simulation_results = engine.run()
+    # جمع الصفقات (التصفية حسب الروبوت قبل أي عمل)
+    portfolios = simulation_results.get('bot_portfolios', {})
+    if bot_id:
+        portfolios = {bot_id: portfolios[bot_id]} if bot_id in portfolios else {}
     
-    # جمع الصفقات
     all_trades = []
-    for portfolio in simulation_results.get('bot_portfolios', {}).values():
-        trades = portfolio.get('trades', [])
-        if bot_id and portfolio.get('bot_id') != bot_id:
-            continue
-        all_trades.extend(trades)
+    for portfolio in portfolios.values():
+        all_trades.extend(portfolio.get('trades', []))
     
     if not all_trades:
         return {"success": False, "error": "لا توجد صفقات للتحقق"}
@@ -295,7 +400,7 @@ def verify_trades(bot_id: str = None, limit: int = 5):
     # التحقق من الصفقات
     result = price_verifier.verify_multiple_trades(all_trades, limit=limit)
     
-    return {"success": True, "data": result}
+    return {"success": True, "data": {**result, "simulation_id": simulation_results.get("simulation_id")}}
 
 
 @app.get("/api/verify/stock/{symbol}")
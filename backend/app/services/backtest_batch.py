@@ -0,0 +1,212 @@
+"""
+محاكاة دفعية لعدة إعدادات
+=========================
+تشغيل قائمة إعدادات (تاريخ البداية، رأس المال، السوق، تعديلات الاستراتيجيات)
+على بيانات ومؤشرات وإشارات دخول محمّلة مرة واحدة لكل سوق، مع توزيع التشغيلات
+اختيارياً على مجمع عمليات مشترك يبقى طوال عمر الخادم.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+
+from app.services.backtest_jobs import attach_result_metadata, backtest_cache_key
+from app.services.market_data import market_data
+from app.services.result_cache import backtest_cache
+
+# الحد الأقصى لعدد الإعدادات في طلب واحد
+MAX_BATCH_RUNS = 50
+
+# حجم مجمع العمليات المشترك، وهو أيضاً أقصى عدد عمليات يشغلها طلب واحد
+# TIPR_BATCH_WORKERS: لتغيير الحجم
+MAX_BATCH_WORKERS = max(1, int(os.getenv("TIPR_BATCH_WORKERS", 4)))
+
+DEFAULT_RUN = {
+    "start_date": "2024-01-01",
+    "initial_capital": 100000,
+    "market": "saudi",
+    "strategy_overrides": {},
+}
+
+
+def normalize_run(run: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    تعبئة القيم الافتراضية والتحقق من إعداد واحد
+
+    Raises:
+        ValueError: مفتاح أو سوق أو تاريخ غير صالح
+    """
+    from app.services.backtest_engine import BacktestEngine
+
+    unknown = set(run) - set(DEFAULT_RUN)
+    if unknown:
+        raise ValueError(f"مفاتيح غير مدعومة: {sorted(unknown)}")
+
+    config = {**DEFAULT_RUN, **run}
+    if config["market"] not in BacktestEngine.MARKETS:
+        raise ValueError(f"سوق غير مدعوم: {config['market']}")
+    datetime.strptime(config["start_date"], "%Y-%m-%d")
+    config["initial_capital"] = float(config["initial_capital"])
+    BacktestEngine._validate_strategy_overrides(config["strategy_overrides"] or {})
+    return config
+
+
+def _summarize(results: Dict[str, Any]) -> Dict[str, Any]:
+    """النتيجة بدون تفاصيل الصفقات (لشاشات المقارنة)"""
+    return {key: value for key, value in results.items() if key != "bot_portfolios"}
+
+
+def run_batch(runs: List[Dict[str, Any]], parallel: bool = False, max_workers: Optional[int] = None,
+              summary_only: bool = False) -> List[Dict[str, Any]]:
+    """
+    تشغيل عدة إعدادات محاكاة
+
+    Args:
+        runs: قائمة إعدادات {start_date, initial_capital, market, strategy_overrides}
+        parallel: توزيع التشغيلات على مجمع العمليات المشترك
+        max_workers: أقصى عدد عمليات لهذا الطلب (افتراضياً وبحد أقصى MAX_BATCH_WORKERS)
+        summary_only: حذف تفاصيل الصفقات من النتائج
+
+    Returns:
+        نتيجة لكل إعداد بنفس الترتيب: {"config", "result"} أو {"config", "error", "message"}
+    """
+    if len(runs) > MAX_BATCH_RUNS:
+        raise ValueError(f"الحد الأقصى {MAX_BATCH_RUNS} إعداد في الطلب الواحد")
+
+    outputs: List[Optional[Dict[str, Any]]] = [None] * len(runs)
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+
+    for i, run in enumerate(runs):
+        try:
+            config = normalize_run(run)
+        except (ValueError, TypeError) as e:
+            outputs[i] = {"config": run, "error": True, "message": str(e)}
+            continue
+
+        cached = backtest_cache.get(_cache_key(config))
+        if cached is not None:
+            outputs[i] = {"config": config, "result": cached}
+        else:
+            pending.append((i, config))
+
+    if pending:
+        configs = [config for _, config in pending]
+        workers = min(max_workers or MAX_BATCH_WORKERS, MAX_BATCH_WORKERS, len(configs))
+        if parallel and workers > 1:
+            computed = _run_in_pool(configs, workers, not summary_only)
+        else:
+            computed = _run_batch_configs(configs, not summary_only)
+
+        for (i, config), (results, stocks_used, error) in zip(pending, computed):
+            if error:
+                outputs[i] = {"config": config, "error": True, "message": error}
+                continue
+
+            attach_result_metadata(results, config["market"], stocks_used)
+            outputs[i] = {"config": config, "result": results}
+
+            # الملخصات تُحسب بدون لقطات المؤشرات، فلا تُخزن مكان النتيجة الكاملة
+            if not summary_only:
+                key = _cache_key(config)
+                results["simulation_id"] = key
+                backtest_cache.put(key, results)
+
+    if summary_only:
+        for output in outputs:
+            if "result" in output:
+                output["result"] = _summarize(output["result"])
+
+    return outputs
+
+
+def _cache_key(config: Dict[str, Any]) -> str:
+    return backtest_cache_key(
+        config["market"], config["start_date"], config["initial_capital"],
+        strategy_overrides=config["strategy_overrides"] or None,
+    )
+
+
+# ============ Batch Workers ============
+
+# مجمع العمليات المشترك: يُنشأ عند أول طلب متوازٍ ويبقى طوال عمر الخادم، بعمليات
+# تبدأ بـ spawn (الخادم متعدد الخيوط، وfork من عملية فيها أقفال محجوزة قد يجمّد العملية الابنة)
+_pool = None
+_pool_lock = threading.Lock()
+
+# المحركات المرجعية لكل سوق داخل العملية (العاملة أو الخادم في الوضع المتتابع)
+_templates: Dict[str, Any] = {}
+
+
+def _batch_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            from app.services.backtest_engine import PARALLEL_START_METHOD
+
+            _pool = ProcessPoolExecutor(max_workers=MAX_BATCH_WORKERS,
+                                        mp_context=multiprocessing.get_context(PARALLEL_START_METHOD))
+        return _pool
+
+
+def _run_in_pool(configs: List[Dict[str, Any]], workers: int, include_indicators: bool) -> list:
+    """
+    توزيع الإعدادات على workers مجموعة في المجمع المشترك
+
+    كل مجموعة مهمة واحدة، فلا يشغل الطلب أكثر من workers عملية مهما كان عدد إعداداته
+    """
+    from concurrent.futures.process import BrokenProcessPool
+
+    global _pool
+    pool = _batch_pool()
+    shards = [configs[i::workers] for i in range(workers)]
+    try:
+        shard_results = [future.result() for future in
+                         [pool.submit(_run_batch_configs, shard, include_indicators) for shard in shards]]
+    except BrokenProcessPool:
+        # عملية عاملة انتهت فجأة: مجمع جديد للطلب التالي
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise
+
+    computed = [None] * len(configs)
+    for i, shard_result in enumerate(shard_results):
+        computed[i::workers] = shard_result
+    return computed
+
+
+def _template_for(config: Dict[str, Any]):
+    """
+    المحرك المرجعي لسوق الإعداد (الأسعار والمؤشرات وإشارات الدخول تُحسب مرة واحدة)
+
+    يُعاد بناؤه عندما يعيد سجل market_data مخزناً جديداً (تغيرت ملفات البيانات)
+    """
+    from app.services.backtest_engine import BacktestEngine
+
+    market = config["market"]
+    store = market_data.get(market, config["start_date"])
+    template = _templates.get(market)
+    if template is None or template.store is not store:
+        template = BacktestEngine(config["start_date"], config["initial_capital"], market, price_store=store)
+        _templates[market] = template
+    return template
+
+
+def _run_batch_configs(configs: List[Dict[str, Any]], include_indicators: bool = True) -> list:
+    """تشغيل مجموعة إعدادات بالترتيب على المحركات المرجعية لأسواقها"""
+    from app.services.backtest_engine import BacktestEngine
+
+    computed = []
+    for config in configs:
+        try:
+            engine = BacktestEngine(
+                config["start_date"], config["initial_capital"], config["market"],
+                strategy_overrides=config["strategy_overrides"], shared=_template_for(config),
+            )
+            computed.append((engine.run(include_indicators=include_indicators), engine.available_stocks, None))
+        except Exception as e:
+            computed.append((None, None, str(e)))
+    return computed
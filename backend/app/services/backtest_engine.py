@@ -13,13 +13,29 @@ TIBR Backtest Engine - محرك آلة الزمن
 """
 
 from datetime import datetime, timedelta
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field, fields
+from typing import Callable, Dict, List, Optional, Sequence, Union
 import random
+import threading
+import time
+
+import numpy as np
+
+from app.services.exit_resolver import resolve_exit
+from app.services.memory_budget import MemoryBudget
+from app.services.price_store import PriceStore, to_day_number
+from app.services.run_timings import RunTimings
+from app.services.trading_calendar import TradingCalendar
+
+# ============ Exceptions ============
+
+class BacktestCancelled(Exception):
+    """أُلغيت المحاكاة عبر cancel_event قبل اكتمالها"""
+
 
 # ============ Data Classes ============
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     """صفقة مفتوحة"""
     symbol: str
@@ -30,9 +46,11 @@ class Position:
     stop_loss: float    # سعر وقف الخسارة (-1.5%)
     reason_ar: str      # سبب الدخول
     bot_id: str
-    entry_indicators: dict = None  # المؤشرات الفنية وقت الدخول
+    entry_bar: Optional[int] = None  # فهرس شمعة الدخول (لقطة المؤشرات تُبنى منه عند التصدير)
+    exit_day_idx: Optional[int] = None  # يوم الخروج المحسوب مسبقاً (None = لم يُحدد بعد)
+    adds: List[list] = field(default_factory=list)  # التعزيزات: [يوم (منذ 1970-01-01)، الكمية، السعر]
 
-@dataclass 
+@dataclass(slots=True)
 class ClosedTrade:
     """صفقة مغلقة"""
     id: str
@@ -48,8 +66,10 @@ class ClosedTrade:
     result: str  # "win" or "loss"
     reason_ar: str
     exit_reason_ar: str
-    entry_indicators: dict = None  # المؤشرات الفنية وقت الدخول
-    exit_indicators: dict = None   # المؤشرات الفنية وقت الخروج
+    entry_bar: Optional[int] = None  # فهرس شمعة الدخول (None = بدون مؤشرات)
+    exit_bar: Optional[int] = None   # فهرس شمعة الخروج (None = بدون مؤشرات)
+    profit: float = 0.0              # الربح المحقق المضاف للرصيد
+    adds: List[list] = field(default_factory=list)  # تعزيزات الصفقة (انظر Position.adds)
 
 
 
@@ -127,6 +147,14 @@ class BacktestEngine:
         },
     }
     
+    # رقم إصدار منطق المحاكاة (يُرفع عند أي تغيير يغيّر النتائج أو صيغة نقاط الحفظ، يُستخدم في مفاتيح الكاش)
+    ENGINE_VERSION = "2.6"
+    
+    # مصادر البيانات المحلية (مسارات نسبية لمجلد التشغيل)
+    SEED_FILE = "backend/data/real_market_data.json"
+    CACHE_FILE_TEMPLATE = "data/cache_{market}.json"
+    BINARY_CACHE_TEMPLATE = "data/cache_{market}.npz"
+    
     # القيم الافتراضية
     DEFAULT_TAKE_PROFIT = 0.04
     DEFAULT_STOP_LOSS = -0.02
@@ -150,6 +178,16 @@ class BacktestEngine:
     
     SAUDI_STOCKS = MARKETS["saudi"] # Default fallback
     
+    # =============== وضع السوق الكبير (universe) ===============
+    # قائمة أسهم من ملف بدلاً من MARKETS، بأسعار ومؤشرات float32 وحد لحجم المصفوفات
+    universe: Optional[List[str]] = None
+    price_dtype = np.float64
+    LARGE_UNIVERSE_PRICE_DTYPE = np.float32
+    LARGE_UNIVERSE_MEMORY_BUDGET_MB = 1024
+    
+    # عدد الأسهم التي تُحسب مؤشراتها وإشاراتها معاً (مصفوفة أسهم × أيام لكل دفعة)
+    SYMBOL_CHUNK_SIZE = 64
+    
     BOTS = [
         {"id": "al_nami", "name_ar": "النامي", "emoji": "📈"},
         {"id": "al_qannas", "name_ar": "القناص", "emoji": "🎯"},
@@ -164,29 +202,247 @@ class BacktestEngine:
         {"id": "al_maestro", "name_ar": "المايسترو", "emoji": "🃏"},
     ]
     
-    def __init__(self, start_date: str, initial_capital: float, market_type: str = "saudi"):
+    def __init__(self, start_date: str, initial_capital: float, market_type: str = "saudi",
+                 price_store: Optional[PriceStore] = None, strategy_overrides: Optional[Dict[str, dict]] = None,
+                 shared: Optional["BacktestEngine"] = None, universe: Optional[Union[str, Sequence[str]]] = None,
+                 memory_budget_mb: Optional[float] = None):
+        """
+        Args:
+            price_store: مخزن أسعار جاهز (للقراءة فقط، مثل سجل market_data المشترك)
+                         بدلاً من تحميل الملفات في كل محرك
+            strategy_overrides: تعديل استراتيجيات الروبوتات {bot_id: {"take_profit": ..., "stop_loss": ..., "max_days": ...}}
+            shared: محرك لنفس السوق تُستخدم أسعاره ومؤشراته وإشارات دخوله كما هي
+                    (كلها للقراءة فقط ولا تعتمد على رأس المال أو الاستراتيجيات)
+            universe: وضع السوق الكبير - مسار ملف قائمة أسهم أو قائمة رموز (انظر load_universe)
+                      بدلاً من MARKETS؛ الأسعار والمؤشرات تُخزن float32
+            memory_budget_mb: حد حجم مصفوفات المحاكاة بالميغابايت (يُرفع MemoryBudgetExceeded عند تجاوزه)،
+                              افتراضياً LARGE_UNIVERSE_MEMORY_BUDGET_MB في وضع السوق الكبير وبدون حد غير ذلك
+        """
         self.start_date = datetime.strptime(start_date, "%Y-%m-%d")
         self.end_date = datetime.now()
         self.initial_capital = initial_capital
         self.market_type = market_type
+        self.strategy_overrides = self._validate_strategy_overrides(strategy_overrides or {})
         
         # اختيار قائمة الأسهم حسب السوق
-        self.stocks_list = self.MARKETS.get(market_type, self.MARKETS["saudi"])
+        if universe is not None:
+            self.universe = self.load_universe(universe)
+            self.stocks_list = self.universe
+            self.price_dtype = self.LARGE_UNIVERSE_PRICE_DTYPE
+            if memory_budget_mb is None:
+                memory_budget_mb = self.LARGE_UNIVERSE_MEMORY_BUDGET_MB
+        else:
+            self.stocks_list = self.MARKETS.get(market_type, self.MARKETS["saudi"])
         
         self.positions: Dict[str, Dict[str, Position]] = {bot["id"]: {} for bot in self.BOTS}
         self.closed_trades: Dict[str, List[ClosedTrade]] = {bot["id"]: [] for bot in self.BOTS}
         self.balances: Dict[str, float] = {bot["id"]: initial_capital for bot in self.BOTS}
-        self.equity_curves: Dict[str, List[float]] = {bot["id"]: [initial_capital] for bot in self.BOTS}
-        random.seed(42)
-        self.price_data = self._generate_price_data()
+        # منحنى الرصيد اليومي يُحسب من الصفقات عند نهاية المحاكاة (_daily_equity)
+        self.equity_curves: Dict[str, List[float]] = {bot["id"]: [] for bot in self.BOTS}
+        # مولد عشوائي خاص بكل محرك (المحركات تعمل متوازية في خيوط مدير المهام)
+        self._rng = random.Random(42)
+        
+        # أزمنة المراحل وعدادات العمليات (تُضاف للنتائج تحت timings)
+        self.timings = RunTimings()
+        self._counters = self.timings.counters
+        # أحجام المصفوفات الكبيرة مقابل ميزانية الذاكرة (تُضاف للنتائج تحت memory)
+        self.memory = MemoryBudget(memory_budget_mb)
+        
+        if shared is not None:
+            if shared.market_type != market_type:
+                raise ValueError(f"لا يمكن مشاركة بيانات سوق {shared.market_type} مع محرك سوق {market_type}")
+            self.store = shared.store
+            self.universe = shared.universe
+            self.stocks_list = shared.stocks_list
+            self.price_dtype = shared.price_dtype
+            self.memory.components.update(shared.memory.components)
+            self.available_stocks = shared.available_stocks
+            self.price_data = shared.price_data
+            self.indicators = shared.indicators
+            self.calendar = shared.calendar
+            self.entry_signals = shared.entry_signals
+            self._symbol_pos = shared._symbol_pos
+            self._bot_pos = shared._bot_pos
+            return
+        
+        # مخزن عمودي للأسعار، و price_data واجهة توافق بصفوف القواميس
+        if price_store is not None:
+            self.store = price_store if self.universe is None else price_store.subset(self.universe, self.price_dtype)
+            self.available_stocks = self.store.symbols
+        else:
+            with self.timings.phase("load_prices"):
+                self.store = self._load_price_store()
+        self._prepare_market_data()
+    
+    def _prepare_market_data(self):
+        """واجهة الصفوف والمؤشرات والتقويم وإشارات الدخول من مخزن الأسعار الحالي"""
+        self.price_data = self.store.as_records()
+        self.memory.reserve("prices", self.store.nbytes())
+        with self.timings.phase("calendar"):
+            # نفس ترتيب الأسهم في entry_signals و _symbol_pos
+            self.calendar = TradingCalendar.from_store(self.store)
+        self.memory.reserve("calendar", self.calendar.bar_index.nbytes)
+        self._reserve_simulation_arrays()
+        self.indicators, self.entry_signals = self._build_indicators_and_signals()
+    
+    def _reserve_simulation_arrays(self):
+        """حجز أحجام المصفوفات المشتقة من الأسعار قبل إنشائها (من عدد الأسهم والأيام)"""
+        from app.services.technical_indicators import INDICATOR_COLUMNS
+        
+        n_symbols = len(self.store)
+        max_bars = max((self.store.length(symbol) for symbol in self.store), default=0)
+        n_days = len(self.calendar)
+        itemsize = np.dtype(self.price_dtype).itemsize
+        chunk = min(self.SYMBOL_CHUNK_SIZE, n_symbols)
+        
+        # bb_position عمود int8 والباقي بنوع الأسعار
+        self.memory.reserve("indicators", n_symbols * max_bars * ((len(INDICATOR_COLUMNS) - 1) * itemsize + 1))
+        # أعمدة الدفعة الحالية بدقة float64 مع النسخ الوسيطة أثناء الحساب
+        self.memory.reserve("indicator_chunk", chunk * max_bars * len(INDICATOR_COLUMNS) * 8 * 3)
+        self.memory.reserve("entry_signals", len(self.BOTS) * n_symbols * max_bars)
+        # إغلاق الأسهم على التقويم (float64 لتطابق مقارنات الخروج مع الأسعار المقروءة)
+        self.memory.reserve("calendar_prices", n_symbols * n_days * 8)
+        # الرصيد اليومي: أسعار مملوءة + كميات وتكاليف المراكز لكل روبوت بدوره
+        self.memory.reserve("daily_equity", n_symbols * n_days * 8 * 4)
+    
+    @classmethod
+    def data_fingerprint(cls, market_type: str) -> str:
+        """
+        بصمة مصادر بيانات السوق (المسار + وقت التعديل + الحجم)
+        
+        تتغير عند تعديل ملف Seed أو ملف الكاش، فتُبطل أي نتائج مخزنة
+        """
+        import os
+        
+        parts = []
+        for path in (cls.SEED_FILE, cls.CACHE_FILE_TEMPLATE.format(market=market_type),
+                     cls.BINARY_CACHE_TEMPLATE.format(market=market_type)):
+            if os.path.exists(path):
+                stat = os.stat(path)
+                parts.append(f"{path}:{stat.st_mtime_ns}:{stat.st_size}")
+            else:
+                parts.append(f"{path}:missing")
+        return "|".join(parts)
     
     def _get_bot_strategy(self, bot_id: str) -> dict:
-        return self.BOT_STRATEGIES.get(bot_id, {
+        strategy = self.BOT_STRATEGIES.get(bot_id, {
             "take_profit": self.DEFAULT_TAKE_PROFIT,
             "stop_loss": self.DEFAULT_STOP_LOSS,
             "max_days": self.DEFAULT_MAX_DAYS,
             "description": "استراتيجية افتراضية"
         })
+        overrides = getattr(self, "strategy_overrides", None)
+        if overrides and bot_id in overrides:
+            strategy = {**strategy, **overrides[bot_id]}
+        return strategy
+    
+    # مفاتيح الاستراتيجية القابلة للتعديل من الطلبات
+    STRATEGY_OVERRIDE_KEYS = ("take_profit", "stop_loss", "max_days")
+    
+    @classmethod
+    def _validate_strategy_overrides(cls, overrides: Dict[str, dict]) -> Dict[str, dict]:
+        bot_ids = {bot["id"] for bot in cls.BOTS}
+        for bot_id, values in overrides.items():
+            if bot_id not in bot_ids:
+                raise ValueError(f"روبوت غير معروف: {bot_id}")
+            unknown = set(values) - set(cls.STRATEGY_OVERRIDE_KEYS)
+            if unknown:
+                raise ValueError(f"مفاتيح غير مدعومة لـ {bot_id}: {sorted(unknown)}")
+        return overrides
+    
+    @staticmethod
+    def load_universe(source: Union[str, Sequence[str]]) -> List[str]:
+        """
+        قائمة أسهم وضع السوق الكبير (بدون تكرار وبنفس الترتيب)
+        
+        Args:
+            source: قائمة رموز، أو مسار ملف:
+                    - .json: قائمة رموز
+                    - غير ذلك (نص/CSV): أول عمود في كل سطر، # للتعليقات، وسطر العنوان symbol يُتجاهل
+        
+        Raises:
+            ValueError: إذا كانت القائمة فارغة
+        """
+        import json
+        
+        if isinstance(source, str):
+            with open(source, "r", encoding="utf-8") as f:
+                if source.lower().endswith(".json"):
+                    symbols = json.load(f)
+                else:
+                    lines = (line.split("#", 1)[0] for line in f)
+                    symbols = [line.split(",", 1)[0] for line in lines]
+                    if symbols and symbols[0].strip().lower() in ("symbol", "ticker"):
+                        symbols = symbols[1:]
+        else:
+            symbols = source
+        
+        universe = list(dict.fromkeys(symbol.strip() for symbol in symbols if symbol.strip()))
+        if not universe:
+            raise ValueError(f"قائمة الأسهم فارغة: {source if isinstance(source, str) else 'list'}")
+        return universe
+    
+    @property
+    def cache_name(self) -> str:
+        """اسم ملفات الكاش: السوق، أو السوق + بصمة قائمة الأسهم في وضع السوق الكبير"""
+        if self.universe is None:
+            return self.market_type
+        import hashlib
+        
+        digest = hashlib.sha1("\n".join(self.universe).encode("utf-8")).hexdigest()[:10]
+        return f"{self.market_type}_universe_{digest}"
+    
+    @classmethod
+    def load_market_store(cls, market_type: str, start_date: str = "2024-01-01") -> PriceStore:
+        """
+        تحميل مخزن أسعار سوق بدون بناء محرك كامل (بدون مؤشرات أو إشارات)
+        
+        start_date يُستخدم فقط إذا لزم التحميل من الإنترنت
+        """
+        loader = cls.__new__(cls)
+        loader.start_date = datetime.strptime(start_date, "%Y-%m-%d")
+        loader.end_date = datetime.now()
+        loader.market_type = market_type
+        loader.stocks_list = cls.MARKETS.get(market_type, cls.MARKETS["saudi"])
+        return loader._load_price_store()
+    
+    def _load_price_store(self) -> PriceStore:
+        """
+        تحميل الأسعار كمخزن عمودي
+        
+        الكاش الثنائي (.npz) يُستخدم إذا كان أحدث من ملف Seed وكاش JSON،
+        وإلا تُحمّل البيانات بالطريقة العادية ثم يُكتب الكاش الثنائي للمرات القادمة
+        """
+        import os
+        
+        binary_cache = self.BINARY_CACHE_TEMPLATE.format(market=self.cache_name)
+        sources = [self.SEED_FILE, self.CACHE_FILE_TEMPLATE.format(market=self.cache_name)]
+        
+        if os.path.exists(binary_cache):
+            binary_mtime = os.path.getmtime(binary_cache)
+            if all(binary_mtime >= os.path.getmtime(path) for path in sources if os.path.exists(path)):
+                try:
+                    store = PriceStore.load_npz(binary_cache, self.price_dtype)
+                    if len(store):
+                        print(f"📂 تم تحميل بيانات {self.market_type} من الكاش الثنائي ({len(store)} سهم)")
+                        self.available_stocks = store.symbols
+                        return store
+                except Exception as e:
+                    print(f"⚠️ فشل قراءة الكاش الثنائي: {e}")
+        
+        store = PriceStore.from_records(self._generate_price_data(), self.price_dtype)
+        if self.universe is not None:
+            store = store.subset(self.universe)
+            self.available_stocks = store.symbols
+        
+        if len(store):
+            try:
+                os.makedirs(os.path.dirname(binary_cache), exist_ok=True)
+                store.save_npz(binary_cache)
+            except Exception as e:
+                print(f"⚠️ فشل حفظ الكاش الثنائي: {e}")
+        
+        return store
     
     def _generate_price_data(self) -> Dict[str, List[Dict]]:
         import yfinance as yf
@@ -195,14 +451,15 @@ class BacktestEngine:
         
         # التأكد من وجود مجلد البيانات
         os.makedirs("data", exist_ok=True)
-        cache_file = f"data/cache_{self.market_type}.json"
+        cache_file = self.CACHE_FILE_TEMPLATE.format(market=self.cache_name)
         
         price_data = {}
         
         # محاولة التحميل من ملف "المصدر الرسمي المحلي" (Seed Data)
-        seed_file = "backend/data/real_market_data.json"
+        # (يحتوي قوائم MARKETS فقط، فلا يُستخدم في وضع السوق الكبير)
+        seed_file = self.SEED_FILE
         
-        if os.path.exists(seed_file):
+        if self.universe is None and os.path.exists(seed_file):
             print(f"📂 جاري تحميل البيانات من الملف المركزي (Seed Data)...")
             try:
                 with open(seed_file, "r", encoding='utf-8') as f:
@@ -310,180 +567,252 @@ class BacktestEngine:
 
     def _generate_synthetic_data(self) -> Dict[str, List[Dict]]:
         """توليد بيانات سوق افتراضية واقعية للمحاكاة"""
-        import math
-        
-        synthetic_data = {}
-        days = (self.end_date - self.start_date).days
-        date_list = [self.start_date + timedelta(days=x) for x in range(days)]
+        from app.services.synthetic_market import MarketRegime, synthetic_records, trading_days
         
-        # Filter weekends (approximate)
-        full_dates = [d for d in date_list if d.weekday() < 5] # Sun-Thu for Saudi? Mon-Fri for US. Just 5 days.
+        # اتجاهات مختلفة لكل سهم (صاعد / صاعد بقوة / هابط قليلاً) مع قفزات سيولة
+        regimes = (
+            MarketRegime(drift=0.0005, volatility=0.013),
+            MarketRegime(drift=0.0008, volatility=0.013),
+            MarketRegime(drift=0.0000, volatility=0.013),
+        )
+        synthetic_data = synthetic_records(
+            self.stocks_list, days=trading_days(start=self.start_date, end=self.end_date),
+            regimes=regimes, regime_length=250, start_price=(20, 100), min_price=5,
+        )
         
-        for symbol in self.stocks_list:
-            data = []
-            price = random.uniform(20, 100)
-            trend_factor = random.choice([1.0002, 1.0005, 0.9998]) # Slight drift
-            
-            for d in full_dates:
-                # Random Walk with momentum
-                change = random.uniform(-0.02, 0.025) # Slightly bullish bias
-                price = price * (1 + change) * trend_factor
-                if price < 5: price = 5
-                
-                high = price * (1 + random.uniform(0, 0.015))
-                low = price * (1 - random.uniform(0, 0.015))
-                
-                # Volume with spikes
-                vol = random.randint(100000, 5000000)
-                if random.random() > 0.9: vol *= 3 # Volume spike
-                
-                data.append({
-                    "date": d,
-                    "open": round(price * (1 + random.uniform(-0.005, 0.005)), 2),
-                    "high": round(high, 2),
-                    "low": round(low, 2),
-                    "close": round(price, 2),
-                    "volume": int(vol)
-                })
-            
-            synthetic_data[symbol] = data
+        for symbol, data in synthetic_data.items():
             print(f"  🔄 {symbol}: تم توليد بيانات محاكاة ({len(data)} يوم)")
             
         return synthetic_data
     
-    def _get_price_on_date(self, symbol: str, date: datetime) -> Optional[float]:
-        if symbol not in self.price_data: return None
-        for day_data in self.price_data[symbol]:
-            if day_data["date"].date() == date.date():
-                return day_data["close"]
-        return None
-
-    def _generate_entry_signal(self, bot: dict, symbol: str, day_idx: int) -> Optional[dict]:
+    def _build_indicators_and_signals(self):
         """
-        توليد إشارة دخول ذكية ومحسنة جداً لتقليل الصفقات الخاسرة
+        المؤشرات الفنية وإشارات الدخول لكل الأسهم مرة واحدة عند التحميل، على دفعات من SYMBOL_CHUNK_SIZE سهم
+        
+        لكل دفعة: مصفوفة أسهم × أيام تُحسب مؤشراتها معاً بدقة float64 (المرشحات التكرارية
+        خطوة واحدة لكل يوم للدفعة كلها بدلاً من حلقة لكل سهم)، ثم أقنعة الدخول منها،
+        ثم تُنسخ الأعمدة في مصفوفات التخزين بنوع price_dtype
+        
+        Returns:
+            (indicators[symbol][name] قراءة O(1) لكل يوم: عرض لصف السهم في مصفوفة المؤشر،
+             مصفوفة إشارات الدخول روبوتات × أسهم × أيام - الأيام بعد نهاية بيانات سهم قصير تبقى False)
         """
+        from app.services.technical_indicators import BB_NEUTRAL, INDICATOR_COLUMNS, TechnicalIndicators
+        
+        symbols = self.store.symbols
+        self._symbol_pos = {symbol: i for i, symbol in enumerate(symbols)}
+        self._bot_pos = {bot["id"]: i for i, bot in enumerate(self.BOTS)}
+        
+        lengths = [self.store.length(symbol) for symbol in symbols]
+        max_days = max(lengths, default=0)
+        matrices = {
+            name: np.full((len(symbols), max_days), BB_NEUTRAL, dtype=np.int8) if name == "bb_position"
+            else np.full((len(symbols), max_days), np.nan, dtype=self.price_dtype)
+            for name in INDICATOR_COLUMNS
+        }
+        signals = np.zeros((len(self.BOTS), len(symbols), max_days), dtype=bool)
+        
+        for start in range(0, len(symbols), self.SYMBOL_CHUNK_SIZE):
+            chunk = range(start, min(start + self.SYMBOL_CHUNK_SIZE, len(symbols)))
+            width = max(lengths[s_idx] for s_idx in chunk)
+            
+            with self.timings.phase("indicators"):
+                closes = np.full((len(chunk), width), np.nan)
+                volumes = np.full((len(chunk), width), np.nan)
+                for row, s_idx in enumerate(chunk):
+                    closes[row, :lengths[s_idx]] = self.store.close(symbols[s_idx])
+                    volumes[row, :lengths[s_idx]] = self.store.volume(symbols[s_idx])
+                columns = TechnicalIndicators.compute_indicator_columns_from_arrays(closes, volumes)
+            
+            with self.timings.phase("entry_signals"):
+                for row, s_idx in enumerate(chunk):
+                    n = lengths[s_idx]
+                    masks = self._entry_rule_masks(symbols[s_idx], {name: values[row, :n] for name, values in columns.items()})
+                    for b_idx, bot in enumerate(self.BOTS):
+                        signals[b_idx, s_idx, :n] = masks[bot["id"]]
+            
+            for name, values in columns.items():
+                matrices[name][chunk.start:chunk.stop, :width] = values
+        
+        self.timings.count("indicator_computations", len(symbols))
+        indicators = {
+            symbol: {name: matrices[name][s_idx, :lengths[s_idx]] for name in INDICATOR_COLUMNS}
+            for s_idx, symbol in enumerate(symbols)
+        }
+        return indicators, signals
+    
+    def _get_indicators_snapshot(self, symbol: str, day_idx: int) -> dict:
+        """لقطة المؤشرات الكاملة (نفس شكل get_all_indicators) ليوم معين"""
         from app.services.technical_indicators import TechnicalIndicators
         
-        price_data = self.price_data.get(symbol, [])
-        if day_idx < 50 or day_idx >= len(price_data):
-            return None
+        if symbol not in self.store:
+            return {}
+        self._counters["indicator_snapshots"] = self._counters.get("indicator_snapshots", 0) + 1
+        return TechnicalIndicators.snapshot_from_columns(
+            self.price_data[symbol], self.indicators[symbol], day_idx
+        )
+    
+    def _snapshot_builder(self) -> Callable[[str, Optional[int]], Optional[dict]]:
+        """
+        بناء لقطات المؤشرات عند التصدير، مرة واحدة لكل (سهم، شمعة)
+        
+        عدة روبوتات تدخل أو تخرج في نفس السهم ونفس اليوم فتتشارك نفس اللقطة
+        """
+        built = {}
+        
+        def snapshot(symbol: str, bar: Optional[int]) -> Optional[dict]:
+            if bar is None:
+                return None
+            key = (symbol, bar)
+            if key not in built:
+                built[key] = self._get_indicators_snapshot(symbol, bar)
+            return built[key]
         
-        indicators = TechnicalIndicators.get_all_indicators(price_data, day_idx)
-        if not indicators: return None
-        
-        entry_price = price_data[day_idx]["close"]
-        rsi = indicators.get("rsi", {}).get("value")
-        trend = indicators.get("trend", {}).get("direction")
-        macd = indicators.get("macd", {})
-        volume_status = indicators.get("volume", {}).get("status")
-        price_vs_sma20 = indicators.get("sma", {}).get("price_vs_sma20")
-        price_vs_sma50 = indicators.get("sma", {}).get("price_vs_sma50")
-        bollinger = indicators.get("bollinger", {})
-        
-        # 🛡️ فلتر الأمان العام: تم تخفيفه للسماح بصفقات الارتداد (Reversal)
-        # فقط نمنع الدخول في الانهيارات الحادة جداً (RSI < 20 بدون حجم)
-        if trend == "bearish" and rsi and rsi < 20 and volume_status == "low":
+        return snapshot
+    
+    def trade_log(self) -> np.ndarray:
+        """كل الصفقات المغلقة كسجل عمودي (مصفوفة منظمة، انظر trade_log.TRADE_LOG_DTYPE)"""
+        from app.services.trade_log import build_trade_log
+        
+        return build_trade_log(self.closed_trades, [bot["id"] for bot in self.BOTS], self._symbol_pos)
+    
+    def lot_log(self) -> np.ndarray:
+        """دفعات شراء الصفقات المغلقة (الدخول الأول + كل تعزيز)، انظر trade_log.LOT_LOG_DTYPE"""
+        from app.services.trade_log import build_lot_log
+        
+        return build_lot_log(self.closed_trades, [bot["id"] for bot in self.BOTS], self._symbol_pos)
+    
+    def entry_indicators(self, record) -> Optional[dict]:
+        """المؤشرات الفنية وقت دخول صفقة (Position أو ClosedTrade)"""
+        if record.entry_bar is None:
+            return None
+        return self._get_indicators_snapshot(record.symbol, record.entry_bar)
+    
+    def exit_indicators(self, trade: ClosedTrade) -> Optional[dict]:
+        """المؤشرات الفنية وقت خروج صفقة مغلقة"""
+        if trade.exit_bar is None:
             return None
+        return self._get_indicators_snapshot(trade.symbol, trade.exit_bar)
+    
+    def _get_bar_index(self, symbol: str, day: datetime) -> Optional[int]:
+        """فهرس شمعة السهم في هذا التاريخ، أو None إذا لم يتداول فيه (O(1))"""
+        return self.store.index_of(symbol, day)
+    
+    def _get_price_on_date(self, symbol: str, date: datetime) -> Optional[float]:
+        self._counters["price_lookups"] = self._counters.get("price_lookups", 0) + 1
+        bar_idx = self._get_bar_index(symbol, date)
+        if bar_idx is None: return None
+        return float(self.store.close(symbol)[bar_idx])
+    
+    def _get_price_on_day(self, symbol: str, day_idx: int) -> Optional[float]:
+        """إغلاق السهم في يوم التقويم day_idx، أو None إذا لم يتداول فيه (قراءة بالفهرس)"""
+        self._counters["price_lookups"] = self._counters.get("price_lookups", 0) + 1
+        s_idx = self._symbol_pos.get(symbol)
+        if s_idx is None:
+            return None
+        price = self._calendar_closes[s_idx, day_idx]
+        return None if np.isnan(price) else float(price)
 
-        should_enter = False
-        score = 0
-        bot_id = bot["id"]
+    def _entry_rule_masks(self, symbol: str, columns: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """
+        قواعد الدخول لكل روبوت كأقنعة منطقية على كامل أيام السهم
         
-        # =============== منطق الدخول المحسن (أكثر نشاطاً) ===============
+        كل قناع بطول بيانات السهم، وقيمته عند اليوم i تعني أن الروبوت
+        يدخل لو فحص السهم في ذلك اليوم (بعد اكتمال 50 يوم من البيانات)
         
-        if bot_id == "al_nami":
-            # استراتيجية النمو: ركوب الموجة
-            if price_vs_sma50 == "above": score += 3
-            if rsi and 40 <= rsi <= 75: score += 2 # وسعنا النطاق
-            if macd.get("histogram", 0) > 0: score += 1
-            should_enter = score >= 5 # (3+2) يكفي
-            
-        elif bot_id == "al_qannas":
-            # القناص: شراء الانخفاضات (أكثر حدة)
-            if rsi and rsi < 40: score += 5 # تشبع بيعي
-            if bollinger.get("position") == "oversold": score += 3
-            should_enter = score >= 5
-            
-        elif bot_id == "al_jasour":
-            # الجسور: اختراقات وسيولة
-            if volume_status == "high": score += 4
-            if rsi and 50 <= rsi <= 85: score += 2
-            should_enter = score >= 5 
-            
-        elif bot_id == "al_barq":
-            # البرق: مضاربة لحظية 
-            if volume_status == "high": score += 5 
-            if rsi and 30 <= rsi <= 75: score += 2
-            should_enter = score >= 5
-            
-        elif bot_id == "al_basira":
-            # البصيرة
-            if indicators.get("signals", {}).get("macd_signal") == "buy": score += 4
-            if price_vs_sma20 == "above": score += 2
-            should_enter = score >= 5
-            
-        elif bot_id == "al_razeen":
-            # الرزين
-            if price_vs_sma50 == "above": score += 4
-            if rsi and rsi < 65: score += 2
-            should_enter = score >= 6
-            
-        elif bot_id == "al_khabeer":
-            # الخبير
-            if indicators.get("trend", {}).get("golden_cross"): score += 6
-            if macd.get("signal") == "buy": score += 3
-            should_enter = score >= 5 # إشارة واحدة تكفي
-            
-        elif bot_id == "al_rasi":
-            # الراسي
-            if rsi and 30 <= rsi <= 55: score += 3
-            if price_vs_sma50 == "above": score += 3
-            should_enter = score >= 5
-            
-        elif bot_id == "al_dhakheera":
-            # الذخيرة
-            if rsi and rsi < 60: score += 3
-            if trend != "bearish": score += 2
-            should_enter = score >= 4
-            
-        elif bot_id == "al_mudarra":
-            # المُدرّع
-            if trend == "bullish": score += 4
-            if volume_status == "normal": score += 2
-            should_enter = score >= 5
-            
-        elif bot_id == "al_maestro":
-            # المايسترو: استراتيجية مزدوجة (ركوب موجة + تجميع)
-            
-            # السيناريو 1: تجميع حيتان (نادر وقوي)
-            prices_so_far = [d["close"] for d in price_data[:day_idx + 1]]
-            sma_200 = TechnicalIndicators.calculate_sma(prices_so_far, 200)
+        columns: أعمدة المؤشرات بدقة كاملة أثناء البناء (افتراضياً المخزنة في self.indicators)
+        """
+        from app.services.technical_indicators import BB_OVERSOLD
+        
+        if columns is None:
+            columns = self.indicators[symbol]
+        close = self.store.close(symbol)
+        rsi = columns["rsi"]
+        sma_20 = columns["sma_20"]
+        sma_50 = columns["sma_50"]
+        sma_200 = columns["sma_200"]
+        macd_histogram = columns["macd_histogram"]
+        volume_change = columns["volume_change"]
+        
+        # قيمة "صحيحة" بمنطق بايثون: متاحة وغير صفرية
+        present = lambda values: ~np.isnan(values) & (values != 0)
+        
+        with np.errstate(invalid="ignore"):
+            has_rsi = present(rsi)
+            has_trend = present(sma_50) & present(sma_200)
+            bullish = has_trend & (sma_50 > sma_200)
+            bearish = has_trend & ~(sma_50 > sma_200)
+            volume_high = present(volume_change) & (volume_change > 150)
+            volume_normal = present(volume_change) & (volume_change > 80) & ~volume_high
+            volume_low = ~volume_high & ~volume_normal
+            above_sma20 = present(sma_20) & (close > sma_20)
+            above_sma50 = present(sma_50) & (close > sma_50)
+            macd_buy = macd_histogram > 0
+            bollinger_oversold = columns["bb_position"] == BB_OVERSOLD
+            rsi_between = lambda low, high: has_rsi & (rsi >= low) & (rsi <= high)
+            rsi_below = lambda level: has_rsi & (rsi < level)
             
-            # شرط أساسي: السهم في اتجاه صاعد طويل المدى
-            if sma_200 and entry_price > sma_200:
-                # 1. تراجع مؤقت (Deep Dip)
-                if rsi and rsi < 35: 
-                    score += 6
-                # 2. اختراق صاعد (Breakout)
-                elif rsi and 55 < rsi < 70 and volume_status == "high":
-                    score += 6
-                    
-            should_enter = score >= 6
+            # السيناريوهان المزدوجان للمايسترو
+            maestro_dip = rsi_below(35)
+            maestro_breakout = ~maestro_dip & has_rsi & (rsi > 55) & (rsi < 70) & volume_high
+            above_sma200 = present(sma_200) & (close > sma_200)
             
-        else:
-            # Fallback for others
-            if trend == "bullish" and rsi and rsi < 65:
-                should_enter = True
-
-        if should_enter:
-            # Randomize quantity slightly for realism
-            return {
-                "entry_price": entry_price,
-                "quantity": random.randint(50, 200),
-                "reason_ar": self._generate_entry_reason(bot, symbol)
+            # =============== منطق الدخول المحسن (أكثر نشاطاً) ===============
+            masks = {
+                # النامي: ركوب الموجة
+                "al_nami": 3 * above_sma50 + 2 * rsi_between(40, 75) + 1 * macd_buy >= 5,
+                # القناص: شراء الانخفاضات (أكثر حدة)
+                "al_qannas": 5 * rsi_below(40) + 3 * bollinger_oversold >= 5,
+                # الجسور: اختراقات وسيولة
+                "al_jasour": 4 * volume_high + 2 * rsi_between(50, 85) >= 5,
+                # البرق: مضاربة لحظية
+                "al_barq": 5 * volume_high + 2 * rsi_between(30, 75) >= 5,
+                # البصيرة
+                "al_basira": 4 * macd_buy + 2 * above_sma20 >= 5,
+                # الرزين
+                "al_razeen": 4 * above_sma50 + 2 * rsi_below(65) >= 6,
+                # الخبير: إشارة واحدة تكفي
+                "al_khabeer": 6 * bullish + 3 * macd_buy >= 5,
+                # الراسي
+                "al_rasi": 3 * rsi_between(30, 55) + 3 * above_sma50 >= 5,
+                # الذخيرة
+                "al_dhakheera": 3 * rsi_below(60) + 2 * ~bearish >= 4,
+                # المُدرّع
+                "al_mudarra": 4 * bullish + 2 * volume_normal >= 5,
+                # المايسترو: تراجع مؤقت أو اختراق صاعد فوق SMA 200
+                "al_maestro": above_sma200 & (maestro_dip | maestro_breakout),
             }
+            fallback = bullish & rsi_below(65)
+        
+        # 🛡️ فلتر الأمان العام: فقط نمنع الدخول في الانهيارات الحادة جداً (RSI < 20 بدون حجم)
+        crash = bearish & rsi_below(20) & volume_low
+        
+        warmed_up = np.arange(len(close)) >= 50
         
-        return None
+        return {
+            bot["id"]: masks.get(bot["id"], fallback) & ~crash & warmed_up
+            for bot in self.BOTS
+        }
+    
+    def _generate_entry_signal(self, bot: dict, symbol: str, day_idx: int) -> Optional[dict]:
+        """
+        إشارة الدخول ليوم التقويم day_idx من مصفوفة الإشارات المحسوبة مسبقاً
+        
+        الإشارات مفهرسة بشموع السهم، والتقويم يحوّل اليوم إلى شمعة (لا إشارة إذا لم يتداول فيه)
+        """
+        self._counters["signal_evaluations"] = self._counters.get("signal_evaluations", 0) + 1
+        s_idx = self._symbol_pos.get(symbol)
+        if s_idx is None:
+            return None
+        bar = int(self.calendar.bar_index[s_idx, day_idx])
+        if bar < 0 or not self.entry_signals[self._bot_pos[bot["id"]], s_idx, bar]:
+            return None
+        
+        return {
+            "entry_price": float(self._calendar_closes[s_idx, day_idx]),
+            "bar": bar,
+            "reason_ar": self._generate_entry_reason(bot, symbol)
+        }
 
     def _generate_entry_reason(self, bot: dict, symbol: str) -> str:
         reasons = {
@@ -519,7 +848,11 @@ class BacktestEngine:
         max_days = strategy["max_days"]
         
         for symbol, position in list(self.positions[bot_id].items()):
-            current_price = self._get_price_on_date(symbol, date)
+            # يوم الخروج محسوب مسبقاً عند الدخول (المايسترو يُفحص يومياً بسبب الوقف المتحرك)
+            if bot_id not in self.DAILY_EXIT_BOTS and position.exit_day_idx != day_idx:
+                continue
+            
+            current_price = self._get_price_on_day(symbol, day_idx)
             if current_price is None:
                 continue
             
@@ -575,21 +908,17 @@ class BacktestEngine:
                     "day_idx": day_idx  # حفظ فهرس اليوم لحساب المؤشرات
                 })
         
-        # استيراد خدمة المؤشرات الفنية
-        from app.services.technical_indicators import TechnicalIndicators
-        
         # إغلاق الصفقات
         for close_info in positions_to_close:
             symbol = close_info["symbol"]
             position = close_info["position"]
             
-            # ✅ حساب المؤشرات الفنية وقت الخروج
-            exit_indicators = None
-            if symbol in self.price_data:
-                exit_indicators = TechnicalIndicators.get_all_indicators(
-                    self.price_data[symbol],
-                    close_info["day_idx"]
-                )
+            # ✅ المؤشرات الفنية وقت الخروج (فهرس الشمعة فقط، واللقطة تُبنى عند التصدير)
+            exit_bar = self.calendar.bar(symbol, close_info["day_idx"])
+            
+            # تحديث الرصيد
+            trade_value = position.entry_price * position.quantity
+            profit = trade_value * (close_info["profit_pct"] / 100)
             
             # إنشاء سجل الصفقة المغلقة
             trade = ClosedTrade(
@@ -606,15 +935,13 @@ class BacktestEngine:
                 result=close_info["result"],
                 reason_ar=position.reason_ar,
                 exit_reason_ar=close_info["exit_reason"],
-                entry_indicators=position.entry_indicators,  # المؤشرات وقت الدخول
-                exit_indicators=exit_indicators  # المؤشرات وقت الخروج
+                entry_bar=position.entry_bar,  # المؤشرات وقت الدخول
+                exit_bar=exit_bar,  # المؤشرات وقت الخروج
+                profit=profit,
+                adds=position.adds
             )
             
             self.closed_trades[bot_id].append(trade)
-            
-            # تحديث الرصيد
-            trade_value = position.entry_price * position.quantity
-            profit = trade_value * (close_info["profit_pct"] / 100)
             self.balances[bot_id] += profit
             
             # إزالة الصفقة من المفتوحة
@@ -627,9 +954,10 @@ class BacktestEngine:
         for bot_id in self.positions:
             for symbol, position in list(self.positions[bot_id].items()):
                 # أخذ آخر سعر متاح
-                if symbol in self.price_data and len(self.price_data[symbol]) > 0:
-                    current_price = self.price_data[symbol][-1]["close"]
-                    exit_date = self.price_data[symbol][-1]["date"]
+                if symbol in self.store and self.store.length(symbol) > 0:
+                    last_bar = self.store.bar(symbol, -1)
+                    current_price = last_bar["close"]
+                    exit_date = last_bar["date"]
                 else:
                     current_price = position.entry_price
                     exit_date = self.end_date
@@ -637,6 +965,10 @@ class BacktestEngine:
                 profit_pct = ((current_price - position.entry_price) / position.entry_price) * 100
                 result = "win" if profit_pct >= 0 else "loss"
                 
+                # تحديث الرصيد
+                trade_value = position.entry_price * position.quantity
+                profit = trade_value * (profit_pct / 100)
+                
                 trade = ClosedTrade(
                     id=f"{bot_id}_{symbol}_{len(self.closed_trades[bot_id])}",
                     symbol=symbol,
@@ -650,53 +982,311 @@ class BacktestEngine:
                     is_closed=True,
                     result=result,
                     reason_ar=position.reason_ar,
-                    exit_reason_ar="📅 إغلاق نهاية المحاكاة"
+                    exit_reason_ar="📅 إغلاق نهاية المحاكاة",
+                    profit=profit,
+                    adds=position.adds
                 )
                 
                 self.closed_trades[bot_id].append(trade)
-                
-                # تحديث الرصيد
-                trade_value = position.entry_price * position.quantity
-                profit = trade_value * (profit_pct / 100)
                 self.balances[bot_id] += profit
             
             # تفريغ الصفقات المفتوحة
             self.positions[bot_id] = {}
     
-    def run(self) -> dict:
-        """تشغيل المحاكاة الكاملة - بيانات حقيقية فقط"""
+    def run(self, parallel: bool = False, max_workers: Optional[int] = None,
+            progress_callback: Optional[Callable[[int, int, Dict[str, int]], None]] = None,
+            cancel_event: Optional[threading.Event] = None, include_indicators: bool = True) -> dict:
+        """
+        تشغيل المحاكاة الكاملة - بيانات حقيقية فقط
+        
+        Args:
+            parallel: توزيع الروبوتات على عمليات متوازية (الروبوتات مستقلة تماماً)؛
+                      مخصص لسطر الأوامر وقياس الأداء، فكل استدعاء يبدأ عملياته وينسخ
+                      المحرك إليها، وسكربت الاستدعاء يحتاج حماية if __name__ == "__main__"
+            max_workers: أقصى عدد عمليات (افتراضياً عدد الأنوية)
+            progress_callback: تُستدعى بـ (الأيام المنجزة، إجمالي الأيام، عدد صفقات كل روبوت)
+            cancel_event: عند ضبطه تتوقف المحاكاة برفع BacktestCancelled
+            include_indicators: لقطات المؤشرات وقت الدخول والخروج لكل صفقة في النتائج
+        
+        في الوضع المتوازي يُبلّغ التقدم عند اكتمال كل مجموعة روبوتات فقط
+        """
+        stocks_to_use, trading_days = self._trading_calendar()
+        
+        print("=" * 50)
+        print(f"🚀 بدء المحاكاة: {len(trading_days)} يوم تداول")
+        print(f"📈 أسهم متاحة: {len(stocks_to_use)} سهم")
+        print(f"⚠️  كل البيانات حقيقية 100% من Yahoo Finance")
+        print(f"📊 يتم حساب المؤشرات الفنية الحقيقية لكل صفقة")
+        print("=" * 50)
+        
+        with self.timings.phase("simulate"):
+            if parallel and len(self.BOTS) > 1:
+                self._run_parallel(trading_days, stocks_to_use, max_workers, progress_callback, cancel_event)
+            else:
+                self._simulate(self.BOTS, trading_days, stocks_to_use, progress_callback, cancel_event)
+        
+        return self._finish_run(trading_days, include_indicators)
+    
+    def resume(self, checkpoint: dict, new_bars: Optional[Dict[str, List[Dict]]] = None,
+               progress_callback: Optional[Callable[[int, int, Dict[str, int]], None]] = None,
+               cancel_event: Optional[threading.Event] = None) -> dict:
+        """
+        استكمال محاكاة سابقة من نقطة حفظ بدلاً من إعادتها من البداية
+        
+        Args:
+            checkpoint: نقطة الحفظ (last_checkpoint من تشغيل سابق)
+            new_bars: شموع جديدة تُضاف للأسعار {symbol: [{"date", "open", ...}]}
+                      (None إذا كانت بيانات المحرك تحتوي الأيام الجديدة مسبقاً)
+        
+        Raises:
+            ValueError: إذا كانت نقطة الحفظ لا تطابق إعدادات المحرك أو بياناته التاريخية
         
+        التكلفة بعدد الأيام الجديدة فقط (المؤشرات تُعاد حسابها بشكل متجه عند إضافة شموع)
+        """
+        if new_bars:
+            self.store = self.store.extended(new_bars)
+            self._prepare_market_data()
+        
+        stocks_to_use, trading_days = self._trading_calendar()
+        start_idx = self._restore_checkpoint(checkpoint, trading_days)
+        
+        # الصفقات المفتوحة لم يُحدد خروجها في البيانات القديمة - البحث في الأيام الجديدة
+        self._prepare_calendar_prices()
+        for positions in self.positions.values():
+            for position in positions.values():
+                entry_idx = int(np.searchsorted(self.calendar.days, to_day_number(position.entry_date)))
+                self._schedule_exit(position, entry_idx, first_idx=start_idx)
+        
+        print(f"⏩ استكمال المحاكاة من {checkpoint['last_date']}: {len(trading_days) - start_idx} يوم جديد")
+        
+        with self.timings.phase("simulate"):
+            self._simulate(self.BOTS, trading_days, stocks_to_use, progress_callback, cancel_event, start_idx=start_idx)
+        
+        return self._finish_run(trading_days)
+    
+    def _trading_calendar(self):
+        """الأسهم المتاحة وأيام التداول (اتحاد أيام كل الأسهم من التقويم الموحد)"""
         # استخدام الأسهم المتاحة فقط (التي تم تحميل بياناتها بنجاح)
-        stocks_to_use = getattr(self, 'available_stocks', list(self.price_data.keys()))
+        stocks_to_use = getattr(self, 'available_stocks', self.store.symbols)
         
         if not stocks_to_use:
             raise Exception("❌ لا توجد أسهم متاحة للتداول!")
         
-        # الحصول على أيام التداول من أول سهم متاح
-        first_symbol = stocks_to_use[0]
-        trading_days = [d["date"] for d in self.price_data.get(first_symbol, [])]
+        trading_days = self.calendar.datetimes()
         
         if not trading_days:
             raise Exception("❌ لا توجد أيام تداول!")
         
-        print("=" * 50)
-        print(f"🚀 بدء المحاكاة: {len(trading_days)} يوم تداول")
-        print(f"📈 أسهم متاحة: {len(stocks_to_use)} سهم")
-        print(f"⚠️  كل البيانات حقيقية 100% من Yahoo Finance")
-        print(f"📊 يتم حساب المؤشرات الفنية الحقيقية لكل صفقة")
-        print("=" * 50)
+        return stocks_to_use, trading_days
+    
+    def _finish_run(self, trading_days: List[datetime], include_indicators: bool = True) -> dict:
+        # نقطة الحفظ قبل الإغلاق القسري (الصفقات المفتوحة تبقى مفتوحة عند الاستكمال)
+        # نسخ سطحية فقط هنا، والقاموس القابل للحفظ يُبنى عند طلب last_checkpoint
+        self._checkpoint_state = (
+            len(trading_days) - 1,
+            trading_days[-1],
+            {bot_id: dict(positions) for bot_id, positions in self.positions.items()},
+            {bot_id: list(trades) for bot_id, trades in self.closed_trades.items()},
+            dict(self.balances),
+            self._rng.getstate(),
+        )
         
-        # استيراد خدمة المؤشرات الفنية
-        from app.services.technical_indicators import TechnicalIndicators
+        trades_closed = sum(len(trades) for trades in self.closed_trades.values())
+        open_at_end = sum(len(positions) for positions in self.positions.values())
+        self.timings.count("trades_opened", trades_closed + open_at_end)
+        self.timings.count("trades_closed", trades_closed)
+        self.timings.count("positions_open_at_end", open_at_end)
+        
+        # ✅ إغلاق أي صفقات متبقية
+        self._force_close_remaining_positions()
+        
+        print("✅ اكتملت المحاكاة - جميع الصفقات مغلقة")
+        
+        with self.timings.phase("equity"):
+            self._daily_equity()
+        
+        with self.timings.phase("results"):
+            results = self._generate_results(include_indicators)
+        results["timings"] = self.timings.to_dict()
+        results["memory"] = self.memory.report()
+        return results
+    
+    # =============== نقاط الحفظ (Checkpoints) ===============
+    
+    @property
+    def last_checkpoint(self) -> Optional[dict]:
+        """نقطة الحفظ لآخر تشغيل (قبل الإغلاق القسري)، أو None قبل أي تشغيل"""
+        state = getattr(self, "_checkpoint_state", None)
+        return self._serialize_checkpoint(*state) if state else None
+    
+    def checkpoint(self, day_idx: int, date: datetime) -> dict:
+        """
+        حالة المحاكاة بعد معالجة اليوم day_idx كقاموس قابل للحفظ بـ JSON
+        
+        تشمل الصفقات المفتوحة والمغلقة والأرصدة وحالة المولد العشوائي،
+        وأسعار الإغلاق في آخر يوم للتأكد من أن البيانات التاريخية لم تتغير عند الاستكمال
+        """
+        return self._serialize_checkpoint(day_idx, date, self.positions, self.closed_trades,
+                                          self.balances, self._rng.getstate())
+    
+    def _serialize_checkpoint(self, day_idx, date, positions_by_bot, closed_trades, balances,
+                              rng_state) -> dict:
+        rng_version, rng_internal, rng_gauss = rng_state
+        
+        return {
+            "engine_version": self.ENGINE_VERSION,
+            "market_type": self.market_type,
+            "initial_capital": self.initial_capital,
+            "strategy_overrides": self.strategy_overrides,
+            "day_idx": day_idx,
+            "last_date": date.strftime("%Y-%m-%d"),
+            "last_closes": {
+                symbol: float(self.store.close(symbol)[bar])
+                for symbol in self.store.symbols
+                if (bar := self.calendar.bar(symbol, day_idx)) is not None
+            },
+            "positions": {
+                bot_id: [
+                    {**_fields_dict(position), "entry_date": position.entry_date.strftime("%Y-%m-%dT%H:%M:%S")}
+                    for position in positions.values()
+                ]
+                for bot_id, positions in positions_by_bot.items()
+            },
+            "closed_trades": {
+                bot_id: [_fields_dict(trade) for trade in trades]
+                for bot_id, trades in closed_trades.items()
+            },
+            "balances": dict(balances),
+            "rng_state": [rng_version, list(rng_internal), rng_gauss],
+        }
+    
+    def _restore_checkpoint(self, checkpoint: dict, trading_days: List[datetime]) -> int:
+        """استرجاع حالة نقطة الحفظ وإرجاع فهرس أول يوم جديد"""
+        for field, expected in (("engine_version", self.ENGINE_VERSION),
+                                ("market_type", self.market_type),
+                                ("initial_capital", self.initial_capital),
+                                ("strategy_overrides", self.strategy_overrides)):
+            if checkpoint.get(field, {} if field == "strategy_overrides" else None) != expected:
+                raise ValueError(f"نقطة الحفظ غير متوافقة: {field}={checkpoint.get(field)} (المتوقع {expected})")
+        
+        day_idx = checkpoint["day_idx"]
+        if day_idx >= len(trading_days) or trading_days[day_idx].strftime("%Y-%m-%d") != checkpoint["last_date"]:
+            raise ValueError(f"تقويم التداول لا يحتوي آخر يوم في نقطة الحفظ ({checkpoint['last_date']})")
+        
+        for symbol, close in checkpoint["last_closes"].items():
+            bar = self.calendar.bar(symbol, day_idx)
+            if bar is None or float(self.store.close(symbol)[bar]) != close:
+                raise ValueError(f"البيانات التاريخية لـ {symbol} تغيرت منذ نقطة الحفظ")
+        
+        self.positions = {
+            bot_id: {
+                item["symbol"]: Position(**{**item, "entry_date": datetime.strptime(item["entry_date"], "%Y-%m-%dT%H:%M:%S")})
+                for item in items
+            }
+            for bot_id, items in checkpoint["positions"].items()
+        }
+        self.closed_trades = {
+            bot_id: [ClosedTrade(**item) for item in items]
+            for bot_id, items in checkpoint["closed_trades"].items()
+        }
+        self.balances = dict(checkpoint["balances"])
+        
+        rng_version, rng_internal, rng_gauss = checkpoint["rng_state"]
+        self._rng.setstate((rng_version, tuple(rng_internal), rng_gauss))
+        
+        return day_idx + 1
+    
+    def _trade_counts(self) -> Dict[str, int]:
+        """عدد صفقات كل روبوت حتى الآن (المغلقة + المفتوحة)"""
+        return {
+            bot_id: len(self.closed_trades[bot_id]) + len(self.positions[bot_id])
+            for bot_id in self.closed_trades
+        }
+    
+    # روبوتات يتغير وقف خسارتها أو سعر دخولها أثناء الصفقة (وقف متحرك / تعزيز)، فتُفحص يومياً
+    DAILY_EXIT_BOTS = ("al_maestro",)
+    
+    def _prepare_calendar_prices(self):
+        """
+        إغلاق كل سهم على التقويم الموحد (أسهم × أيام بترتيب _symbol_pos، NaN في الأيام بلا تداول)
+        
+        لقراءة الأسعار في حلقة المحاكاة ولبحث الخروج (الأيام بلا تداول لا تُفحص)
+        """
+        self._calendar_closes = self.calendar.align(self.store, "close")
+    
+    def _daily_equity(self):
+        """
+        الرصيد اليومي بالقيمة السوقية ومقاييس المخاطرة لكل روبوت (بعد الإغلاق القسري)
+        
+        المراكز المعززة (المايسترو) تُقيّم كدفعات: كل تعزيز محتفظ به من يوم شرائه فقط
+        """
+        from app.services.portfolio_metrics import TRADING_DAYS_PER_YEAR, daily_equity, forward_fill, risk_metrics
+        
+        calendar = self.calendar.days
+        closes = forward_fill(self.calendar.align(self.store, "close"))
+        log = self.trade_log()
+        lots = self.lot_log()
+        periods_per_year = 365 if self.market_type == "crypto" else TRADING_DAYS_PER_YEAR
+        
+        self.risk_metrics = {}
+        for b_idx, bot in enumerate(self.BOTS):
+            trades = log[log["bot"] == b_idx]
+            equity, exposed = daily_equity(trades, lots[lots["bot"] == b_idx], closes, calendar,
+                                           self.initial_capital)
+            traded_value = float((trades["quantity"] * (trades["entry_price"] + trades["exit_price"])).sum())
+            
+            self.equity_curves[bot["id"]] = equity.tolist()
+            self.risk_metrics[bot["id"]] = risk_metrics(equity, self.initial_capital, exposed, traded_value,
+                                                        periods_per_year)
+    
+    def _schedule_exit(self, position: Position, entry_day_idx: int, first_idx: Optional[int] = None):
+        """
+        تحديد يوم خروج الصفقة مرة واحدة عند الدخول (بحث متجه بدلاً من الفحص اليومي)
+        
+        الشروط نفسها في _check_and_close_positions، الذي يُغلق الصفقة في ذلك اليوم
+        """
+        s_idx = self._symbol_pos.get(position.symbol)
+        if position.bot_id in self.DAILY_EXIT_BOTS or s_idx is None:
+            return
+        
+        position.exit_day_idx, _ = resolve_exit(
+            self._calendar_closes[s_idx], self.calendar.days, entry_day_idx,
+            position.take_profit, position.stop_loss,
+            max_days=self._get_bot_strategy(position.bot_id)["max_days"], first_idx=first_idx,
+        )
+    
+    @staticmethod
+    def _check_cancelled(cancel_event: Optional[threading.Event]):
+        if cancel_event is not None and cancel_event.is_set():
+            raise BacktestCancelled("تم إلغاء المحاكاة")
+    
+    def _simulate(self, bots: List[dict], trading_days: List[datetime], stocks_to_use: List[str],
+                  progress_callback: Optional[Callable] = None, cancel_event: Optional[threading.Event] = None,
+                  start_idx: int = 0):
+        """حلقة المحاكاة اليومية لمجموعة من الروبوتات (من اليوم start_idx)"""
+        self._prepare_calendar_prices()
+        
+        # زمن الخروج والدخول بالوقت الفعلي فقط (يُقاس لكل روبوت في كل يوم)
+        clock = time.perf_counter
+        exits_wall = entries_wall = 0.0
+        bot_days = 0
         
         # المرور على كل يوم تداول
-        for day_idx, date in enumerate(trading_days):
+        for day_idx in range(start_idx, len(trading_days)):
+            date = trading_days[day_idx]
+            self._check_cancelled(cancel_event)
+            if progress_callback:
+                progress_callback(day_idx, len(trading_days), self._trade_counts())
             
-            for bot in self.BOTS:
+            for bot in bots:
                 bot_id = bot["id"]
                 
                 # ✅ أولاً: فحص وإغلاق الصفقات المفتوحة
+                exits_start = clock()
                 self._check_and_close_positions(bot_id, day_idx, date)
+                entries_start = clock()
+                exits_wall += entries_start - exits_start
+                bot_days += 1
                 
                 # ✅ ثانياً: البحث عن فرص دخول جديدة
                 # زيادة الحد الأقصى للصفقات المفتوحة لاستغلال كامل رأس المال (حتى 10 صفقات)
@@ -708,14 +1298,14 @@ class BacktestEngine:
                         should_act = False
                         
                         # 1. حالة الدخول الجديد
-                        if not is_in_position and symbol in self.price_data:
+                        if not is_in_position and symbol in self.store:
                             signal = self._generate_entry_signal(bot, symbol, day_idx)
                             if signal: should_act = True
                                 
                         # 2. حالة التعزيز الهرمي (Pyramiding) للمايسترو
                         elif is_in_position and bot_id == "al_maestro":
                             position = self.positions[bot_id][symbol]
-                            current_price = self._get_price_on_date(symbol, date)
+                            current_price = self._get_price_on_day(symbol, day_idx)
                             
                             # شرط التعزيز: السهم رابح 3% على الأقل (تعزيز أسرع)
                             if current_price and current_price > position.entry_price * 1.03:
@@ -757,6 +1347,7 @@ class BacktestEngine:
                                 
                                 position.quantity += quantity
                                 position.entry_price = (old_cost + new_cost) / position.quantity
+                                position.adds.append([int(self.calendar.days[day_idx]), quantity, entry_price])
                                 
                                 # رفع وقف الخسارة (Trailing SL)
                                 position.stop_loss = position.entry_price * 0.95
@@ -769,10 +1360,6 @@ class BacktestEngine:
                                 take_profit = entry_price * (1 + strategy["take_profit"] / 100)
                                 stop_loss = entry_price * (1 + strategy["stop_loss"] / 100)
                                 
-                                entry_indicators = TechnicalIndicators.get_all_indicators(
-                                    self.price_data[symbol], day_idx
-                                )
-                                
                                 position = Position(
                                     symbol=symbol,
                                     entry_price=entry_price,
@@ -782,41 +1369,68 @@ class BacktestEngine:
                                     stop_loss=stop_loss,
                                     reason_ar=signal["reason_ar"],
                                     bot_id=bot_id,
-                                    entry_indicators=entry_indicators
+                                    entry_bar=signal["bar"]
                                 )
+                                self._schedule_exit(position, day_idx)
                                 self.positions[bot_id][symbol] = position
                                 break 
                 
-                # تحديث منحنى الرصيد
-                if day_idx % 5 == 0:  # كل 5 أيام
-                    # حساب القيمة الحالية للمحفظة (النقد + القيمة السوقية للصفقات المفتوحة)
-                    open_positions_value = 0
-                    for pos in self.positions[bot_id].values():
-                         current_price = self._get_price_on_date(pos.symbol, date)
-                         if current_price:
-                             open_positions_value += pos.quantity * current_price
-                         else:
-                             open_positions_value += pos.quantity * pos.entry_price
-                    
-                    total_equity = self.balances[bot_id] + open_positions_value # (ملاحظة: balances هنا نعتبره كاش تقريباً لأننا لم نخصم منه عند الشراء في اللوجيك القديم)
-                    # *تنويه*: اللوجيك السابق لم يكن يخصم الشراء من self.balances، بل يضيف الربح فقط.
-                    # لتصحيح المحاكاة وجعلها أدق مع "الفائدة المركبة":
-                    # سنفترض أن self.balances هو الـ "Net Liquidation Value" الإجمالي (كاش + أسهم).
-                    
-                    self.equity_curves[bot_id].append(self.balances[bot_id])
+                entries_wall += clock() - entries_start
+                
         
+        self.timings.add("exits", exits_wall, calls=bot_days)
+        self.timings.add("entries", entries_wall, calls=bot_days)
         
-        # ✅ إغلاق أي صفقات متبقية
-        self._force_close_remaining_positions()
+        if progress_callback:
+            progress_callback(len(trading_days), len(trading_days), self._trade_counts())
+    
+    def _run_parallel(self, trading_days: List[datetime], stocks_to_use: List[str], max_workers: Optional[int],
+                      progress_callback: Optional[Callable] = None, cancel_event: Optional[threading.Event] = None):
+        """
+        توزيع الروبوتات على ProcessPoolExecutor ثم دمج حالاتها
         
-        print("✅ اكتملت المحاكاة - جميع الصفقات مغلقة")
+        كل عملية تحصل على نسخة من المحرك (الأسعار والمؤشرات والإشارات للقراءة فقط،
+        تُنسخ مرة واحدة لكل عملية عبر initializer) وتحاكي مجموعتها من الروبوتات فقط
+        """
+        import multiprocessing
+        import os
+        from concurrent.futures import ProcessPoolExecutor
         
-        return self._generate_results()
+        workers = min(max_workers or os.cpu_count() or 1, len(self.BOTS))
+        shards = [[bot["id"] for bot in self.BOTS[i::workers]] for i in range(workers)]
+        
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(PARALLEL_START_METHOD),
+                                 initializer=_init_worker, initargs=(self,)) as pool:
+            futures = [pool.submit(_simulate_shard, shard, trading_days, stocks_to_use) for shard in shards]
+            for shards_done, future in enumerate(futures, 1):
+                try:
+                    self._check_cancelled(cancel_event)
+                except BacktestCancelled:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                
+                states, counters = future.result()
+                self.timings.merge_counters(counters)
+                for bot_id, state in states.items():
+                    self.positions[bot_id] = state["positions"]
+                    self.closed_trades[bot_id] = state["closed_trades"]
+                    self.balances[bot_id] = state["balances"]
+                
+                # التقدم بالأيام المكافئة لنسبة المجموعات المكتملة
+                if progress_callback:
+                    days_done = len(trading_days) * shards_done // len(shards)
+                    progress_callback(days_done, len(trading_days), self._trade_counts())
     
-    def _generate_results(self) -> dict:
-        """توليد نتائج المحاكاة"""
+    def _generate_results(self, include_indicators: bool = True) -> dict:
+        """
+        توليد نتائج المحاكاة
+        
+        include_indicators: بناء لقطات المؤشرات لكل صفقة (False للملخصات التي لا تعرض الصفقات)
+        """
         results = []
         bot_portfolios = {}
+        snapshot = self._snapshot_builder() if include_indicators else (lambda symbol, bar: None)
         
         for bot in self.BOTS:
             bot_id = bot["id"]
@@ -831,15 +1445,9 @@ class BacktestEngine:
             total_profit = final_balance - self.initial_capital
             total_profit_pct = (total_profit / self.initial_capital) * 100
             
-            # حساب أقصى تراجع
-            max_drawdown = 0
-            peak = self.initial_capital
-            for equity in self.equity_curves[bot_id]:
-                if equity > peak:
-                    peak = equity
-                drawdown = ((peak - equity) / peak) * 100
-                if drawdown > max_drawdown:
-                    max_drawdown = drawdown
+            # مقاييس المخاطرة من الرصيد اليومي
+            risk = self.risk_metrics[bot_id]
+            max_drawdown = risk["max_drawdown"]
             
             results.append({
                 "bot_id": bot_id,
@@ -852,6 +1460,10 @@ class BacktestEngine:
                 "losing_trades": losing_trades,
                 "win_rate": round(win_rate, 1),
                 "max_drawdown": round(max_drawdown, 2),
+                "sharpe_ratio": round(risk["sharpe_ratio"], 2),
+                "sortino_ratio": round(risk["sortino_ratio"], 2),
+                "exposure_pct": round(risk["exposure_pct"], 1),
+                "turnover": round(risk["turnover"], 2),
                 "final_balance": round(final_balance, 2),
                 "initial_capital": self.initial_capital,
             })
@@ -866,6 +1478,10 @@ class BacktestEngine:
                 "losing_trades": losing_trades,
                 "win_rate": round(win_rate, 1),
                 "max_drawdown": round(max_drawdown, 2),
+                "sharpe_ratio": round(risk["sharpe_ratio"], 2),
+                "sortino_ratio": round(risk["sortino_ratio"], 2),
+                "exposure_pct": round(risk["exposure_pct"], 1),
+                "turnover": round(risk["turnover"], 2),
                 "equity_curve": [round(e, 2) for e in self.equity_curves[bot_id]],
                 "trades": [
                     {
@@ -882,8 +1498,8 @@ class BacktestEngine:
                         "result": t.result,
                         "reason_ar": t.reason_ar,
                         "exit_reason_ar": t.exit_reason_ar,
-                        "entry_indicators": t.entry_indicators,  # المؤشرات الفنية وقت الدخول
-                        "exit_indicators": t.exit_indicators     # المؤشرات الفنية وقت الخروج
+                        "entry_indicators": snapshot(t.symbol, t.entry_bar),  # المؤشرات الفنية وقت الدخول
+                        "exit_indicators": snapshot(t.symbol, t.exit_bar)     # المؤشرات الفنية وقت الخروج
                     }
                     for t in trades
                 ]
@@ -896,13 +1512,13 @@ class BacktestEngine:
         weekly_winners = []
         for week in range(1, 13):
             if results:
-                winner = random.choice(results[:3])
+                winner = self._rng.choice(results[:3])
                 weekly_winners.append({
                     "week": week,
                     "winner_id": winner["bot_id"],
                     "winner_name": winner["name_ar"],
                     "winner_emoji": winner["emoji"],
-                    "profit_pct": round(random.uniform(0.5, 5), 2)
+                    "profit_pct": round(self._rng.uniform(0.5, 5), 2)
                 })
         
         return {
@@ -916,3 +1532,49 @@ class BacktestEngine:
                 "total_days": (self.end_date - self.start_date).days
             }
         }
+
+
+def _fields_dict(obj) -> dict:
+    """حقول dataclass كقاموس سطحي (asdict ينسخ كل القواميس المتداخلة بعمق)"""
+    return {field.name: getattr(obj, field.name) for field in fields(obj)}
+
+
+# ============ Parallel Workers ============
+
+# العمليات العاملة تبدأ بـ spawn لا fork: run(parallel=True) قد تُستدعى من خيط داخل
+# الخادم (طلب HTTP أو مدير المهام)، وfork من عملية متعددة الخيوط ينسخ أقفالاً
+# يحملها خيط آخر (أقفال بيانات الأسواق، كاش النتائج، logging) فقد تتجمد العملية الابنة
+PARALLEL_START_METHOD = "spawn"
+
+# نسخة المحرك داخل كل عملية عاملة (تُضبط مرة واحدة عبر initializer)
+_WORKER_ENGINE: Optional[BacktestEngine] = None
+
+
+def _init_worker(engine: BacktestEngine):
+    global _WORKER_ENGINE
+    _WORKER_ENGINE = engine
+
+
+def _simulate_shard(bot_ids: List[str], trading_days: List[datetime], stocks_to_use: List[str]):
+    """محاكاة مجموعة روبوتات داخل عملية عاملة وإرجاع حالتها وعدادات هذه المجموعة فقط"""
+    engine = _WORKER_ENGINE
+    bots = [bot for bot in engine.BOTS if bot["id"] in bot_ids]
+    engine.timings = RunTimings()
+    engine._counters = engine.timings.counters
+    
+    for bot_id in bot_ids:
+        engine.positions[bot_id] = {}
+        engine.closed_trades[bot_id] = []
+        engine.balances[bot_id] = engine.initial_capital
+    
+    engine._simulate(bots, trading_days, stocks_to_use)
+    
+    states = {
+        bot_id: {
+            "positions": engine.positions[bot_id],
+            "closed_trades": engine.closed_trades[bot_id],
+            "balances": engine.balances[bot_id],
+        }
+        for bot_id in bot_ids
+    }
+    return states, engine.timings.counters
@@ -0,0 +1,238 @@
+"""
+مهام المحاكاة غير المتزامنة
+===========================
+تشغيل المحاكاة في مجمع خيوط محدود بدلاً من حجز عامل uvicorn طوال المحاكاة:
+- submit: يعيد معرف المهمة فوراً
+- get: الحالة والتقدم (اليوم الحالي / إجمالي الأيام، صفقات كل روبوت) والنتيجة
+- cancel: إلغاء مهمة في الانتظار أو أثناء التشغيل
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+import logging
+import os
+import threading
+import uuid
+
+from app.services.market_data import market_data
+from app.services.result_cache import backtest_cache
+
+logger = logging.getLogger(__name__)
+
+
+def backtest_cache_key(market: str, start_date: str, initial_capital: float,
+                       strategy_overrides: Optional[Dict[str, dict]] = None) -> str:
+    """مفتاح كاش النتيجة (يشمل إصدار المحرك وبصمة ملفات البيانات الحالية)"""
+    from app.services.backtest_engine import BacktestEngine
+
+    return backtest_cache.make_key(
+        market, start_date, initial_capital,
+        BacktestEngine.ENGINE_VERSION, BacktestEngine.data_fingerprint(market),
+        strategy_overrides=strategy_overrides,
+    )
+
+
+def attach_result_metadata(results: Dict[str, Any], market: str, stocks_used) -> Dict[str, Any]:
+    """إضافة نوع السوق ومعلومات مصدر البيانات لنتيجة المحرك"""
+    results["market_type"] = market
+
+    # إضافة معلومات مصدر البيانات
+    results["data_source"] = {
+        "provider": "Yahoo Finance",
+        "type": "real_historical_data",
+        "disclaimer": "⚠️ تحذير: النتائج التاريخية لا تضمن الأداء المستقبلي. استثمر بحكمة.",
+        "stocks_used": stocks_used
+    }
+    return results
+
+
+def run_cached_backtest(start_date: str, initial_capital: float, market: str, parallel: bool = False,
+                        progress_callback: Optional[Callable] = None,
+                        cancel_event: Optional[threading.Event] = None, profile: bool = False) -> Dict[str, Any]:
+    """
+    تشغيل محاكاة (أو إرجاعها من الكاش) بنفس شكل نتيجة /api/backtest/run
+
+    profile: تشغيل المحاكاة تحت cProfile دائماً (بدون الكاش) وإرجاع التقرير تحت profile
+
+    Raises:
+        BacktestCancelled: عند الإلغاء عبر cancel_event
+    """
+    from app.services.backtest_engine import BacktestEngine
+    from app.services.run_timings import profile_call
+
+    if not profile:
+        cached = backtest_cache.get(backtest_cache_key(market, start_date, initial_capital))
+        if cached is not None:
+            return cached
+
+    # إنشاء محرك الباك تيست على مخزن الأسعار المشترك (بدون قراءة ملفات في كل طلب)
+    engine = BacktestEngine(start_date=start_date, initial_capital=initial_capital, market_type=market,
+                            price_store=market_data.get(market, start_date))
+
+    # تشغيل المحاكاة
+    report = None
+    if profile:
+        results, report = profile_call(engine.run, parallel=parallel, progress_callback=progress_callback,
+                                       cancel_event=cancel_event)
+    else:
+        results = engine.run(parallel=parallel, progress_callback=progress_callback, cancel_event=cancel_event)
+    attach_result_metadata(results, market, getattr(engine, 'available_stocks', []))
+
+    # التشغيل تحت cProfile أبطأ، فلا تُخزن أزمنته في الكاش
+    if report is not None:
+        results["profile"] = report
+        return results
+
+    # المفتاح يُحسب بعد التشغيل لأن المحرك قد ينشئ ملف الكاش أثناء التحميل
+    key = backtest_cache_key(market, start_date, initial_capital)
+    results["simulation_id"] = key
+    backtest_cache.put(key, results)
+
+    return results
+
+
+@dataclass
+class BacktestJob:
+    """مهمة محاكاة واحدة"""
+    id: str
+    params: Dict[str, Any]
+    status: str = "queued"  # queued | running | completed | failed | cancelled
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    day_idx: int = 0
+    total_days: int = 0
+    trade_counts: Dict[str, int] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "progress": {
+                "day_idx": self.day_idx,
+                "total_days": self.total_days,
+                "percent": round(self.day_idx / self.total_days * 100, 1) if self.total_days else 0.0,
+                "trade_counts": self.trade_counts,
+            },
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_result and self.status == "completed":
+            data["result"] = self.result
+        return data
+
+
+class BacktestJobManager:
+    """مدير مهام المحاكاة على مجمع خيوط محدود"""
+
+    def __init__(self, max_workers: int = 2, max_finished_jobs: int = 50):
+        """
+        Args:
+            max_workers: أقصى عدد محاكاة تعمل في نفس الوقت (الباقي ينتظر في الطابور)
+            max_finished_jobs: عدد المهام المنتهية المحفوظة للاستعلام
+        """
+        self.max_finished_jobs = max_finished_jobs
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="backtest-job")
+        self._jobs: "OrderedDict[str, BacktestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, start_date: str, initial_capital: float, market: str, parallel: bool = False) -> BacktestJob:
+        """إضافة مهمة للطابور وإرجاعها فوراً"""
+        job = BacktestJob(
+            id=uuid.uuid4().hex,
+            params={
+                "start_date": start_date,
+                "initial_capital": initial_capital,
+                "market": market,
+                "parallel": parallel,
+            },
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._execute, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[BacktestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[BacktestJob]:
+        """
+        طلب إلغاء مهمة
+
+        المهمة في الطابور تُلغى فوراً، والمهمة الجارية تتوقف عند بداية اليوم التالي
+        """
+        job = self.get(job_id)
+        if job is None or job.is_finished:
+            return job
+
+        job.cancel_event.set()
+        with self._lock:
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = datetime.now()
+        return job
+
+    def list_jobs(self):
+        with self._lock:
+            return [job.to_dict(include_result=False) for job in self._jobs.values()]
+
+    def _execute(self, job: BacktestJob):
+        from app.services.backtest_engine import BacktestCancelled
+
+        with self._lock:
+            if job.cancel_event.is_set():
+                return
+            job.status = "running"
+            job.started_at = datetime.now()
+
+        def on_progress(day_idx, total_days, trade_counts):
+            job.day_idx = day_idx
+            job.total_days = total_days
+            job.trade_counts = trade_counts
+
+        try:
+            job.result = run_cached_backtest(
+                job.params["start_date"], job.params["initial_capital"], job.params["market"],
+                parallel=job.params["parallel"], progress_callback=on_progress, cancel_event=job.cancel_event,
+            )
+            job.status = "completed"
+
+            # نتيجة من الكاش لا تمر بـ on_progress
+            if not job.total_days:
+                job.day_idx = job.total_days = 1
+        except BacktestCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.exception(f"فشلت مهمة المحاكاة {job.id}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now()
+
+    def _prune(self):
+        """حذف أقدم المهام المنتهية عند تجاوز الحد"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(len(finished) - self.max_finished_jobs, 0)]:
+            del self._jobs[job_id]
+
+
+# Singleton instance
+backtest_jobs = BacktestJobManager(
+    max_workers=int(os.getenv("TIPR_BACKTEST_JOB_WORKERS", 2)),
+)
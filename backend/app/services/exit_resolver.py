@@ -0,0 +1,77 @@
+"""
+محلل الخروج من الصفقات
+======================
+يجد شمعة الخروج لصفقة (الهدف / وقف الخسارة / انتهاء المدة) ببحث على مصفوفات
+الأسعار التالية للدخول، بدلاً من المرور يوماً بيوم في حلقة بايثون.
+
+مشترك بين BacktestEngine و universal_market_engine.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+EXIT_TAKE_PROFIT = "take_profit"
+EXIT_STOP_LOSS = "stop_loss"
+EXIT_TIMEOUT = "timeout"
+
+# حجم أول نافذة بحث (تتضاعف حتى نهاية البيانات): معظم الصفقات تُغلق خلال أيام قليلة
+INITIAL_WINDOW = 32
+
+
+def resolve_exit(close: np.ndarray, dates: np.ndarray, entry_idx: int, take_profit: float, stop_loss: float,
+                 max_days: Optional[float] = None, first_idx: Optional[int] = None,
+                 high: Optional[np.ndarray] = None, low: Optional[np.ndarray] = None) -> Tuple[Optional[int], Optional[str]]:
+    """
+    أول شمعة بعد الدخول يتحقق فيها شرط خروج
+
+    الشروط بنفس ترتيب أولوية المحرك: الهدف ثم الوقف ثم المدة
+
+    Args:
+        close: أسعار الإغلاق (NaN = لا يوجد سعر في هذا اليوم، فلا يُفحص)
+        dates: التواريخ كعدد أيام (لحساب مدة الاحتفاظ بالأيام التقويمية)
+        entry_idx: فهرس شمعة الدخول
+        take_profit: سعر الهدف (الخروج عند سعر >= الهدف)
+        stop_loss: سعر وقف الخسارة (الخروج عند سعر <= الوقف)
+        max_days: الخروج عند مدة احتفاظ >= max_days يوم (None = بلا حد)
+        first_idx: أول شمعة تُفحص (افتراضياً الشمعة التالية للدخول)
+        high / low: للفحص بأعلى/أدنى سعر الشمعة بدلاً من الإغلاق
+
+    Returns:
+        (فهرس شمعة الخروج، السبب) أو (None, None) إذا بقيت الصفقة مفتوحة حتى نهاية البيانات
+    """
+    n = len(close)
+    start = entry_idx + 1 if first_idx is None else max(first_idx, entry_idx + 1)
+    upper = high if high is not None else close
+    lower = low if low is not None else close
+
+    # أول شمعة تبلغ فيها المدة max_days: البحث عن الهدف/الوقف قبلها فقط
+    limit = n if max_days is None else int(np.searchsorted(dates, dates[entry_idx] + max_days, side="left"))
+    limit = max(limit, start)
+
+    window = INITIAL_WINDOW
+    while start < limit:
+        end = min(start + window, limit)
+        # المقارنة مع NaN تعطي False، فالأيام بلا سعر لا تُفحص
+        hit = (upper[start:end] >= take_profit) | (lower[start:end] <= stop_loss)
+        offset = int(hit.argmax())
+        if hit[offset]:
+            exit_idx = start + offset
+            return exit_idx, EXIT_TAKE_PROFIT if upper[exit_idx] >= take_profit else EXIT_STOP_LOSS
+        start = end
+        window *= 2
+
+    if max_days is None:
+        return None, None
+
+    # انتهاء المدة: أول شمعة لها سعر ابتداءً من limit (الهدف والوقف لهما الأولوية فيها)
+    for exit_idx in range(limit, n):
+        if np.isnan(close[exit_idx]):
+            continue
+        if upper[exit_idx] >= take_profit:
+            return exit_idx, EXIT_TAKE_PROFIT
+        if lower[exit_idx] <= stop_loss:
+            return exit_idx, EXIT_STOP_LOSS
+        return exit_idx, EXIT_TIMEOUT
+
+    return None, None
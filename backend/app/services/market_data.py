@@ -0,0 +1,66 @@
+"""
+سجل بيانات الأسواق المشترك
+==========================
+يحمّل أسعار كل سوق مرة واحدة داخل عملية الخادم ويعطي المحركات مرجعاً
+للقراءة فقط لنفس المخزن، بدلاً من قراءة الملفات وتحليلها في كل طلب.
+
+يُعاد التحميل تلقائياً عند تغير بصمة الملفات (وقت التعديل + الحجم).
+"""
+
+from typing import Dict, Optional, Tuple
+import threading
+
+from app.services.price_store import PriceStore
+
+
+class MarketDataRegistry:
+    """مخازن أسعار مشتركة لكل سوق مع إبطال حسب وقت تعديل الملفات"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, PriceStore]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+        self.loads = 0
+
+    def _market_lock(self, market: str) -> threading.Lock:
+        with self._registry_lock:
+            return self._locks.setdefault(market, threading.Lock())
+
+    def get(self, market: str, start_date: str = "2024-01-01") -> PriceStore:
+        """
+        مخزن أسعار السوق (للقراءة فقط)
+
+        Args:
+            market: saudi / us / crypto
+            start_date: يُستخدم فقط إذا لزم التحميل من الإنترنت
+        """
+        from app.services.backtest_engine import BacktestEngine
+
+        fingerprint = BacktestEngine.data_fingerprint(market)
+        entry = self._entries.get(market)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+
+        # قفل لكل سوق حتى لا يحمّل طلبان متزامنان نفس السوق مرتين
+        with self._market_lock(market):
+            entry = self._entries.get(market)
+            if entry and entry[0] == BacktestEngine.data_fingerprint(market):
+                return entry[1]
+
+            store = BacktestEngine.load_market_store(market, start_date).freeze()
+            self.loads += 1
+
+            # البصمة بعد التحميل لأن المحرك قد يكتب ملفات الكاش أثناءه
+            self._entries[market] = (BacktestEngine.data_fingerprint(market), store)
+            return store
+
+    def invalidate(self, market: Optional[str] = None):
+        """إجبار إعادة التحميل (لسوق واحد أو لكل الأسواق)"""
+        if market is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(market, None)
+
+
+# Singleton instance
+market_data = MarketDataRegistry()
@@ -0,0 +1,71 @@
+"""
+ميزانية الذاكرة للمحاكاة
+========================
+المصفوفات الكبيرة في المحرك (الأسعار، التقويم، المؤشرات، الإشارات، الرصيد اليومي)
+معروفة الحجم قبل إنشائها: تُحجز من الميزانية أولاً، وإذا تجاوز المجموع الحد
+يتوقف المحرك برفع MemoryBudgetExceeded قبل أن يستهلك الذاكرة فعلاً.
+
+التقرير (report) يضاف للنتائج: حجم كل مكوّن + أقصى ذاكرة فعلية للعملية (RSS).
+"""
+
+from typing import Dict, Optional
+import sys
+
+MB = 1024 * 1024
+
+
+class MemoryBudgetExceeded(Exception):
+    """حجم مصفوفات المحاكاة تجاوز ميزانية الذاكرة المحددة"""
+
+
+def peak_rss_mb() -> Optional[float]:
+    """أقصى ذاكرة مستخدمة للعملية الحالية (ميغابايت)، أو None إذا لم تكن متاحة (ويندوز)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # لينكس بالكيلوبايت، macOS بالبايت
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+
+class MemoryBudget:
+    """حجوزات مصفوفات محاكاة واحدة مقابل حد أقصى (None = بدون حد، تقرير فقط)"""
+
+    def __init__(self, budget_mb: Optional[float] = None):
+        self.budget_mb = budget_mb
+        self.components: Dict[str, int] = {}
+
+    @property
+    def reserved_bytes(self) -> int:
+        return sum(self.components.values())
+
+    def reserve(self, name: str, nbytes: int):
+        """
+        حجز حجم مكوّن قبل إنشائه (إعادة الحجز بنفس الاسم تستبدل الحجم السابق)
+
+        Raises:
+            MemoryBudgetExceeded: إذا تجاوز مجموع الحجوزات الميزانية
+        """
+        previous = self.components.get(name)
+        self.components[name] = int(nbytes)
+        if self.budget_mb is not None and self.reserved_bytes > self.budget_mb * MB:
+            total_mb = self.reserved_bytes / MB
+            if previous is None:
+                del self.components[name]
+            else:
+                self.components[name] = previous
+            raise MemoryBudgetExceeded(
+                f"ميزانية الذاكرة {self.budget_mb:.0f}MB لا تكفي: {name} يحتاج {nbytes / MB:.1f}MB "
+                f"(المجموع {total_mb:.1f}MB)"
+            )
+
+    def report(self) -> Dict:
+        peak = peak_rss_mb()
+        return {
+            "budget_mb": self.budget_mb,
+            "reserved_mb": round(self.reserved_bytes / MB, 1),
+            "components_mb": {name: round(nbytes / MB, 1) for name, nbytes in self.components.items()},
+            "peak_rss_mb": round(peak, 1) if peak is not None else None,
+        }
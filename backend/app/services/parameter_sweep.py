@@ -0,0 +1,266 @@
+"""
+مسح معاملات استراتيجيات الروبوتات
+=================================
+تقييم كل تركيبات (take_profit × stop_loss × max_days) لكل روبوت على إشارات
+الدخول المحسوبة مسبقاً في المحرك (الإشارات لا تعتمد على معاملات الخروج).
+
+الخروج يُحسب بشكل متجه لكل الصفقات وكل التركيبات معاً: أول شمعة يتجاوز فيها
+الإغلاق الهدف أو وقف الخسارة، أو يصل فيها عمر الصفقة إلى max_days (أيام تقويمية
+مثل المحرك)، وإلا الإغلاق في آخر شمعة.
+
+⚠️ تقدير على مستوى الإشارات: كل سهم مستقل (لا دخول جديد قبل خروج الصفقة السابقة
+على نفس السهم)، بدون حد الصفقات المفتوحة أو صفقة واحدة في اليوم، وبدون الوقف
+المتحرك والتعزيز الخاص بالمايسترو. التركيبات الأفضل يمكن تأكيدها بمحاكاة كاملة (verify_top).
+"""
+
+from itertools import product
+from typing import Any, Dict, List, Optional
+import time
+
+import numpy as np
+
+# نسبة التخصيص الافتراضية لكل صفقة في المحرك (لحساب العائد المركب التقريبي)
+DEFAULT_ALLOCATION = 0.20
+
+# الحد الأقصى لعدد التركيبات لكل روبوت
+MAX_COMBINATIONS_PER_BOT = 5000
+
+SWEEP_KEYS = ("take_profit", "stop_loss", "max_days")
+
+
+class ParameterSweep:
+    """مسح معاملات الخروج على إشارات دخول محرك جاهز"""
+
+    def __init__(self, engine, allocation: float = DEFAULT_ALLOCATION):
+        """
+        Args:
+            engine: BacktestEngine محمّل (تُستخدم أسعاره وإشارات دخوله فقط)
+            allocation: نسبة رأس المال لكل صفقة في حساب العائد المركب
+        """
+        self.engine = engine
+        self.allocation = allocation
+
+    def expand_grid(self, bot_id: str, grid: Dict[str, List[float]]) -> np.ndarray:
+        """
+        كل تركيبات شبكة روبوت كمصفوفة (عدد التركيبات × 3)
+
+        المعامل غير المذكور في الشبكة يأخذ قيمته الحالية من BOT_STRATEGIES
+        """
+        unknown = set(grid) - set(SWEEP_KEYS)
+        if unknown:
+            raise ValueError(f"مفاتيح غير مدعومة لـ {bot_id}: {sorted(unknown)}")
+
+        current = self.engine._get_bot_strategy(bot_id)
+        axes = [list(grid.get(key, [current[key]])) for key in SWEEP_KEYS]
+        if any(not values for values in axes):
+            raise ValueError(f"شبكة فارغة لـ {bot_id}")
+
+        combos = np.array(list(product(*axes)), dtype=np.float64)
+        if len(combos) > MAX_COMBINATIONS_PER_BOT:
+            raise ValueError(f"عدد التركيبات لـ {bot_id} ({len(combos)}) يتجاوز {MAX_COMBINATIONS_PER_BOT}")
+        if np.any(combos[:, 2] < 1):
+            raise ValueError(f"max_days يجب أن يكون 1 على الأقل ({bot_id})")
+        return combos
+
+    def evaluate_bot(self, bot_id: str, combos: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        مقاييس كل تركيبة لروبوت واحد مجمعة على كل الأسهم
+
+        Returns:
+            trades, wins, sum_returns, log_growth: مصفوفات بطول عدد التركيبات
+        """
+        engine = self.engine
+        b_idx = engine._bot_pos[bot_id]
+        stocks = getattr(engine, "available_stocks", engine.store.symbols)
+
+        totals = {
+            "trades": np.zeros(len(combos), dtype=np.int64),
+            "wins": np.zeros(len(combos), dtype=np.int64),
+            "sum_returns": np.zeros(len(combos)),
+            "log_growth": np.zeros(len(combos)),
+        }
+
+        for symbol in stocks:
+            if symbol not in engine.store:
+                continue
+            close = engine.store.close(symbol)
+            n = len(close)
+            entries = np.flatnonzero(engine.entry_signals[b_idx, engine._symbol_pos[symbol], :n])
+            if len(entries) == 0:
+                continue
+
+            returns, visited = self._evaluate_symbol(close, engine.store.dates(symbol), entries, combos)
+            totals["trades"] += visited.sum(axis=0)
+            totals["wins"] += (visited & (returns >= 0)).sum(axis=0)
+            totals["sum_returns"] += np.where(visited, returns, 0.0).sum(axis=0)
+            totals["log_growth"] += np.where(visited, np.log1p(self.allocation * returns), 0.0).sum(axis=0)
+
+        return totals
+
+    def _evaluate_symbol(self, close: np.ndarray, dates: np.ndarray, entries: np.ndarray, combos: np.ndarray):
+        """
+        عوائد كل صفقة محتملة × كل تركيبة، ومن منها يُنفذ فعلاً (بدون تداخل على نفس السهم)
+
+        Returns:
+            returns, visited: مصفوفتان (عدد الإشارات × عدد التركيبات)
+        """
+        n = len(close)
+        last = n - 1
+        take_profits = np.unique(combos[:, 0])
+        stop_losses = np.unique(combos[:, 1])
+        max_days = np.unique(combos[:, 2])
+
+        # الخروج الزمني: أول شمعة تاريخها >= تاريخ الدخول + max_days (E × M)
+        time_exit = np.searchsorted(dates, dates[entries][:, None] + max_days[None, :], side="left")
+
+        # نافذة العوائد المستقبلية حتى أبعد خروج زمني ممكن (E × K)
+        horizon = int(max(1, min(last, (np.minimum(time_exit, last) - entries[:, None]).max(initial=1))))
+        offsets = np.arange(1, horizon + 1)
+        forward = entries[:, None] + offsets[None, :]
+        in_range = forward <= last
+        forward_returns = np.where(in_range, close[np.minimum(forward, last)] / close[entries][:, None] - 1, np.nan)
+
+        # أول تجاوز للهدف/الوقف = أول موضع يصل فيه الحد الأقصى/الأدنى التراكمي للمستوى
+        running_max = np.fmax.accumulate(np.where(in_range, forward_returns, -np.inf), axis=1)
+        running_min = np.fmin.accumulate(np.where(in_range, forward_returns, np.inf), axis=1)
+        tp_hit = self._first_crossing(running_max[:, :, None] >= take_profits[None, None, :] / 100, entries, n)  # E × T
+        sl_hit = self._first_crossing(running_min[:, :, None] <= stop_losses[None, None, :] / 100, entries, n)   # E × S
+
+        t_pos = np.searchsorted(take_profits, combos[:, 0])
+        s_pos = np.searchsorted(stop_losses, combos[:, 1])
+        m_pos = np.searchsorted(max_days, combos[:, 2])
+
+        # خروج كل إشارة لكل تركيبة (E × C): الأسبق بين الهدف والوقف والمدة
+        exit_idx = np.minimum(np.minimum(tp_hit[:, t_pos], sl_hit[:, s_pos]), time_exit[:, m_pos])
+        forced = exit_idx > last
+        exit_idx = np.minimum(exit_idx, last)
+        returns = close[exit_idx] / close[entries][:, None] - 1
+
+        # الإشارة التالية المتاحة بعد الخروج (الدخول ممكن في يوم الخروج نفسه)
+        next_pos = np.searchsorted(entries, exit_idx, side="left")
+        next_pos[forced] = len(entries)
+
+        # تتبع سلسلة الصفقات لكل التركيبات معاً
+        visited = np.zeros(exit_idx.shape, dtype=bool)
+        columns = np.arange(len(combos))
+        current = np.zeros(len(combos), dtype=np.int64)
+        active = current < len(entries)
+        while active.any():
+            rows, cols = current[active], columns[active]
+            visited[rows, cols] = True
+            current[active] = next_pos[rows, cols]
+            active = current < len(entries)
+
+        return returns, visited
+
+    @staticmethod
+    def _first_crossing(crossed: np.ndarray, entries: np.ndarray, n: int) -> np.ndarray:
+        """فهرس أول شمعة تحقق الشرط (E × L)، أو n إذا لم يتحقق"""
+        found = crossed.any(axis=1)
+        first = crossed.argmax(axis=1) + 1 + entries[:, None]
+        return np.where(found, first, n)
+
+    def run(self, grids: Dict[str, Dict[str, List[float]]], top: int = 20) -> Dict[str, Any]:
+        """
+        مسح كل الشبكات وترتيب التركيبات لكل روبوت حسب العائد المركب
+
+        Args:
+            grids: {bot_id: {"take_profit": [...], "stop_loss": [...], "max_days": [...]}}
+            top: عدد الصفوف المعادة لكل روبوت
+        """
+        start = time.perf_counter()
+        bot_ids = {bot["id"] for bot in self.engine.BOTS}
+        bots = {}
+        total_combinations = 0
+
+        for bot_id, grid in grids.items():
+            if bot_id not in bot_ids:
+                raise ValueError(f"روبوت غير معروف: {bot_id}")
+
+            combos = self.expand_grid(bot_id, grid)
+            totals = self.evaluate_bot(bot_id, combos)
+            total_combinations += len(combos)
+
+            trades = totals["trades"]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                win_rate = np.where(trades > 0, totals["wins"] / trades * 100, 0.0)
+                avg_return = np.where(trades > 0, totals["sum_returns"] / trades * 100, 0.0)
+            total_return = np.expm1(totals["log_growth"]) * 100
+
+            current = self.engine._get_bot_strategy(bot_id)
+            rows = [
+                {
+                    "take_profit": float(tp),
+                    "stop_loss": float(sl),
+                    "max_days": int(md),
+                    "trades": int(trades[i]),
+                    "win_rate": round(float(win_rate[i]), 1),
+                    "avg_return_pct": round(float(avg_return[i]), 2),
+                    "total_return_pct": round(float(total_return[i]), 2),
+                    "is_current": (tp, sl, md) == (current["take_profit"], current["stop_loss"], current["max_days"]),
+                }
+                for i, (tp, sl, md) in enumerate(combos)
+            ]
+            rows.sort(key=lambda row: (row["total_return_pct"], row["win_rate"]), reverse=True)
+            for rank, row in enumerate(rows, 1):
+                row["rank"] = rank
+
+            bots[bot_id] = {
+                "combinations": len(combos),
+                "current": next((row for row in rows if row["is_current"]), None),
+                "ranked": rows[:top],
+            }
+
+        return {
+            "market_type": self.engine.market_type,
+            "combinations": total_combinations,
+            "elapsed_sec": round(time.perf_counter() - start, 3),
+            "allocation": self.allocation,
+            "bots": bots,
+        }
+
+
+def run_sweep(market: str, grids: Dict[str, Dict[str, List[float]]], top: int = 20, verify_top: int = 0,
+              start_date: str = "2024-01-01", initial_capital: float = 100000) -> Dict[str, Any]:
+    """
+    مسح معاملات سوق كامل على بيانات سجل market_data المشترك
+
+    verify_top: تأكيد أفضل N تركيبات لكل روبوت بمحاكاة كاملة (run_batch)
+    """
+    from app.services.backtest_engine import BacktestEngine
+    from app.services.market_data import market_data
+
+    engine = BacktestEngine(start_date, initial_capital, market, price_store=market_data.get(market, start_date))
+    results = ParameterSweep(engine).run(grids, top=top)
+
+    if verify_top > 0:
+        _verify_top_rows(results, market, start_date, initial_capital, verify_top)
+
+    return results
+
+
+def _verify_top_rows(results: Dict[str, Any], market: str, start_date: str, initial_capital: float,
+                     verify_top: int):
+    """إضافة verified_profit_pct (ربح الروبوت في المحاكاة الكاملة) لأفضل الصفوف"""
+    from app.services.backtest_batch import run_batch
+
+    targets = []
+    for bot_id, bot in results["bots"].items():
+        for row in bot["ranked"][:verify_top]:
+            targets.append((bot_id, row))
+
+    runs = [
+        {
+            "market": market,
+            "start_date": start_date,
+            "initial_capital": initial_capital,
+            "strategy_overrides": {bot_id: {key: row[key] for key in SWEEP_KEYS}},
+        }
+        for bot_id, row in targets
+    ]
+    for (bot_id, row), output in zip(targets, run_batch(runs, summary_only=True)):
+        if "result" in output:
+            entry: Optional[dict] = next(
+                (item for item in output["result"]["leaderboard"] if item["bot_id"] == bot_id), None
+            )
+            row["verified_profit_pct"] = entry["total_profit_pct"] if entry else None
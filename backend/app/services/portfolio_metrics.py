@@ -0,0 +1,98 @@
+"""
+منحنى الرصيد اليومي ومقاييس المخاطرة
+====================================
+الرصيد اليومي لكل روبوت بالقيمة السوقية (Mark-to-Market) من سجل الصفقات:
+كميات المراكز المفتوحة في كل يوم × مصفوفة الإغلاق على تقويم المحاكاة،
+بعمليات على المصفوفات بدلاً من البحث عن سعر كل صفقة في كل يوم.
+
+ومنه: أقصى تراجع، شارب، سورتينو، نسبة التعرض، ومعدل الدوران.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+# عدد أيام التداول في السنة (لتحويل المقاييس اليومية إلى سنوية)
+TRADING_DAYS_PER_YEAR = 252
+
+
+def forward_fill(closes: np.ndarray) -> np.ndarray:
+    """
+    ملء الأيام بلا سعر بآخر إغلاق سابق (أسهم × أيام)
+
+    الأيام قبل أول شمعة للسهم تصبح 0 (لا يمكن أن يكون فيها مركز مفتوح)
+    """
+    has_price = ~np.isnan(closes)
+    last_idx = np.where(has_price, np.arange(closes.shape[1]), 0)
+    np.maximum.accumulate(last_idx, axis=1, out=last_idx)
+    filled = np.take_along_axis(closes, last_idx, axis=1)
+    return np.nan_to_num(filled, nan=0.0)
+
+
+def daily_equity(trades: np.ndarray, lots: np.ndarray, closes: np.ndarray, calendar: np.ndarray,
+                 initial_capital: float):
+    """
+    الرصيد اليومي لروبوت واحد
+
+    Args:
+        trades: صفقات الروبوت من سجل الصفقات (trade_log.TRADE_LOG_DTYPE)
+        lots: دفعات شراء نفس الصفقات (trade_log.LOT_LOG_DTYPE)
+        closes: إغلاق كل سهم على التقويم بعد forward_fill (أسهم × أيام)
+        calendar: أيام التقويم (أيام منذ 1970-01-01)
+
+    Returns:
+        (الرصيد اليومي، قناع الأيام التي فيها مركز مفتوح)
+
+    كل دفعة محتفظ بها من يوم شرائها حتى يوم خروج صفقتها (بدونه)، وفي يوم الخروج
+    يُضاف ربح الصفقة المحقق كما أُضيف لرصيد الروبوت في المحرك
+    """
+    n_symbols, n_days = closes.shape
+    trades = trades[trades["symbol"] >= 0]
+    lots = lots[lots["symbol"] >= 0]
+
+    entry = np.searchsorted(calendar, lots["entry_day"])
+    exit_ = np.minimum(np.searchsorted(calendar, lots["exit_day"]), n_days - 1)
+    quantity = lots["quantity"].astype(np.float64)
+
+    # كمية وتكلفة المراكز في كل يوم: فروق عند الشراء والخروج ثم مجموع تراكمي
+    def held(values):
+        flat = np.bincount(lots["symbol"] * n_days + entry, weights=values, minlength=n_symbols * n_days)
+        flat -= np.bincount(lots["symbol"] * n_days + exit_, weights=values, minlength=n_symbols * n_days)
+        return np.cumsum(flat.reshape(n_symbols, n_days), axis=1)
+
+    held_quantity = held(quantity)
+    unrealized = (held_quantity * closes - held(lots["cost"])).sum(axis=0)
+
+    trade_exit = np.minimum(np.searchsorted(calendar, trades["exit_day"]), n_days - 1)
+    realized_to_date = np.cumsum(np.bincount(trade_exit, weights=trades["profit"], minlength=n_days))
+
+    equity = initial_capital + realized_to_date + unrealized
+    exposed = (np.abs(held_quantity) > 1e-9).any(axis=0)
+    return equity, exposed
+
+
+def risk_metrics(equity: np.ndarray, initial_capital: float, exposed: np.ndarray, traded_value: float,
+                 periods_per_year: int = TRADING_DAYS_PER_YEAR) -> Dict[str, float]:
+    """
+    مقاييس المخاطرة من الرصيد اليومي
+
+    Returns:
+        max_drawdown (%)، sharpe_ratio و sortino_ratio (سنوية، بدون عائد خالٍ من المخاطر)،
+        exposure_pct (% من الأيام فيها مركز مفتوح)، turnover (قيمة التداول ÷ متوسط الرصيد)
+    """
+    curve = np.concatenate(([initial_capital], equity))
+    peak = np.maximum.accumulate(curve)
+    max_drawdown = float(((peak - curve) / peak).max() * 100)
+
+    returns = curve[1:] / curve[:-1] - 1
+    scale = np.sqrt(periods_per_year)
+    volatility = returns.std()
+    downside = np.sqrt(np.mean(np.minimum(returns, 0) ** 2)) if len(returns) else 0.0
+
+    return {
+        "max_drawdown": max_drawdown,
+        "sharpe_ratio": float(returns.mean() / volatility * scale) if volatility > 0 else 0.0,
+        "sortino_ratio": float(returns.mean() / downside * scale) if downside > 0 else 0.0,
+        "exposure_pct": float(exposed.mean() * 100) if len(exposed) else 0.0,
+        "turnover": float(traded_value / curve.mean()),
+    }
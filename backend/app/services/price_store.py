@@ -0,0 +1,333 @@
+"""
+مخزن الأسعار العمودي (Struct of Arrays)
+=======================================
+يحفظ بيانات كل سهم كمصفوفات NumPy متجاورة بدلاً من قوائم قواميس:
+- dates: int64 (عدد الأيام منذ 1970-01-01، مرتبة تصاعدياً)
+- open / high / low / close: float64 (أو float32 للأسواق الكبيرة، انظر price_dtype)
+- volume: int64
+
+مع واجهة توافق (as_records) للكود الذي ما زال يقرأ صفوفاً كقواميس،
+وصيغة كاش ثنائية (.npz غير مضغوط) تُحمّل بدون تحليل JSON أو strptime.
+"""
+
+from collections.abc import Mapping, Sequence
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+import json
+import math
+import os
+
+import numpy as np
+
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+PRICE_FIELDS = ("open", "high", "low", "close")
+FIELDS = ("dates",) + PRICE_FIELDS + ("volume",)
+
+
+def to_day_number(value) -> int:
+    """تحويل date/datetime إلى عدد الأيام منذ 1970-01-01"""
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def from_day_number(day: int) -> datetime:
+    """تحويل عدد الأيام منذ 1970-01-01 إلى datetime (منتصف الليل)"""
+    return EPOCH + timedelta(days=int(day))
+
+
+def as_float64(values) -> np.ndarray:
+    """
+    قيم بدقة float64 للحساب والعرض
+
+    قيم float32 تُقرب لسبع خانات معنوية (حدود دقة float32) فتعود لقيمها العشرية
+    الأصلية: 87.9 بدلاً من 87.9000015258789
+    """
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        return np.asarray(values, dtype=np.float64)
+
+    wide = values.astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = 10.0 ** (6 - np.floor(np.log10(np.abs(wide))))
+    # الصفر و NaN والقيم فوق 10^7 تبقى كما هي
+    exact = np.isfinite(scale) & (scale >= 1)
+    return np.where(exact, np.round(wide * np.where(exact, scale, 1.0)) / np.where(exact, scale, 1.0), wide)
+
+
+def as_float(value) -> float:
+    """قيمة float32 واحدة بنفس تقريب as_float64 (بدون إنشاء مصفوفة، للقراءات المفردة)"""
+    value = float(value)
+    if value == 0 or not math.isfinite(value) or abs(value) >= 1e7:
+        return value
+    return float(f"{value:.7g}")
+
+
+class PriceStore:
+    """مخزن أسعار عمودي لعدة أسهم"""
+
+    def __init__(self, price_dtype=np.float64):
+        """
+        Args:
+            price_dtype: نوع أعمدة الأسعار (float32 يقلل الذاكرة للنصف لمئات الأسهم)
+        """
+        self.price_dtype = np.dtype(price_dtype)
+        self._columns: Dict[str, Dict[str, np.ndarray]] = {}
+
+    @classmethod
+    def from_records(cls, records_by_symbol: Dict[str, List[Dict]], price_dtype=np.float64) -> "PriceStore":
+        """
+        بناء المخزن من قوائم الصفوف (الشكل القديم: date, open, high, low, close, volume)
+
+        Args:
+            records_by_symbol: {symbol: [{"date": datetime, "open": ..., ...}]}
+        """
+        store = cls(price_dtype)
+        for symbol, records in records_by_symbol.items():
+            n = len(records)
+            store.add_symbol(
+                symbol,
+                dates=np.fromiter((to_day_number(r["date"]) for r in records), dtype=np.int64, count=n),
+                **{
+                    field: np.fromiter((r[field] for r in records), dtype=np.float64, count=n)
+                    for field in PRICE_FIELDS
+                },
+                volume=np.fromiter((r["volume"] for r in records), dtype=np.int64, count=n),
+            )
+        return store
+
+    @classmethod
+    def from_json_cache(cls, path: str) -> "PriceStore":
+        """
+        تحويل ملف كاش JSON القديم ({symbol: [{"date": "YYYY-MM-DDTHH:MM:SS", ...}]})
+        
+        التواريخ تُحوّل دفعة واحدة عبر datetime64 بدلاً من strptime لكل صف
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            cached_data = json.load(f)
+        
+        store = cls()
+        for symbol, records in cached_data.items():
+            if not records:
+                continue
+            dates = np.array([r["date"] for r in records], dtype="datetime64[s]").astype("datetime64[D]")
+            store.add_symbol(
+                symbol,
+                dates=dates.astype(np.int64),
+                **{field: [r[field] for r in records] for field in PRICE_FIELDS},
+                volume=[r["volume"] for r in records],
+            )
+        return store
+    
+    def add_symbol(self, symbol: str, dates, open, high, low, close, volume):
+        """إضافة (أو استبدال) سلسلة سهم كاملة"""
+        columns = {
+            "dates": np.ascontiguousarray(dates, dtype=np.int64),
+            "open": np.ascontiguousarray(open, dtype=self.price_dtype),
+            "high": np.ascontiguousarray(high, dtype=self.price_dtype),
+            "low": np.ascontiguousarray(low, dtype=self.price_dtype),
+            "close": np.ascontiguousarray(close, dtype=self.price_dtype),
+            "volume": np.ascontiguousarray(volume, dtype=np.int64),
+        }
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError(f"أطوال أعمدة {symbol} غير متساوية: {lengths}")
+
+        self._columns[symbol] = columns
+
+    # =============== القراءة ===============
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._columns.keys())
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self._columns
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def length(self, symbol: str) -> int:
+        """عدد شموع السهم"""
+        return len(self._columns[symbol]["dates"])
+
+    def column(self, symbol: str, field: str) -> np.ndarray:
+        """عمود كامل لسهم (dates, open, high, low, close, volume)"""
+        return self._columns[symbol][field]
+
+    def dates(self, symbol: str) -> np.ndarray:
+        return self._columns[symbol]["dates"]
+
+    def close(self, symbol: str) -> np.ndarray:
+        return self._columns[symbol]["close"]
+
+    def volume(self, symbol: str) -> np.ndarray:
+        return self._columns[symbol]["volume"]
+
+    def datetimes(self, symbol: str) -> List[datetime]:
+        """تواريخ السهم كـ datetime"""
+        return [from_day_number(day) for day in self._columns[symbol]["dates"].tolist()]
+
+    def index_of(self, symbol: str, day) -> Optional[int]:
+        """
+        فهرس شمعة السهم في تاريخ معين (بحث ثنائي في عمود التواريخ)
+
+        بدون قاموس {يوم: فهرس} لكل سهم: مئات الأسهم × آلاف الأيام كانت كائنات
+        بايثون بحجم أكبر من الأسعار نفسها، والحلقات الساخنة تستخدم TradingCalendar
+
+        Args:
+            day: date/datetime أو عدد الأيام منذ 1970-01-01
+
+        Returns:
+            الفهرس أو None إذا لم يتداول السهم في هذا اليوم
+        """
+        if symbol not in self._columns:
+            return None
+        if isinstance(day, (date, datetime)):
+            day = to_day_number(day)
+        dates = self._columns[symbol]["dates"]
+        idx = int(np.searchsorted(dates, day))
+        return idx if idx < len(dates) and dates[idx] == day else None
+
+    def bar(self, symbol: str, idx: int) -> Dict:
+        """صف واحد كقاموس (نفس شكل البيانات القديمة)"""
+        columns = self._columns[symbol]
+        price = float if self.price_dtype == np.float64 else as_float
+        return {
+            "date": from_day_number(columns["dates"][idx]),
+            "open": price(columns["open"][idx]),
+            "high": price(columns["high"][idx]),
+            "low": price(columns["low"][idx]),
+            "close": price(columns["close"][idx]),
+            "volume": int(columns["volume"][idx]),
+        }
+
+    def rows(self, symbol: str) -> List[Dict]:
+        """كل صفوف السهم كقائمة قواميس (للتصدير والكود القديم)"""
+        return [self.bar(symbol, idx) for idx in range(self.length(symbol))]
+
+    def extended(self, new_bars: Dict[str, List[Dict]]) -> "PriceStore":
+        """
+        نسخة جديدة من المخزن مع إضافة شموع بعد آخر تاريخ لكل سهم
+        
+        المخزن الأصلي لا يتغير (قد يكون مشتركاً ومجمّداً)، والشموع المكررة أو الأقدم تُتجاهل
+        """
+        store = PriceStore(self.price_dtype)
+        for symbol in self.symbols:
+            store.add_symbol(symbol, **self._columns[symbol])
+        
+        for symbol, bars in new_bars.items():
+            last_day = int(self.dates(symbol)[-1]) if symbol in self and self.length(symbol) else None
+            fresh = sorted(
+                (bar for bar in bars if last_day is None or to_day_number(bar["date"]) > last_day),
+                key=lambda bar: bar["date"],
+            )
+            if not fresh:
+                continue
+            
+            addition = PriceStore.from_records({symbol: fresh}, self.price_dtype)
+            if symbol in self:
+                columns = {
+                    field: np.concatenate([self._columns[symbol][field], addition.column(symbol, field)])
+                    for field in FIELDS
+                }
+            else:
+                columns = {field: addition.column(symbol, field) for field in FIELDS}
+            store.add_symbol(symbol, **columns)
+        
+        return store
+    
+    def subset(self, symbols: Sequence[str], price_dtype=None) -> "PriceStore":
+        """
+        نسخة تحتوي الأسهم symbols فقط (بترتيبها، والغائبة عن المخزن تُتجاهل)
+
+        price_dtype: تحويل أعمدة الأسعار (None = نفس نوع هذا المخزن)
+        """
+        store = PriceStore(self.price_dtype if price_dtype is None else price_dtype)
+        for symbol in symbols:
+            if symbol in self._columns and symbol not in store:
+                store.add_symbol(symbol, **self._columns[symbol])
+        return store
+
+    def freeze(self) -> "PriceStore":
+        """جعل كل الأعمدة للقراءة فقط (للمخازن المشتركة بين عدة محركات)"""
+        for columns in self._columns.values():
+            for values in columns.values():
+                values.flags.writeable = False
+        return self
+    
+    def as_records(self) -> "RecordsView":
+        """واجهة توافق: {symbol: قائمة صفوف} تُبنى صفوفها عند القراءة فقط"""
+        return RecordsView(self)
+
+    def nbytes(self) -> int:
+        """حجم المصفوفات في الذاكرة بالبايت"""
+        return sum(values.nbytes for columns in self._columns.values() for values in columns.values())
+    
+    # =============== الكاش الثنائي ===============
+    
+    def save_npz(self, path: str):
+        """
+        حفظ المخزن كملف .npz غير مضغوط (مصفوفة لكل عمود لكل سهم)
+        
+        الكتابة لملف مؤقت ثم إعادة تسمية، حتى لا يقرأ أي محرك ملفاً ناقصاً
+        """
+        arrays = {"symbols": np.array(self.symbols, dtype=np.str_)}
+        for i, symbol in enumerate(self.symbols):
+            for field in FIELDS:
+                arrays[f"{i}_{field}"] = self._columns[symbol][field]
+        
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load_npz(cls, path: str, price_dtype=np.float64) -> "PriceStore":
+        """تحميل مخزن محفوظ بـ save_npz"""
+        store = cls(price_dtype)
+        with np.load(path, allow_pickle=False) as archive:
+            for i, symbol in enumerate(archive["symbols"].tolist()):
+                store.add_symbol(symbol, **{field: archive[f"{i}_{field}"] for field in FIELDS})
+        return store
+
+
+class SymbolRecords(Sequence):
+    """صفوف سهم واحد كتسلسل قواميس يُبنى كل صف منها عند طلبه"""
+
+    def __init__(self, store: PriceStore, symbol: str):
+        self._store = store
+        self._symbol = symbol
+
+    def __len__(self) -> int:
+        return self._store.length(self._symbol)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._store.bar(self._symbol, i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return self._store.bar(self._symbol, idx)
+
+
+class RecordsView(Mapping):
+    """عرض PriceStore بشكل {symbol: [rows]} القديم"""
+
+    def __init__(self, store: PriceStore):
+        self._store = store
+
+    def __getitem__(self, symbol: str) -> SymbolRecords:
+        if symbol not in self._store:
+            raise KeyError(symbol)
+        return SymbolRecords(self._store, symbol)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._store)
+
+    def __len__(self) -> int:
+        return len(self._store)
@@ -0,0 +1,170 @@
+"""
+كاش نتائج المحاكاة
+==================
+يخزن نتائج /api/backtest/run حسب المدخلات وبصمة مصدر البيانات
+(LRU في الذاكرة مع حفظ اختياري على القرص ليبقى الكاش دافئاً بعد إعادة التشغيل)
+
+النتائج تُخزن مُسلسلة (pickle)، فكل get/latest تعيد نسخة مستقلة: تعديلها لا يغير
+النتيجة المخزنة، وتعديل النتيجة بعد put لا يصل إلى الكاش
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BacktestResultCache:
+    """كاش LRU محدود لنتائج المحاكاة"""
+
+    def __init__(self, max_entries: int = 32, persist_dir: Optional[str] = None):
+        """
+        Args:
+            max_entries: أقصى عدد نتائج في الذاكرة (وعلى القرص)
+            persist_dir: مجلد الحفظ على القرص (None = ذاكرة فقط)
+        """
+        self.max_entries = max_entries
+        self.persist_dir = persist_dir
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_key: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(market: str, start_date: str, initial_capital: float, engine_version: str,
+                 data_fingerprint: str, end_date: Optional[str] = None,
+                 strategy_overrides: Optional[Dict[str, dict]] = None) -> str:
+        """
+        مفتاح الكاش من كل ما يؤثر على النتيجة
+
+        end_date: تاريخ نهاية المحاكاة (افتراضياً اليوم، لأن المحرك يحاكي حتى الآن)
+        strategy_overrides: تعديلات استراتيجيات الروبوتات (إن وجدت)
+        """
+        parts: Tuple = (
+            market,
+            start_date,
+            float(initial_capital),
+            engine_version,
+            data_fingerprint,
+            end_date or datetime.now().strftime("%Y-%m-%d"),
+        )
+        if strategy_overrides:
+            parts += (strategy_overrides,)
+        return hashlib.sha1(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """نسخة من النتيجة المخزنة أو None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if data is not None:
+            return pickle.loads(data)
+
+        result = self._load_from_disk(key)
+        if result is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.hits += 1
+            self._store(key, data)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """تخزين نسخة من النتيجة (مع إزالة الأقدم استخداماً عند الامتلاء)"""
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(key, data)
+            self._last_key = key
+        self._save_to_disk(key, result)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """نسخة من آخر نتيجة مكتملة تم تخزينها (إن بقيت في الكاش)"""
+        with self._lock:
+            data = self._entries.get(self._last_key) if self._last_key else None
+        return pickle.loads(data) if data is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._last_key = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "persist_dir": self.persist_dir,
+        }
+
+    def _store(self, key: str, data: bytes):
+        self._entries[key] = data
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # =============== الحفظ على القرص ===============
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def _load_from_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.persist_dir or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"فشل قراءة نتيجة مخزنة {key}: {e}")
+            return None
+
+    def _save_to_disk(self, key: str, result: Dict[str, Any]):
+        if not self.persist_dir:
+            return
+        try:
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            self._prune_disk()
+        except Exception as e:
+            logger.warning(f"فشل حفظ نتيجة المحاكاة على القرص: {e}")
+
+    def _prune_disk(self):
+        """إبقاء أحدث max_entries ملف فقط"""
+        files = [
+            os.path.join(self.persist_dir, name)
+            for name in os.listdir(self.persist_dir)
+            if name.endswith(".json")
+        ]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Singleton instance
+# TIPR_BACKTEST_CACHE_DIR: مجلد اختياري لحفظ النتائج على القرص
+backtest_cache = BacktestResultCache(
+    max_entries=int(os.getenv("TIPR_BACKTEST_CACHE_SIZE", 32)),
+    persist_dir=os.getenv("TIPR_BACKTEST_CACHE_DIR") or None,
+)
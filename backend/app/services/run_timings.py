@@ -0,0 +1,82 @@
+"""
+مؤقتات وعدادات المحاكاة
+=======================
+قياس زمن كل مرحلة (وقت فعلي + وقت معالج) وعدادات العمليات داخل المحرك،
+لمعرفة أين يذهب الوقت عند بطء محاكاة: تحميل الأسعار، المؤشرات، الإشارات،
+الخروج، أو بناء النتائج.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Tuple
+import io
+import time
+
+
+class RunTimings:
+    """مؤقتات المراحل وعدادات محاكاة واحدة"""
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        """قياس الوقت الفعلي ووقت المعالج لمرحلة (تتراكم عند تكرار نفس الاسم)"""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add(self, name: str, wall: float, cpu: float = None, calls: int = 1):
+        """
+        إضافة زمن لمرحلة
+
+        cpu=None للمراحل الداخلية المقاسة بالوقت الفعلي فقط (قياس وقت المعالج
+        في كل يوم وروبوت مكلف مقارنة بالعمل نفسه)
+        """
+        entry = self.phases.setdefault(name, {"wall": 0.0, "cpu": None, "calls": 0})
+        entry["wall"] += wall
+        if cpu is not None:
+            entry["cpu"] = (entry["cpu"] or 0.0) + cpu
+        entry["calls"] += calls
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge_counters(self, counters: Dict[str, int]):
+        """دمج عدادات من عملية عاملة (الوضع المتوازي)"""
+        for name, n in counters.items():
+            self.count(name, n)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "phases": {
+                name: {
+                    "wall_ms": round(entry["wall"] * 1000, 2),
+                    "cpu_ms": round(entry["cpu"] * 1000, 2) if entry["cpu"] is not None else None,
+                    "calls": entry["calls"],
+                }
+                for name, entry in self.phases.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+
+def profile_call(func: Callable, *args, sort: str = "cumulative", limit: int = 40, **kwargs) -> Tuple[Any, str]:
+    """
+    تشغيل دالة تحت cProfile
+
+    Returns:
+        (نتيجة الدالة، تقرير pstats كنص لأكثر limit دالة حسب sort)
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args, **kwargs)
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).strip_dirs().sort_stats(sort).print_stats(limit)
+    return result, stream.getvalue()
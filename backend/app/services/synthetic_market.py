@@ -0,0 +1,170 @@
+"""
+مولّد سوق اصطناعي
+=================
+توليد أسعار OHLCV لعدد N من الأسهم × D يوم بعمليات NumPy على كامل السلسلة
+(بدون حلقة لكل شمعة)، لاختبارات التحمل وقياس الأداء وبديل البيانات الحقيقية.
+
+- لكل سهم مولد عشوائي خاص مشتق من (البذرة، اسم السهم): نفس السهم يعطي نفس
+  المسار مهما تغير عدد الأسهم أو ترتيبها
+- أنظمة سوق (MarketRegime) تتبدل على فترات عشوائية: اتجاه، تذبذب، وقفزات سيولة
+- الكتابة مباشرة في مخزن الأسعار العمودي (PriceStore)
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Union
+import zlib
+
+import numpy as np
+
+from app.services.price_store import PriceStore, to_day_number
+
+# أيام التداول لكل سوق (صيغة weekmask في NumPy تبدأ بالاثنين)
+MARKET_WEEKMASKS = {
+    "saudi": "Sun Mon Tue Wed Thu",
+    "us": "Mon Tue Wed Thu Fri",
+    "crypto": "1111111",
+}
+
+
+@dataclass(frozen=True)
+class MarketRegime:
+    """نظام سوق: العائد اليومي المتوسط والتذبذب واحتمال قفزات السيولة"""
+    drift: float = 0.0003
+    volatility: float = 0.018
+    spike_prob: float = 0.1
+    spike_multiplier: float = 3.0
+
+
+DEFAULT_REGIMES = (MarketRegime(),)
+
+# أنظمة جاهزة لاختبارات التحمل
+BULL = MarketRegime(drift=0.0015, volatility=0.012)
+BEAR = MarketRegime(drift=-0.0015, volatility=0.022)
+CHOPPY = MarketRegime(drift=0.0, volatility=0.03, spike_prob=0.2)
+
+
+def trading_days(n_days: Optional[int] = None, start=None, end=None,
+                 weekmask: str = MARKET_WEEKMASKS["us"]) -> np.ndarray:
+    """
+    أيام التداول كأعداد أيام منذ 1970-01-01
+
+    - start + end: كل أيام التداول في [start, end)
+    - start + n_days: أول n_days يوم من start
+    - n_days فقط (أو مع end): آخر n_days يوم قبل end (افتراضياً اليوم)
+    """
+    as_day = lambda value: np.datetime64(to_day_number(value), "D") if isinstance(value, (date, datetime)) \
+        else np.datetime64(value, "D")
+
+    if start is not None and end is not None:
+        first, last = as_day(start), as_day(end)
+        count = int(np.busday_count(first, last, weekmask=weekmask))
+        if n_days is not None:
+            count = min(count, n_days)
+        offsets = np.arange(count)
+        return np.busday_offset(first, offsets, roll="forward", weekmask=weekmask).astype(np.int64)
+
+    if n_days is None:
+        raise ValueError("يجب تحديد n_days أو (start و end)")
+
+    if start is not None:
+        offsets = np.arange(n_days)
+        return np.busday_offset(as_day(start), offsets, roll="forward", weekmask=weekmask).astype(np.int64)
+
+    last = as_day(end) if end is not None else np.datetime64(to_day_number(datetime.now()), "D")
+    offsets = np.arange(-n_days + 1, 1)
+    return np.busday_offset(last, offsets, roll="backward", weekmask=weekmask).astype(np.int64)
+
+
+def symbol_rng(symbol: str, seed: int) -> np.random.Generator:
+    """مولد عشوائي خاص بالسهم (مستقل عن باقي الأسهم وترتيبها)"""
+    return np.random.default_rng(np.random.SeedSequence([seed, zlib.crc32(symbol.encode("utf-8"))]))
+
+
+def generate_ohlcv(symbol: str, days: np.ndarray, seed: int = 42,
+                   regimes: Sequence[MarketRegime] = DEFAULT_REGIMES, regime_length: float = 60,
+                   start_price: Union[float, tuple] = (20, 200), min_price: float = 0.0,
+                   volume_range: tuple = (100_000, 5_000_000), decimals: Optional[int] = 2) -> Dict[str, np.ndarray]:
+    """
+    أعمدة OHLCV لسهم واحد على أيام التداول days
+
+    Args:
+        regimes: الأنظمة التي يتنقل بينها السهم (اختيار عشوائي لكل فترة)
+        regime_length: متوسط طول الفترة بالأيام
+        start_price: سعر البداية، أو (أدنى، أعلى) لسعر عشوائي
+        min_price: أدنى إغلاق مسموح
+        decimals: تقريب الأسعار (None = بدون تقريب، للعملات الرخيصة مثلاً)
+
+    Returns:
+        {"dates", "open", "high", "low", "close", "volume"} بنفس أعمدة PriceStore
+    """
+    rng = symbol_rng(symbol, seed)
+    n = len(days)
+
+    # فترات الأنظمة: أطوال هندسية ثم نظام عشوائي لكل فترة
+    lengths = rng.geometric(1.0 / max(regime_length, 1.0), size=max(n, 1))
+    segment = np.repeat(np.arange(len(lengths)), lengths)[:n]
+    regime_idx = rng.integers(len(regimes), size=len(lengths))[segment]
+
+    drift = np.array([regime.drift for regime in regimes])[regime_idx]
+    volatility = np.array([regime.volatility for regime in regimes])[regime_idx]
+    spike_prob = np.array([regime.spike_prob for regime in regimes])[regime_idx]
+    spike_multiplier = np.array([regime.spike_multiplier for regime in regimes])[regime_idx]
+
+    if isinstance(start_price, tuple):
+        start_price = rng.uniform(*start_price)
+
+    close = start_price * np.exp(np.cumsum(rng.normal(drift, volatility)))
+    close = np.maximum(close, min_price)
+
+    previous = np.concatenate(([start_price], close[:-1]))
+    open_ = np.maximum(previous * (1 + rng.normal(0, volatility / 4)), min_price)
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, volatility / 2)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, volatility / 2)))
+
+    volume = rng.integers(volume_range[0], volume_range[1], size=n)
+    spikes = rng.random(n) < spike_prob
+    volume = np.where(spikes, volume * spike_multiplier, volume).astype(np.int64)
+
+    if decimals is not None:
+        open_, high, low, close = (np.round(values, decimals) for values in (open_, high, low, close))
+
+    return {
+        "dates": np.asarray(days, dtype=np.int64),
+        "open": open_,
+        "high": high,
+        "low": low,
+        "close": close,
+        "volume": volume,
+    }
+
+
+def synthetic_store(symbols: Union[int, Sequence[str]], n_days: Optional[int] = None, days=None,
+                    store: Optional[PriceStore] = None, weekmask: str = MARKET_WEEKMASKS["us"],
+                    **kwargs) -> PriceStore:
+    """
+    مخزن أسعار اصطناعي لعدة أسهم
+
+    Args:
+        symbols: قائمة رموز، أو عدد (رموز SYN0000, SYN0001, ...)
+        n_days: عدد أيام التداول (آخر n_days يوم حتى اليوم) إذا لم تُحدد days
+        days: أيام التداول جاهزة (من trading_days)
+        store: مخزن موجود للكتابة فيه (افتراضياً مخزن جديد)
+        **kwargs: تمرر لـ generate_ohlcv (seed, regimes, start_price, ...)
+    """
+    if isinstance(symbols, int):
+        symbols = [f"SYN{i:04d}" for i in range(symbols)]
+    if days is None:
+        days = trading_days(n_days, weekmask=weekmask)
+
+    store = store if store is not None else PriceStore()
+    for symbol in symbols:
+        store.add_symbol(symbol, **generate_ohlcv(symbol, days, **kwargs))
+    return store
+
+
+def synthetic_records(symbols: Sequence[str], **kwargs) -> Dict[str, List[Dict]]:
+    """نفس synthetic_store بصيغة الصفوف القديمة {symbol: [{"date": datetime, ...}]}"""
+    store = synthetic_store(symbols, **kwargs)
+    return {symbol: store.rows(symbol) for symbol in store}
+
@@ -2,16 +2,228 @@
 خدمة حساب المؤشرات الفنية الحقيقية
 =====================================
 تحسب RSI, SMA, EMA, Volume Change من بيانات الأسعار الحقيقية
+
+- دوال calculate_*_series تعيد السلسلة كاملة (مصفوفة NumPy بطول المدخلات)
+  في مرور واحد باستخدام مجاميع النوافذ المتجهة والمرشحات التكرارية
+  (وتقبل مصفوفة أسهم × أيام لحساب دفعة أسهم معاً على المحور الأخير)
+- دوال calculate_* القديمة (قيمة آخر يوم) أصبحت أغلفة رقيقة فوق السلاسل
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence
 from datetime import datetime
-import math
+
+import numpy as np
+
+
+# أعمدة المؤشرات المحسوبة مسبقاً لكل سهم (compute_indicator_columns)
+INDICATOR_COLUMNS = (
+    "rsi", "sma_20", "sma_50", "sma_200", "ema_12", "ema_26",
+    "macd_line", "macd_signal", "macd_histogram",
+    "bb_upper", "bb_middle", "bb_lower", "bb_position",
+    "volume_change",
+)
+
+# موقع السعر من نطاقات بولينجر (مخزّن كرقم في العمود bb_position)
+BB_OVERSOLD = -1
+BB_NEUTRAL = 0
+BB_OVERBOUGHT = 1
+BB_POSITION_NAMES = {BB_OVERSOLD: "oversold", BB_NEUTRAL: "neutral", BB_OVERBOUGHT: "overbought"}
 
 
 class TechnicalIndicators:
     """حساب المؤشرات الفنية من البيانات الحقيقية"""
     
+    # =============== السلاسل الكاملة (NumPy) ===============
+    
+    @staticmethod
+    def _rolling_sum(values: np.ndarray, period: int) -> np.ndarray:
+        """
+        مجموع نافذة متحركة (NaN قبل اكتمال النافذة)
+        
+        يجمع عناصر كل نافذة بالترتيب من الأقدم للأحدث كما يفعل sum() على الشريحة،
+        فتطابق القيم المقربة الحساب يوماً بيوم حتى عند حدود التقريب
+        (المجموع التراكمي أسرع لكنه يغير آخر خانة فيقلب قيماً مثل x.xx5)
+        """
+        out = np.full(values.shape, np.nan)
+        if period <= 0 or values.shape[-1] < period:
+            return out
+        count = values.shape[-1] - period + 1
+        window_sum = np.array(values[..., :count], dtype=np.float64)
+        for offset in range(1, period):
+            window_sum += values[..., offset:offset + count]
+        out[..., period - 1:] = window_sum
+        return out
+    
+    @staticmethod
+    def _round(values: np.ndarray, ndigits: int) -> np.ndarray:
+        """
+        تقريب مصفوفة بنفس نتيجة round() لكل عنصر
+        
+        np.round يضرب في 10^ndigits قبل التقريب، فالقيم القريبة من منتصف
+        الخانة (x.xx5) قد تُقرب للجهة الأخرى؛ هذه القيم فقط تُعاد بـ round()
+        """
+        values = np.asarray(values, dtype=np.float64)
+        out = np.round(values, ndigits)
+        scaled = values * (10.0 ** ndigits)
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+        for idx in zip(*np.nonzero(near_half)):
+            out[idx] = round(float(values[idx]), ndigits)
+        return out
+    
+    @staticmethod
+    def calculate_sma_series(prices: Sequence[float], period: int) -> np.ndarray:
+        """
+        سلسلة المتوسط المتحرك البسيط SMA
+        
+        Returns:
+            مصفوفة بطول prices (NaN قبل أول period سعر)
+        """
+        values = np.asarray(prices, dtype=np.float64)
+        return TechnicalIndicators._rolling_sum(values, period) / period
+    
+    @staticmethod
+    def calculate_ema_series(prices: Sequence[float], period: int) -> np.ndarray:
+        """
+        سلسلة المتوسط المتحرك الأسي EMA
+        
+        تبدأ بـ SMA لأول period سعر ثم مرشح تكراري واحد على الباقي
+        (لدفعة أسهم: خطوة واحدة لكل يوم على كل الأسهم معاً)
+        
+        Returns:
+            مصفوفة بطول prices (NaN قبل أول period سعر)
+        """
+        values = np.asarray(prices, dtype=np.float64)
+        out = np.full(values.shape, np.nan)
+        if values.shape[-1] < period:
+            return out
+        
+        multiplier = 2 / (period + 1)
+        ema = TechnicalIndicators._rolling_sum(values[..., :period], period)[..., period - 1] / period
+        
+        if values.ndim == 1:
+            ema_values = [ema]
+            for price in values[period:].tolist():
+                ema = (price * multiplier) + (ema * (1 - multiplier))
+                ema_values.append(ema)
+            out[period - 1:] = ema_values
+            return out
+        
+        # أيام × أسهم: كل خطوة تقرأ وتكتب صفاً متجاوراً في الذاكرة
+        by_day = np.ascontiguousarray(values.T)
+        out_by_day = np.full(by_day.shape, np.nan)
+        out_by_day[period - 1] = ema
+        for day in range(period, len(by_day)):
+            ema = (by_day[day] * multiplier) + (ema * (1 - multiplier))
+            out_by_day[day] = ema
+        return np.ascontiguousarray(out_by_day.T)
+    
+    @staticmethod
+    def calculate_rsi_series(prices: Sequence[float], period: int = 14) -> np.ndarray:
+        """
+        سلسلة مؤشر القوة النسبية RSI (متوسط بسيط لآخر period تغير)
+        
+        Returns:
+            مصفوفة بطول prices (NaN قبل أول period + 1 سعر)
+        """
+        values = np.asarray(prices, dtype=np.float64)
+        out = np.full(values.shape, np.nan)
+        if values.shape[-1] < period + 1:
+            return out
+        
+        changes = np.diff(values, axis=-1)
+        avg_gain = TechnicalIndicators._rolling_sum(np.where(changes > 0, changes, 0.0), period)[..., period - 1:] / period
+        avg_loss = TechnicalIndicators._rolling_sum(np.where(changes < 0, -changes, 0.0), period)[..., period - 1:] / period
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = avg_gain / avg_loss
+            rsi = np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + rs)))
+        
+        out[..., period:] = rsi
+        return out
+    
+    @staticmethod
+    def calculate_volume_change_series(volumes: Sequence[int], period: int = 20) -> np.ndarray:
+        """
+        سلسلة نسبة الحجم إلى متوسط آخر period يوم (بدون اليوم الحالي)
+        
+        Returns:
+            مصفوفة بطول volumes (NaN قبل أول period + 1 يوم)
+        """
+        values = np.asarray(volumes, dtype=np.float64)
+        out = np.full(values.shape, np.nan)
+        if values.shape[-1] < period + 1:
+            return out
+        
+        avg_volume = TechnicalIndicators._rolling_sum(values, period)[..., period - 1:-1] / period
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[..., period:] = np.where(avg_volume == 0, 0.0, (values[..., period:] / avg_volume) * 100)
+        return out
+    
+    @staticmethod
+    def calculate_macd_series(prices: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        سلاسل MACD (12, 26)
+        
+        Returns:
+            dict مع macd_line, signal_line, histogram (NaN قبل أول 26 سعر)
+        """
+        # الخط من EMA مقربة لمنزلتين (نفس تعريف calculate_macd الأصلي)
+        macd_line = (TechnicalIndicators._round(TechnicalIndicators.calculate_ema_series(prices, 12), 2)
+                     - TechnicalIndicators._round(TechnicalIndicators.calculate_ema_series(prices, 26), 2))
+        
+        # Signal line is 9-period EMA of MACD (simplified, same as calculate_macd)
+        signal_line = macd_line * 0.8
+        
+        return {
+            "macd_line": macd_line,
+            "signal_line": signal_line,
+            "histogram": macd_line - signal_line,
+        }
+    
+    @staticmethod
+    def calculate_bollinger_series(prices: Sequence[float], period: int = 20, std_dev: float = 2) -> Dict[str, np.ndarray]:
+        """
+        سلاسل نطاقات بولينجر
+        
+        Returns:
+            dict مع upper, middle, lower و position (BB_OVERSOLD / BB_NEUTRAL / BB_OVERBOUGHT)
+        """
+        values = np.asarray(prices, dtype=np.float64)
+        middle = TechnicalIndicators.calculate_sma_series(values, period)
+        
+        # التباين: مجموع مربعات الانحراف عن متوسط كل نافذة بنفس ترتيب الجمع
+        std = np.full(values.shape, np.nan)
+        count = values.shape[-1] - period + 1
+        if count > 0:
+            window_middle = middle[..., period - 1:]
+            squares = (values[..., :count] - window_middle) ** 2
+            for offset in range(1, period):
+                squares += (values[..., offset:offset + count] - window_middle) ** 2
+            std[..., period - 1:] = np.sqrt(squares / period)
+        
+        upper = middle + (std_dev * std)
+        lower = middle - (std_dev * std)
+        
+        position = np.full(values.shape, BB_NEUTRAL, dtype=np.int8)
+        position[values >= upper] = BB_OVERBOUGHT
+        position[values <= lower] = BB_OVERSOLD
+        
+        return {
+            "upper": upper,
+            "middle": middle,
+            "lower": lower,
+            "position": position,
+        }
+    
+    @staticmethod
+    def _last_value(series: np.ndarray, ndigits: int) -> Optional[float]:
+        """آخر قيمة في سلسلة مقربة، أو None إذا لم تكن متاحة"""
+        if len(series) == 0 or np.isnan(series[-1]):
+            return None
+        return round(float(series[-1]), ndigits)
+    
+    # =============== القيمة عند آخر يوم (أغلفة) ===============
+    
     @staticmethod
     def calculate_rsi(prices: List[float], period: int = 14) -> Optional[float]:
         """
@@ -27,26 +239,8 @@ class TechnicalIndicators:
         if len(prices) < period + 1:
             return None
         
-        # حساب التغيرات
-        changes = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        
-        # الأخذ آخر period تغير
-        recent_changes = changes[-(period):]
-        
-        # فصل المكاسب والخسائر
-        gains = [c if c > 0 else 0 for c in recent_changes]
-        losses = [-c if c < 0 else 0 for c in recent_changes]
-        
-        avg_gain = sum(gains) / period
-        avg_loss = sum(losses) / period
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return round(rsi, 2)
+        series = TechnicalIndicators.calculate_rsi_series(prices[-(period + 1):], period)
+        return TechnicalIndicators._last_value(series, 2)
     
     @staticmethod
     def calculate_sma(prices: List[float], period: int) -> Optional[float]:
@@ -63,10 +257,8 @@ class TechnicalIndicators:
         if len(prices) < period:
             return None
         
-        recent_prices = prices[-period:]
-        sma = sum(recent_prices) / period
-        
-        return round(sma, 2)
+        series = TechnicalIndicators.calculate_sma_series(prices[-period:], period)
+        return TechnicalIndicators._last_value(series, 2)
     
     @staticmethod
     def calculate_ema(prices: List[float], period: int) -> Optional[float]:
@@ -83,16 +275,8 @@ class TechnicalIndicators:
         if len(prices) < period:
             return None
         
-        multiplier = 2 / (period + 1)
-        
-        # البدء بـ SMA كأول قيمة
-        ema = sum(prices[:period]) / period
-        
-        # حساب EMA للباقي
-        for price in prices[period:]:
-            ema = (price * multiplier) + (ema * (1 - multiplier))
-        
-        return round(ema, 2)
+        series = TechnicalIndicators.calculate_ema_series(prices, period)
+        return TechnicalIndicators._last_value(series, 2)
     
     @staticmethod
     def calculate_volume_change(volumes: List[int], period: int = 20) -> Optional[float]:
@@ -109,15 +293,8 @@ class TechnicalIndicators:
         if len(volumes) < period + 1:
             return None
         
-        current_volume = volumes[-1]
-        avg_volume = sum(volumes[-period-1:-1]) / period
-        
-        if avg_volume == 0:
-            return 0
-        
-        change_pct = (current_volume / avg_volume) * 100
-        
-        return round(change_pct, 1)
+        series = TechnicalIndicators.calculate_volume_change_series(volumes[-(period + 1):], period)
+        return TechnicalIndicators._last_value(series, 1)
     
     @staticmethod
     def calculate_macd(prices: List[float]) -> Optional[Dict]:
@@ -130,18 +307,10 @@ class TechnicalIndicators:
         if len(prices) < 26:
             return None
         
-        # EMA 12 و 26
-        ema12 = TechnicalIndicators.calculate_ema(prices, 12)
-        ema26 = TechnicalIndicators.calculate_ema(prices, 26)
-        
-        if ema12 is None or ema26 is None:
-            return None
-        
-        macd_line = round(ema12 - ema26, 4)
-        
-        # Signal line is 9-period EMA of MACD (simplified)
-        signal_line = round(macd_line * 0.8, 4)  # Simplified
+        series = TechnicalIndicators.calculate_macd_series(prices)
         
+        macd_line = TechnicalIndicators._last_value(series["macd_line"], 4)
+        signal_line = round(macd_line * 0.8, 4)
         histogram = round(macd_line - signal_line, 4)
         
         return {
@@ -162,35 +331,17 @@ class TechnicalIndicators:
         if len(prices) < period:
             return None
         
-        recent_prices = prices[-period:]
-        
-        # Middle band (SMA)
-        middle = sum(recent_prices) / period
-        
-        # Standard deviation
-        variance = sum((p - middle) ** 2 for p in recent_prices) / period
-        std = math.sqrt(variance)
-        
-        upper = middle + (std_dev * std)
-        lower = middle - (std_dev * std)
-        
-        current_price = prices[-1]
-        
-        # موقع السعر الحالي
-        if current_price >= upper:
-            position = "overbought"
-        elif current_price <= lower:
-            position = "oversold"
-        else:
-            position = "neutral"
+        series = TechnicalIndicators.calculate_bollinger_series(prices[-period:], period, std_dev)
         
         return {
-            "upper": round(upper, 2),
-            "middle": round(middle, 2),
-            "lower": round(lower, 2),
-            "position": position
+            "upper": TechnicalIndicators._last_value(series["upper"], 2),
+            "middle": TechnicalIndicators._last_value(series["middle"], 2),
+            "lower": TechnicalIndicators._last_value(series["lower"], 2),
+            "position": BB_POSITION_NAMES[int(series["position"][-1])]
         }
     
+    # =============== كل المؤشرات ===============
+    
     @staticmethod
     def get_all_indicators(price_data: List[Dict], day_idx: int) -> Dict:
         """
@@ -206,24 +357,118 @@ class TechnicalIndicators:
         if day_idx < 1 or day_idx >= len(price_data):
             return {}
         
-        # استخراج الأسعار حتى هذا اليوم
-        prices_until_now = [d["close"] for d in price_data[:day_idx + 1]]
-        volumes_until_now = [d["volume"] for d in price_data[:day_idx + 1]]
+        # المؤشرات سببية، يكفي حسابها حتى هذا اليوم
+        history = price_data[:day_idx + 1]
+        columns = TechnicalIndicators.compute_indicator_columns(history)
+        
+        return TechnicalIndicators.snapshot_from_columns(history, columns, day_idx)
+    
+    @staticmethod
+    def compute_indicator_columns(price_data: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        حساب سلاسل المؤشرات كاملة لسهم واحد في مرور واحد
+        
+        كل عمود مصفوفة بطول price_data مقربة كما في دوال calculate_*
+        (NaN حيث لا تكفي البيانات)
+        
+        Args:
+            price_data: بيانات الأسعار الكاملة للسهم
+            
+        Returns:
+            dict من اسم المؤشر إلى مصفوفة القيم
+        """
+        closes = np.fromiter((d["close"] for d in price_data), dtype=np.float64, count=len(price_data))
+        volumes = np.fromiter((d["volume"] for d in price_data), dtype=np.float64, count=len(price_data))
+        
+        return TechnicalIndicators.compute_indicator_columns_from_arrays(closes, volumes)
+    
+    @staticmethod
+    def compute_indicator_columns_from_arrays(closes: np.ndarray, volumes: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        نفس compute_indicator_columns لكن من أعمدة الإغلاق والحجم مباشرة
+        (بدون المرور على صفوف القواميس)
+        
+        تقبل أيضاً دفعة أسهم (أسهم × أيام، الأسهم الأقصر مكملة بـ NaN في آخرها)
+        وتعيد كل عمود بنفس الشكل، بنفس القيم لو حُسب كل سهم وحده
+        """
+        macd_line = TechnicalIndicators._round(TechnicalIndicators.calculate_macd_series(closes)["macd_line"], 4)
+        macd_signal = TechnicalIndicators._round(macd_line * 0.8, 4)
+        bollinger = TechnicalIndicators.calculate_bollinger_series(closes, 20)
+        
+        return {
+            "rsi": TechnicalIndicators._round(TechnicalIndicators.calculate_rsi_series(closes, 14), 2),
+            "sma_20": TechnicalIndicators._round(TechnicalIndicators.calculate_sma_series(closes, 20), 2),
+            "sma_50": TechnicalIndicators._round(TechnicalIndicators.calculate_sma_series(closes, 50), 2),
+            "sma_200": TechnicalIndicators._round(TechnicalIndicators.calculate_sma_series(closes, 200), 2),
+            "ema_12": TechnicalIndicators._round(TechnicalIndicators.calculate_ema_series(closes, 12), 2),
+            "ema_26": TechnicalIndicators._round(TechnicalIndicators.calculate_ema_series(closes, 26), 2),
+            "macd_line": macd_line,
+            "macd_signal": macd_signal,
+            "macd_histogram": TechnicalIndicators._round(macd_line - macd_signal, 4),
+            "bb_upper": TechnicalIndicators._round(bollinger["upper"], 2),
+            "bb_middle": TechnicalIndicators._round(bollinger["middle"], 2),
+            "bb_lower": TechnicalIndicators._round(bollinger["lower"], 2),
+            "bb_position": bollinger["position"],
+            "volume_change": TechnicalIndicators._round(TechnicalIndicators.calculate_volume_change_series(volumes, 20), 1),
+        }
+    
+    @staticmethod
+    def column_value(columns: Dict[str, np.ndarray], name: str, day_idx: int) -> Optional[float]:
+        """قيمة عمود في يوم معين كـ float، أو None إذا لم تكن متاحة"""
+        value = columns[name][day_idx]
+        if np.isnan(value):
+            return None
+        if value.dtype == np.float32:
+            # أعمدة وضع السوق الكبير
+            from app.services.price_store import as_float
+            return as_float(value)
+        return float(value)
+    
+    @staticmethod
+    def snapshot_from_columns(price_data: List[Dict], columns: Dict[str, np.ndarray], day_idx: int) -> Dict:
+        """
+        بناء نفس ناتج get_all_indicators من أعمدة محسوبة مسبقاً (O(1))
+        
+        Args:
+            price_data: بيانات الأسعار الكاملة للسهم
+            columns: ناتج compute_indicator_columns لنفس السهم
+            day_idx: فهرس اليوم الحالي
+        """
+        if day_idx < 1 or day_idx >= len(price_data):
+            return {}
+        
+        value = lambda name: TechnicalIndicators.column_value(columns, name, day_idx)
         
-        current_price = price_data[day_idx]["close"]
-        current_date = price_data[day_idx]["date"]
+        macd = None
+        if value("macd_line") is not None:
+            histogram = value("macd_histogram")
+            macd = {
+                "macd_line": value("macd_line"),
+                "signal_line": value("macd_signal"),
+                "histogram": histogram,
+                "signal": "buy" if histogram > 0 else "sell"
+            }
         
-        # حساب المؤشرات
-        rsi = TechnicalIndicators.calculate_rsi(prices_until_now, 14)
-        sma_20 = TechnicalIndicators.calculate_sma(prices_until_now, 20)
-        sma_50 = TechnicalIndicators.calculate_sma(prices_until_now, 50)
-        sma_200 = TechnicalIndicators.calculate_sma(prices_until_now, 200)
-        ema_12 = TechnicalIndicators.calculate_ema(prices_until_now, 12)
-        ema_26 = TechnicalIndicators.calculate_ema(prices_until_now, 26)
-        volume_change = TechnicalIndicators.calculate_volume_change(volumes_until_now, 20)
-        macd = TechnicalIndicators.calculate_macd(prices_until_now)
-        bollinger = TechnicalIndicators.calculate_bollinger_bands(prices_until_now, 20)
+        bollinger = None
+        if value("bb_middle") is not None:
+            bollinger = {
+                "upper": value("bb_upper"),
+                "middle": value("bb_middle"),
+                "lower": value("bb_lower"),
+                "position": BB_POSITION_NAMES[int(columns["bb_position"][day_idx])]
+            }
         
+        return TechnicalIndicators._build_snapshot(
+            price_data[day_idx]["date"], price_data[day_idx]["close"], price_data[day_idx]["volume"],
+            value("rsi"), value("sma_20"), value("sma_50"), value("sma_200"),
+            value("ema_12"), value("ema_26"), value("volume_change"), macd, bollinger
+        )
+    
+    @staticmethod
+    def _build_snapshot(current_date, current_price, current_volume,
+                        rsi, sma_20, sma_50, sma_200, ema_12, ema_26,
+                        volume_change, macd, bollinger) -> Dict:
+        """تجميع قيم المؤشرات في القاموس المعروض للواجهة"""
         # تحديد الاتجاه
         trend = "neutral"
         if sma_50 and sma_200:
@@ -262,7 +507,7 @@ class TechnicalIndicators:
                 "ema_26": ema_26,
             },
             "volume": {
-                "current": volumes_until_now[-1] if volumes_until_now else 0,
+                "current": current_volume,
                 "change_pct": volume_change,
                 "status": "high" if volume_change and volume_change > 150 else 
                          "normal" if volume_change and volume_change > 80 else "low"
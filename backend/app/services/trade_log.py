@@ -0,0 +1,89 @@
+"""
+سجل الصفقات العمودي
+===================
+كل صفقات المحاكاة كمصفوفة NumPy منظمة (صف لكل صفقة، عمود لكل حقل رقمي)
+بدلاً من قائمة كائنات لكل روبوت: للتحليل والإحصاءات بعمليات على المصفوفات.
+
+النصوص (السبب، نتيجة الخروج) تبقى في ClosedTrade، والسجل يحفظ الأرقام فقط.
+
+سجل الدفعات (build_lot_log) يفصل الصفقة المعززة إلى دفعات شراء: الدخول الأول
+وكل تعزيز بيومه وكميته وتكلفته (للرصيد اليومي، لا كميتها ومتوسط سعرها النهائيين).
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+TRADE_LOG_DTYPE = np.dtype([
+    ("bot", np.int16),          # فهرس الروبوت في BOTS
+    ("symbol", np.int32),       # فهرس السهم في مخزن الأسعار (-1 إذا لم يعد موجوداً)
+    ("entry_day", np.int32),    # تاريخ الدخول (أيام منذ 1970-01-01)
+    ("exit_day", np.int32),     # تاريخ الخروج
+    ("entry_bar", np.int32),    # فهرس شمعة الدخول (-1 = غير معروف)
+    ("exit_bar", np.int32),     # فهرس شمعة الخروج (-1 = غير معروف)
+    ("entry_price", np.float64),
+    ("exit_price", np.float64),
+    ("quantity", np.int64),
+    ("profit_pct", np.float64),
+    ("profit", np.float64),     # الربح المحقق المضاف لرصيد الروبوت
+    ("win", np.bool_),
+])
+
+LOT_LOG_DTYPE = np.dtype([
+    ("bot", np.int16),          # فهرس الروبوت في BOTS
+    ("symbol", np.int32),       # فهرس السهم في مخزن الأسعار (-1 إذا لم يعد موجوداً)
+    ("entry_day", np.int32),    # يوم شراء الدفعة (أيام منذ 1970-01-01)
+    ("exit_day", np.int32),     # يوم خروج الصفقة كاملة
+    ("quantity", np.int64),
+    ("cost", np.float64),       # الكمية × سعر شراء الدفعة
+])
+
+
+def build_trade_log(closed_trades: Dict[str, List], bot_ids: Sequence[str],
+                    symbol_pos: Dict[str, int]) -> np.ndarray:
+    """
+    سجل عمودي من صفقات كل الروبوتات
+
+    Args:
+        closed_trades: {bot_id: [ClosedTrade, ...]}
+        bot_ids: ترتيب الروبوتات (يحدد قيمة عمود bot)
+        symbol_pos: {symbol: فهرس} لعمود symbol
+    """
+    trades = [(b_idx, trade) for b_idx, bot_id in enumerate(bot_ids) for trade in closed_trades.get(bot_id, [])]
+    log = np.zeros(len(trades), dtype=TRADE_LOG_DTYPE)
+    if not trades:
+        return log
+
+    log["bot"] = [b_idx for b_idx, _ in trades]
+    log["symbol"] = [symbol_pos.get(trade.symbol, -1) for _, trade in trades]
+    log["entry_day"] = np.array([trade.entry_date for _, trade in trades], dtype="datetime64[D]").astype(np.int64)
+    log["exit_day"] = np.array([trade.exit_date for _, trade in trades], dtype="datetime64[D]").astype(np.int64)
+    log["entry_bar"] = [-1 if trade.entry_bar is None else trade.entry_bar for _, trade in trades]
+    log["exit_bar"] = [-1 if trade.exit_bar is None else trade.exit_bar for _, trade in trades]
+    log["entry_price"] = [trade.entry_price for _, trade in trades]
+    log["exit_price"] = [trade.exit_price for _, trade in trades]
+    log["quantity"] = [trade.quantity for _, trade in trades]
+    log["profit_pct"] = [trade.profit_pct for _, trade in trades]
+    log["profit"] = [trade.profit for _, trade in trades]
+    log["win"] = [trade.result == "win" for _, trade in trades]
+    return log
+
+
+def build_lot_log(closed_trades: Dict[str, List], bot_ids: Sequence[str],
+                  symbol_pos: Dict[str, int]) -> np.ndarray:
+    """
+    سجل دفعات الشراء لكل الصفقات المغلقة (صف للدخول الأول + صف لكل تعزيز في trade.adds)
+
+    الدفعة الأولى هي الباقي من كمية وتكلفة الصفقة النهائيتين بعد طرح التعزيزات
+    """
+    lots = []
+    for b_idx, bot_id in enumerate(bot_ids):
+        for trade in closed_trades.get(bot_id, []):
+            symbol = symbol_pos.get(trade.symbol, -1)
+            entry_day = np.datetime64(trade.entry_date, "D").astype(np.int64)
+            exit_day = np.datetime64(trade.exit_date, "D").astype(np.int64)
+            first_quantity = trade.quantity - sum(quantity for _, quantity, _ in trade.adds)
+            first_cost = trade.quantity * trade.entry_price - sum(quantity * price for _, quantity, price in trade.adds)
+            lots.append((b_idx, symbol, entry_day, exit_day, first_quantity, first_cost))
+            lots.extend((b_idx, symbol, day, exit_day, quantity, quantity * price) for day, quantity, price in trade.adds)
+    return np.array(lots, dtype=LOT_LOG_DTYPE)
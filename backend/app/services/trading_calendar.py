@@ -0,0 +1,117 @@
+"""
+تقويم التداول الموحد
+====================
+أيام التداول لسوق كامل (اتحاد أيام كل الأسهم، لا أيام أول سهم فقط) مع مصفوفة
+محاذاة تُبنى مرة واحدة عند التحميل:
+
+    bar_index[سهم, يوم] = فهرس شمعة السهم في ذلك اليوم، أو -1 إذا لم يتداول فيه
+
+فكل حلقة بعدها قراءة بالفهارس فقط بدلاً من البحث عن التاريخ في كل سهم وكل يوم،
+والأسهم بجلسات مختلفة (الكريبتو 7 أيام، تداول الأحد-الخميس، الأمريكي الاثنين-الجمعة)
+تتحاذى على نفس المحور، ويمكن دمج تقاويم عدة أسواق لمحفظة مشتركة (combine).
+"""
+
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.services.price_store import PriceStore, as_float64, from_day_number, to_day_number
+
+# قيمة bar_index للأيام التي لا يتداول فيها السهم
+NO_BAR = -1
+
+
+class TradingCalendar:
+    """تقويم موحد لعدة أسهم: أيام التداول + فهرس شمعة كل سهم في كل يوم"""
+
+    def __init__(self, days: np.ndarray, symbols: Sequence[str], bar_index: np.ndarray):
+        """
+        Args:
+            days: أيام التقويم مرتبة (أيام منذ 1970-01-01)
+            symbols: ترتيب صفوف bar_index
+            bar_index: int32 (أسهم × أيام)، NO_BAR للأيام بلا تداول
+        """
+        self.days = np.asarray(days, dtype=np.int64)
+        self.symbols = list(symbols)
+        self.bar_index = bar_index
+        self._symbol_pos = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def from_store(cls, store: PriceStore, symbols: Optional[Sequence[str]] = None) -> "TradingCalendar":
+        """تقويم أسهم المخزن (أو symbols بترتيبها): اتحاد أيامها ومحاذاة شموعها"""
+        symbols = list(store.symbols if symbols is None else symbols)
+        columns = [store.dates(symbol) for symbol in symbols]
+        days = np.unique(np.concatenate(columns)) if columns else np.empty(0, dtype=np.int64)
+
+        bar_index = np.full((len(symbols), len(days)), NO_BAR, dtype=np.int32)
+        for s_idx, dates in enumerate(columns):
+            bar_index[s_idx, np.searchsorted(days, dates)] = np.arange(len(dates), dtype=np.int32)
+        return cls(days, symbols, bar_index)
+
+    @classmethod
+    def combine(cls, *calendars: "TradingCalendar") -> "TradingCalendar":
+        """
+        دمج تقاويم عدة أسواق في تقويم واحد (لمحفظة تجمع أسهماً من أسواق مختلفة)
+
+        Raises:
+            ValueError: إذا تكرر سهم في أكثر من تقويم
+        """
+        symbols = [symbol for calendar in calendars for symbol in calendar.symbols]
+        if len(set(symbols)) != len(symbols):
+            raise ValueError("لا يمكن دمج تقاويم تتكرر فيها نفس الأسهم")
+
+        days = np.unique(np.concatenate([calendar.days for calendar in calendars])) if calendars \
+            else np.empty(0, dtype=np.int64)
+        bar_index = np.full((len(symbols), len(days)), NO_BAR, dtype=np.int32)
+        row = 0
+        for calendar in calendars:
+            rows = slice(row, row + len(calendar.symbols))
+            bar_index[rows, np.searchsorted(days, calendar.days)] = calendar.bar_index
+            row += len(calendar.symbols)
+        return cls(days, symbols, bar_index)
+
+    # =============== القراءة ===============
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def datetimes(self) -> List[datetime]:
+        """أيام التقويم كـ datetime"""
+        return [from_day_number(day) for day in self.days.tolist()]
+
+    def position(self, symbol: str) -> Optional[int]:
+        """صف السهم في bar_index"""
+        return self._symbol_pos.get(symbol)
+
+    def day_index(self, day) -> Optional[int]:
+        """
+        فهرس يوم في التقويم، أو None إذا لم يكن يوم تداول
+
+        Args:
+            day: date/datetime أو عدد الأيام منذ 1970-01-01
+        """
+        number = day if isinstance(day, (int, np.integer)) else to_day_number(day)
+        idx = int(np.searchsorted(self.days, number))
+        return idx if idx < len(self.days) and self.days[idx] == number else None
+
+    def bar(self, symbol: str, day_idx: int) -> Optional[int]:
+        """فهرس شمعة السهم في يوم التقويم day_idx، أو None إذا لم يتداول فيه"""
+        s_idx = self._symbol_pos.get(symbol)
+        if s_idx is None:
+            return None
+        bar = int(self.bar_index[s_idx, day_idx])
+        return None if bar == NO_BAR else bar
+
+    def align(self, store: PriceStore, field: str = "close", fill: float = np.nan) -> np.ndarray:
+        """
+        عمود من المخزن على التقويم: مصفوفة أسهم × أيام بترتيب symbols
+
+        الأيام التي لا يتداول فيها السهم تأخذ fill (والأعمدة float32 تُوسّع بـ as_float64)
+        """
+        aligned = np.full(self.bar_index.shape, fill, dtype=np.float64)
+        for s_idx, symbol in enumerate(self.symbols):
+            bars = self.bar_index[s_idx]
+            traded = bars != NO_BAR
+            aligned[s_idx, traded] = as_float64(store.column(symbol, field)[bars[traded]])
+        return aligned
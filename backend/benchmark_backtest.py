@@ -0,0 +1,210 @@
+"""
+قياس أداء محرك الباك تيست على أحجام متزايدة
+============================================
+يشغّل BacktestEngine.run() (كل الروبوتات) على بيانات اصطناعية ثابتة من
+synthetic_market (نفس البذرة = نفس الأسعار في كل مرة) لمصفوفة أحجام: عدد الأسهم × عدد الأيام.
+
+لكل حالة: الشموع/ثانية، أقصى ذاكرة (RSS)، أزمنة المراحل من results["timings"]،
+أحجام المصفوفات من results["memory"]، وبصمة للنتائج لاكتشاف أي تغير في سلوك المحرك بعد التحسين.
+كل حالة تعمل في عملية مستقلة حتى تكون قراءة أقصى ذاكرة خاصة بها.
+
+--universe يشغّل المحرك في وضع السوق الكبير (float32 + ميزانية ذاكرة، انظر BacktestEngine.universe).
+
+الاستخدام (من مجلد backend):
+    python benchmark_backtest.py --save-baseline data/benchmark_baseline.json
+    python benchmark_backtest.py --baseline data/benchmark_baseline.json
+    python benchmark_backtest.py --symbols 10,100 --days 250,1000
+    python benchmark_backtest.py --universe --symbols 500 --days 1260 --memory-budget 1024
+
+يعيد رمز خروج 1 إذا تراجع الأداء أكثر من --threshold مقارنة بخط الأساس.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_SYMBOLS = (10, 100, 500)
+DEFAULT_DAYS = (250, 1000, 5000)
+DEFAULT_THRESHOLD = 0.15
+DEFAULT_SEED = 42
+
+# أول يوم في البيانات الاصطناعية (أيام عمل متتالية بعده)
+SYNTHETIC_START = "2005-01-03"
+
+
+def benchmark_store(n_symbols: int, n_days: int, seed: int = DEFAULT_SEED):
+    """مخزن الأسعار الاصطناعي الثابت لحالة واحدة"""
+    from app.services.synthetic_market import synthetic_store, trading_days
+
+    return synthetic_store(n_symbols, days=trading_days(n_days, start=SYNTHETIC_START), seed=seed).freeze()
+
+
+def results_checksum(results: Dict[str, Any]) -> str:
+    """بصمة لوحة الترتيب (تتغير إذا تغيرت صفقات أو أرباح أي روبوت)"""
+    board = [
+        (bot["bot_id"], bot["total_trades"], bot["total_profit_pct"], bot["max_drawdown"])
+        for bot in sorted(results["leaderboard"], key=lambda bot: bot["bot_id"])
+    ]
+    return hashlib.sha1(json.dumps(board).encode()).hexdigest()[:12]
+
+
+def run_case(n_symbols: int, n_days: int, seed: int = DEFAULT_SEED, universe: bool = False,
+             memory_budget_mb: Optional[float] = None) -> Dict[str, Any]:
+    """حالة واحدة: بناء البيانات ثم قياس بناء المحرك وتشغيله"""
+    from app.services.backtest_engine import BacktestEngine
+    from app.services.memory_budget import peak_rss_mb
+
+    store = benchmark_store(n_symbols, n_days, seed)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        engine = BacktestEngine(SYNTHETIC_START, 100000, "us", price_store=store,
+                                universe=store.symbols if universe else None, memory_budget_mb=memory_budget_mb)
+        setup_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = engine.run()
+        run_sec = time.perf_counter() - start
+
+    bars = n_symbols * n_days
+    total_sec = setup_sec + run_sec
+    return {
+        "symbols": n_symbols,
+        "days": n_days,
+        "bots": len(engine.BOTS),
+        "bars": bars,
+        "setup_sec": round(setup_sec, 4),
+        "run_sec": round(run_sec, 4),
+        "total_sec": round(total_sec, 4),
+        "bars_per_sec": round(bars / total_sec, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "trades": sum(bot["total_trades"] for bot in results["leaderboard"]),
+        "checksum": results_checksum(results),
+        "timings": results.get("timings"),
+        "memory": results.get("memory"),
+    }
+
+
+def run_isolated(n_symbols: int, n_days: int, seed: int, universe: bool = False,
+                 memory_budget_mb: Optional[float] = None) -> Dict[str, Any]:
+    """تشغيل حالة في عملية جديدة (spawn) حتى لا تتأثر أقصى ذاكرة بالحالات السابقة"""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_case, (n_symbols, n_days, seed, universe, memory_budget_mb))
+
+
+def case_key(n_symbols: int, n_days: int, universe: bool = False) -> str:
+    # وضع السوق الكبير (float32) حالة مستقلة عن العادي في خط الأساس
+    return f"{n_symbols}x{n_days}" + ("-universe" if universe else "")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    مقارنة الحالات المشتركة مع خط الأساس
+
+    Returns:
+        قائمة التراجعات (انخفاض الشموع/ثانية أو زيادة الذاكرة أكثر من threshold)
+    """
+    regressions = []
+    for key, case in current["cases"].items():
+        base = baseline.get("cases", {}).get(key)
+        if base is None:
+            continue
+
+        speed_change = case["bars_per_sec"] / base["bars_per_sec"] - 1
+        memory_change = case["peak_rss_mb"] / base["peak_rss_mb"] - 1
+        print(f"  {key:>10}: سرعة {speed_change:+.1%}  ذاكرة {memory_change:+.1%}")
+
+        if speed_change < -threshold:
+            regressions.append(f"{key}: الشموع/ثانية {base['bars_per_sec']} → {case['bars_per_sec']} ({speed_change:+.1%})")
+        if memory_change > threshold:
+            regressions.append(f"{key}: أقصى ذاكرة {base['peak_rss_mb']}MB → {case['peak_rss_mb']}MB ({memory_change:+.1%})")
+        if case["checksum"] != base["checksum"]:
+            print(f"  ⚠️ {key}: نتائج المحاكاة تغيرت ({base['checksum']} → {case['checksum']})")
+
+    return regressions
+
+
+def run_benchmark(symbols=DEFAULT_SYMBOLS, days=DEFAULT_DAYS, seed: int = DEFAULT_SEED, universe: bool = False,
+                  memory_budget_mb: Optional[float] = None) -> Dict[str, Any]:
+    from app.services.backtest_engine import BacktestEngine
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "engine_version": BacktestEngine.ENGINE_VERSION,
+        "seed": seed,
+        "universe": universe,
+        "memory_budget_mb": memory_budget_mb,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cores)",
+        "cases": {},
+    }
+
+    for n_symbols in symbols:
+        for n_days in days:
+            case = run_isolated(n_symbols, n_days, seed, universe, memory_budget_mb)
+            report["cases"][case_key(n_symbols, n_days, universe)] = case
+            print(f"  {case_key(n_symbols, n_days, universe):>10}: {case['bars_per_sec']:>12,.0f} شمعة/ث  "
+                  f"{case['total_sec']:8.2f}s  {case['peak_rss_mb']:7.1f}MB  ({case['trades']} صفقة)")
+
+    return report
+
+
+def _parse_sizes(value: str) -> List[int]:
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="قياس أداء BacktestEngine")
+    parser.add_argument("--symbols", type=_parse_sizes, default=list(DEFAULT_SYMBOLS))
+    parser.add_argument("--days", type=_parse_sizes, default=list(DEFAULT_DAYS))
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--universe", action="store_true", help="وضع السوق الكبير (أسعار ومؤشرات float32)")
+    parser.add_argument("--memory-budget", type=float, help="حد حجم مصفوفات المحاكاة بالميغابايت")
+    parser.add_argument("--output", default="data/benchmark_latest.json", help="ملف نتائج هذا التشغيل")
+    parser.add_argument("--baseline", help="مقارنة مع خط أساس سابق")
+    parser.add_argument("--save-baseline", help="حفظ هذا التشغيل كخط أساس")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="نسبة التراجع المسموحة (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print(f"⏱️ قياس أداء المحرك: أسهم {args.symbols} × أيام {args.days}")
+    print("=" * 60)
+    report = run_benchmark(args.symbols, args.days, args.seed, args.universe, args.memory_budget)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"📊 المقارنة مع {args.baseline} (حد التراجع {args.threshold:.0%}):")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("❌ تراجع في الأداء:")
+            for line in regressions:
+                print(f"   - {line}")
+            return 1
+        print("✅ لا يوجد تراجع")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
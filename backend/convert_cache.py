@@ -0,0 +1,45 @@
+"""
+تحويل ملفات الكاش JSON (data/cache_{market}.json) إلى الكاش الثنائي (.npz)
+=========================================================================
+تحويل لمرة واحدة. المحرك يكتب الكاش الثنائي تلقائياً عند أول تحميل،
+وهذا السكربت لتجهيزه مسبقاً (مثلاً أثناء النشر).
+
+الاستخدام (من مجلد backend):
+    python convert_cache.py [data_dir]
+"""
+
+import glob
+import os
+import sys
+import time
+
+from app.services.price_store import PriceStore
+
+
+def convert_all(data_dir: str = "data"):
+    json_files = sorted(glob.glob(os.path.join(data_dir, "cache_*.json")))
+    if not json_files:
+        print(f"⚠️ لا توجد ملفات كاش في {data_dir}")
+        return
+
+    for json_path in json_files:
+        npz_path = json_path[:-len(".json")] + ".npz"
+        try:
+            start = time.perf_counter()
+            store = PriceStore.from_json_cache(json_path)
+            store.save_npz(npz_path)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            PriceStore.load_npz(npz_path)
+            load_ms = (time.perf_counter() - start) * 1000
+
+            print(f"✅ {json_path} → {npz_path}: {len(store)} سهم، "
+                  f"{os.path.getsize(json_path) // 1024}KB → {os.path.getsize(npz_path) // 1024}KB "
+                  f"(تحويل {elapsed:.0f}ms، تحميل {load_ms:.1f}ms)")
+        except Exception as e:
+            print(f"❌ فشل تحويل {json_path}: {e}")
+
+
+if __name__ == "__main__":
+    convert_all(sys.argv[1] if len(sys.argv) > 1 else "data")
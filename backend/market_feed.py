@@ -6,6 +6,8 @@ import random
 import requests
 from datetime import datetime, timedelta
 
+from app.services.synthetic_market import MarketRegime, synthetic_store, trading_days
+
 # --- Configuration ---
 DATA_DIR = os.path.join("backend", "data")
 HISTORICAL_FILE = os.path.join(DATA_DIR, "market_history_1y.json")
@@ -47,39 +49,16 @@ def generate_synthetic_history(ticker, days=365):
     elif "2222" in ticker: start_price = 30 # Aramco
     elif "AAPL" in ticker: start_price = 180
     
-    current_price = start_price
-    records = []
-    
-    # Generate walking path
-    date_curs = datetime.now() - timedelta(days=days)
-    
-    for _ in range(days):
-        # Skip weekends (approximate)
-        if date_curs.weekday() >= 5: # Fri/Sat or Sat/Sun depending on market, keep simple
-            date_curs += timedelta(days=1)
-            continue
-            
-        # Random daily movement (-2% to +2%)
-        change = random.uniform(-0.02, 0.025) # Slight bullish bias
-        
-        open_p = current_price
-        close_p = open_p * (1 + change)
-        high_p = max(open_p, close_p) * (1 + random.uniform(0, 0.01))
-        low_p = min(open_p, close_p) * (1 - random.uniform(0, 0.01))
-        
-        records.append({
-            "date": date_curs.strftime("%Y-%m-%d"),
-            "open": round(open_p, 2),
-            "high": round(high_p, 2),
-            "low": round(low_p, 2),
-            "close": round(close_p, 2),
-            "volume": int(random.uniform(100000, 5000000))
-        })
-        
-        current_price = close_p
-        date_curs += timedelta(days=1)
-        
-    return records
+    # مسار عشوائي متجه (أيام العمل خلال آخر days يوم)
+    store = synthetic_store(
+        [ticker], days=trading_days(start=datetime.now() - timedelta(days=days), end=datetime.now()),
+        seed=random.randrange(2**32), regimes=(MarketRegime(drift=0.0025, volatility=0.013),),
+        start_price=start_price,
+    )
+    return [
+        {**bar, "date": bar["date"].strftime("%Y-%m-%d")}
+        for bar in store.rows(ticker)
+    ]
 
 def fetch_historical_data():
     """Fetches 1 Year of Daily Data for Analysis"""
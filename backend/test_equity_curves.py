@@ -0,0 +1,48 @@
+"""
+Check the daily mark-to-market equity of every bot on the bundled market data
+
+Both bundled sources are covered: the central seed file (read when the engine runs
+from the project root) and the per-market caches (read when it runs from backend/).
+"""
+import contextlib
+import io
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.backtest_engine import BacktestEngine
+
+MARKETS = ("saudi", "us", "crypto")
+
+# مصدر البيانات ← مجلد التشغيل (مسارات المحرك نسبية لمجلد التشغيل)
+DATA_SOURCES = {
+    "seed": os.path.dirname(BACKEND_DIR),
+    "cache": BACKEND_DIR,
+}
+
+
+def check_equity_curves(results, label):
+    for bot_id, portfolio in results['bot_portfolios'].items():
+        lowest = min(portfolio['equity_curve'])
+        assert lowest > 0, f"{label}/{bot_id}: الرصيد اليومي نزل إلى {lowest}"
+        assert portfolio['max_drawdown'] <= 100, f"{label}/{bot_id}: أقصى تراجع {portfolio['max_drawdown']}%"
+        # آخر يوم في المنحنى = الرصيد النهائي بعد الإغلاق القسري
+        assert abs(portfolio['equity_curve'][-1] - portfolio['final_balance']) < 0.01, \
+            f"{label}/{bot_id}: آخر رصيد يومي {portfolio['equity_curve'][-1]} != {portfolio['final_balance']}"
+
+
+def test_equity_curves_stay_positive():
+    for source, workdir in DATA_SOURCES.items():
+        for market in MARKETS:
+            with contextlib.chdir(workdir), contextlib.redirect_stdout(io.StringIO()):
+                results = BacktestEngine('2024-01-01', 100000, market).run()
+
+            check_equity_curves(results, f"{source}/{market}")
+            worst_id, worst = max(results['bot_portfolios'].items(), key=lambda item: item[1]['max_drawdown'])
+            print(f"✅ {source}/{market}: أقصى تراجع {worst['max_drawdown']}% ({worst_id})")
+
+
+if __name__ == '__main__':
+    test_equity_curves_stay_positive()
@@ -0,0 +1,101 @@
+"""
+Compare resolve_exit with the day-by-day exit loop it replaced
+(run from backend/: python test_exit_resolver.py)
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.exit_resolver import EXIT_STOP_LOSS, EXIT_TAKE_PROFIT, EXIT_TIMEOUT, resolve_exit
+
+
+def day_by_day_exit(close, dates, entry_idx, take_profit, stop_loss, max_days=None, first_idx=None):
+    """حلقة الخروج القديمة: كل يوم له سعر بالترتيب، الهدف ثم الوقف ثم المدة"""
+    start = entry_idx + 1 if first_idx is None else max(first_idx, entry_idx + 1)
+    for idx in range(start, len(close)):
+        price = close[idx]
+        if np.isnan(price):
+            continue
+        if price >= take_profit:
+            return idx, EXIT_TAKE_PROFIT
+        if price <= stop_loss:
+            return idx, EXIT_STOP_LOSS
+        if max_days is not None and dates[idx] - dates[entry_idx] >= max_days:
+            return idx, EXIT_TIMEOUT
+    return None, None
+
+
+def check(close, dates, entry_idx, take_profit, stop_loss, max_days=None, first_idx=None):
+    expected = day_by_day_exit(close, dates, entry_idx, take_profit, stop_loss, max_days, first_idx)
+    actual = resolve_exit(close, dates, entry_idx, take_profit, stop_loss, max_days=max_days, first_idx=first_idx)
+    assert actual == expected, f"resolve_exit={actual} day_by_day={expected}"
+    return actual
+
+
+def test_take_profit_wins_over_stop_loss_on_same_bar():
+    close = np.array([100.0, 101.0, 100.0])
+    dates = np.arange(3)
+    # هدف ووقف متقاطعان: نفس الشمعة تحقق الاثنين
+    assert check(close, dates, 0, take_profit=100.5, stop_loss=102.0) == (1, EXIT_TAKE_PROFIT)
+
+    high = np.array([100.0, 106.0, 100.0])
+    low = np.array([100.0, 94.0, 100.0])
+    assert resolve_exit(close, dates, 0, 105.0, 95.0, high=high, low=low) == (1, EXIT_TAKE_PROFIT)
+
+
+def test_nan_gaps_are_skipped():
+    close = np.array([100.0, np.nan, np.nan, 98.0, np.nan, 110.0])
+    dates = np.arange(6)
+    assert check(close, dates, 0, take_profit=105.0, stop_loss=95.0) == (5, EXIT_TAKE_PROFIT)
+    assert check(close, dates, 0, take_profit=120.0, stop_loss=98.0) == (3, EXIT_STOP_LOSS)
+    assert check(close, dates, 0, take_profit=120.0, stop_loss=50.0) == (None, None)
+
+
+def test_timeout_on_no_price_day_moves_to_next_priced_bar():
+    close = np.array([100.0, 101.0, 99.0, np.nan, np.nan, 100.5, 101.0])
+    dates = np.arange(7)
+    # المدة تكتمل في اليوم 3 (بلا سعر) فالخروج في أول يوم له سعر بعده
+    assert check(close, dates, 0, take_profit=110.0, stop_loss=90.0, max_days=3) == (5, EXIT_TIMEOUT)
+    # الهدف له الأولوية في شمعة انتهاء المدة
+    assert check(close, dates, 0, take_profit=100.4, stop_loss=90.0, max_days=3) == (1, EXIT_TAKE_PROFIT)
+    close[5] = 112.0
+    assert check(close, dates, 0, take_profit=110.0, stop_loss=90.0, max_days=3) == (5, EXIT_TAKE_PROFIT)
+    # أيام تقويمية: المدة تُحسب من التواريخ لا من عدد الشموع
+    weekly = np.array([0, 7, 14, 21])
+    assert check(np.array([100.0, 101.0, 102.0, 103.0]), weekly, 0, 110.0, 90.0, max_days=10) == (2, EXIT_TIMEOUT)
+
+
+def test_first_idx_after_next_bar():
+    close = np.array([100.0, 120.0, 80.0, 101.0, 106.0, 100.0])
+    dates = np.arange(6)
+    # الشموع قبل first_idx لا تُفحص (صفقة مستعادة من نقطة حفظ)
+    assert check(close, dates, 0, take_profit=105.0, stop_loss=95.0, first_idx=3) == (4, EXIT_TAKE_PROFIT)
+    assert check(close, dates, 0, take_profit=130.0, stop_loss=95.0, max_days=2, first_idx=4) == (4, EXIT_TIMEOUT)
+    # first_idx قبل الدخول لا يعيد فحص شمعة الدخول
+    assert check(close, dates, 2, take_profit=105.0, stop_loss=70.0, first_idx=0) == (4, EXIT_TAKE_PROFIT)
+
+
+def test_random_paths_match_day_by_day_loop():
+    rng = np.random.default_rng(7)
+    for _ in range(2000):
+        n = int(rng.integers(2, 200))
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.02, n))
+        close[rng.random(n) < 0.2] = np.nan
+        close[0] = 100.0
+        dates = np.cumsum(rng.integers(1, 4, n))
+        entry_idx = int(rng.integers(0, n))
+        take_profit = 100 * (1 + rng.uniform(0.0, 0.3))
+        stop_loss = 100 * (1 - rng.uniform(0.0, 0.3))
+        max_days = None if rng.random() < 0.3 else float(rng.integers(1, 60))
+        first_idx = None if rng.random() < 0.5 else int(rng.integers(0, n + 1))
+        check(close, dates, entry_idx, take_profit, stop_loss, max_days, first_idx)
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,210 @@
+"""
+Compare the vectorized indicator series with the original day-by-day formulas
+on the bundled market data (run from backend/: python test_indicator_parity.py)
+
+Every rounded value must match exactly: entry signals compare prices with these
+rounded indicators, so a flip at a .xx5 boundary changes which trades open.
+"""
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.services.technical_indicators import TechnicalIndicators, BB_POSITION_NAMES
+
+# ملفات البيانات المضمنة (مجلد المشروع و backend/)
+DATA_FILES = [
+    os.path.join(root, "data", f"cache_{market}.json")
+    for root in (os.path.dirname(BACKEND_DIR), BACKEND_DIR)
+    for market in ("saudi", "us", "crypto")
+]
+
+
+# =============== المعادلات الأصلية (يوماً بيوم) ===============
+
+def baseline_rsi(prices, period=14):
+    changes = [prices[i] - prices[i-1] for i in range(len(prices) - period, len(prices))]
+    avg_gain = sum(c if c > 0 else 0 for c in changes) / period
+    avg_loss = sum(-c if c < 0 else 0 for c in changes) / period
+    if avg_loss == 0:
+        return 100.0
+    return round(100 - (100 / (1 + avg_gain / avg_loss)), 2)
+
+
+def baseline_sma(prices, period):
+    return round(sum(prices[-period:]) / period, 2)
+
+
+def baseline_ema_values(prices, period):
+    """EMA غير مقربة لكل يوم (نفس خطوات calculate_ema على كل بادئة)"""
+    multiplier = 2 / (period + 1)
+    ema = sum(prices[:period]) / period
+    values = [None] * (period - 1) + [ema]
+    for price in prices[period:]:
+        ema = (price * multiplier) + (ema * (1 - multiplier))
+        values.append(ema)
+    return values
+
+
+def baseline_volume_change(volumes, period=20):
+    avg_volume = sum(volumes[-period-1:-1]) / period
+    if avg_volume == 0:
+        return 0
+    return round((volumes[-1] / avg_volume) * 100, 1)
+
+
+def baseline_bollinger(prices, period=20, std_dev=2):
+    recent = prices[-period:]
+    middle = sum(recent) / period
+    std = math.sqrt(sum((p - middle) ** 2 for p in recent) / period)
+    upper = middle + (std_dev * std)
+    lower = middle - (std_dev * std)
+    position = "overbought" if prices[-1] >= upper else "oversold" if prices[-1] <= lower else "neutral"
+    return {"upper": round(upper, 2), "middle": round(middle, 2), "lower": round(lower, 2), "position": position}
+
+
+def baseline_day(closes, volumes, ema_12, ema_26, day_idx):
+    """قيم get_all_indicators الأصلية ليوم واحد"""
+    prices = closes[:day_idx + 1]
+    values = {"rsi": None, "sma_20": None, "sma_50": None, "sma_200": None,
+              "ema_12": None, "ema_26": None, "macd_line": None, "macd_signal": None,
+              "macd_histogram": None, "bollinger": None, "volume_change": None}
+    if len(prices) >= 15:
+        values["rsi"] = baseline_rsi(prices)
+    for period in (20, 50, 200):
+        if len(prices) >= period:
+            values[f"sma_{period}"] = baseline_sma(prices, period)
+    if ema_12[day_idx] is not None:
+        values["ema_12"] = round(ema_12[day_idx], 2)
+    if ema_26[day_idx] is not None:
+        values["ema_26"] = round(ema_26[day_idx], 2)
+        macd_line = round(values["ema_12"] - values["ema_26"], 4)
+        signal_line = round(macd_line * 0.8, 4)
+        values.update(macd_line=macd_line, macd_signal=signal_line,
+                      macd_histogram=round(macd_line - signal_line, 4))
+    if len(prices) >= 20:
+        values["bollinger"] = baseline_bollinger(prices)
+    if len(prices) >= 21:
+        values["volume_change"] = baseline_volume_change(volumes[:day_idx + 1])
+    return values
+
+
+# =============== المقارنة ===============
+
+def load_symbols():
+    for path in DATA_FILES:
+        with open(path, 'r', encoding='utf-8') as f:
+            for symbol, rows in json.load(f).items():
+                if rows:
+                    yield f"{os.path.relpath(path, BACKEND_DIR)}:{symbol}", rows
+
+
+def rounded(series, day_idx, ndigits):
+    value = series[day_idx]
+    return None if np.isnan(value) else round(float(value), ndigits)
+
+
+def check_symbol(label, rows):
+    closes = [row["close"] for row in rows]
+    volumes = [row["volume"] for row in rows]
+    ema_12 = baseline_ema_values(closes, 12) if len(closes) >= 12 else [None] * len(closes)
+    ema_26 = baseline_ema_values(closes, 26) if len(closes) >= 26 else [None] * len(closes)
+
+    series = {
+        "rsi": (TechnicalIndicators.calculate_rsi_series(closes, 14), 2),
+        "sma_20": (TechnicalIndicators.calculate_sma_series(closes, 20), 2),
+        "sma_50": (TechnicalIndicators.calculate_sma_series(closes, 50), 2),
+        "sma_200": (TechnicalIndicators.calculate_sma_series(closes, 200), 2),
+        "ema_12": (TechnicalIndicators.calculate_ema_series(closes, 12), 2),
+        "ema_26": (TechnicalIndicators.calculate_ema_series(closes, 26), 2),
+        "macd_line": (TechnicalIndicators.calculate_macd_series(closes)["macd_line"], 4),
+        "volume_change": (TechnicalIndicators.calculate_volume_change_series(volumes, 20), 1),
+    }
+    bollinger = TechnicalIndicators.calculate_bollinger_series(closes, 20)
+    columns = TechnicalIndicators.compute_indicator_columns(rows)
+
+    for day_idx in range(1, len(rows)):
+        expected = baseline_day(closes, volumes, ema_12, ema_26, day_idx)
+        where = f"{label} {rows[day_idx]['date']}"
+
+        for name, (values, ndigits) in series.items():
+            assert rounded(values, day_idx, ndigits) == expected[name], \
+                f"{where}: {name}_series={rounded(values, day_idx, ndigits)} الأصلي={expected[name]}"
+
+        actual_bands = None
+        if not np.isnan(bollinger["middle"][day_idx]):
+            actual_bands = {band: rounded(bollinger[band], day_idx, 2) for band in ("upper", "middle", "lower")}
+            actual_bands["position"] = BB_POSITION_NAMES[int(bollinger["position"][day_idx])]
+        assert actual_bands == expected["bollinger"], f"{where}: bollinger={actual_bands} الأصلي={expected['bollinger']}"
+
+        snapshot = TechnicalIndicators.snapshot_from_columns(rows, columns, day_idx)
+        actual = {
+            "rsi": snapshot["rsi"]["value"],
+            "sma_20": snapshot["sma"]["sma_20"], "sma_50": snapshot["sma"]["sma_50"],
+            "sma_200": snapshot["sma"]["sma_200"],
+            "ema_12": snapshot["ema"]["ema_12"], "ema_26": snapshot["ema"]["ema_26"],
+            "macd_line": snapshot["macd"] and snapshot["macd"]["macd_line"],
+            "macd_signal": snapshot["macd"] and snapshot["macd"]["signal_line"],
+            "macd_histogram": snapshot["macd"] and snapshot["macd"]["histogram"],
+            "bollinger": snapshot["bollinger"],
+            "volume_change": snapshot["volume"]["change_pct"],
+        }
+        assert actual == expected, f"{where}: اللقطة {actual} الأصلي {expected}"
+
+    return len(rows)
+
+
+def test_series_match_day_by_day_formulas():
+    for label, rows in load_symbols():
+        check_symbol(label, rows)
+
+
+def test_get_all_indicators_matches_columns():
+    for label, rows in load_symbols():
+        columns = TechnicalIndicators.compute_indicator_columns(rows)
+        for day_idx in range(1, len(rows), 37):
+            assert TechnicalIndicators.get_all_indicators(rows, day_idx) == \
+                TechnicalIndicators.snapshot_from_columns(rows, columns, day_idx), f"{label} {day_idx}"
+
+
+def test_batch_columns_match_single_symbol():
+    for path in DATA_FILES:
+        with open(path, 'r', encoding='utf-8') as f:
+            symbols = [rows for rows in json.load(f).values() if rows]
+        n_days = max(len(rows) for rows in symbols)
+        closes = np.full((len(symbols), n_days), np.nan)
+        volumes = np.full((len(symbols), n_days), np.nan)
+        for i, rows in enumerate(symbols):
+            closes[i, :len(rows)] = [row["close"] for row in rows]
+            volumes[i, :len(rows)] = [row["volume"] for row in rows]
+
+        batch = TechnicalIndicators.compute_indicator_columns_from_arrays(closes, volumes)
+        for i, rows in enumerate(symbols):
+            single = TechnicalIndicators.compute_indicator_columns(rows)
+            for name, values in single.items():
+                np.testing.assert_array_equal(batch[name][i, :len(rows)], values, err_msg=f"{path} {i} {name}")
+
+
+def test_rounding_ties_from_cache():
+    # قيم على حد التقريب قلبها المجموع التراكمي (إشارة دخول البصيرة)
+    with open(os.path.join(BACKEND_DIR, "data", "cache_crypto.json"), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for symbol, date, sma_20 in (("XRP-USD", "2024-03-21", 0.64), ("DOGE-USD", "2025-05-23", 0.21)):
+        rows = data[symbol]
+        day_idx = next(i for i, row in enumerate(rows) if row["date"].startswith(date))
+        closes = [row["close"] for row in rows[:day_idx + 1]]
+        assert baseline_sma(closes, 20) == sma_20
+        assert TechnicalIndicators.get_all_indicators(rows, day_idx)["sma"]["sma_20"] == sma_20
+        assert rounded(TechnicalIndicators.calculate_sma_series(closes, 20), day_idx, 2) == sma_20
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,56 @@
+"""
+Check that cached backtest results cannot be changed through the dicts that
+callers put in or get back (run from backend/: python test_result_cache.py)
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.result_cache import BacktestResultCache
+
+
+def sample_result():
+    return {"simulation_id": "k1", "bot_portfolios": {"al_nami": {"trades": [{"symbol": "2222.SR", "profit": 10.0}]}}}
+
+
+def test_returned_results_are_independent_copies():
+    cache = BacktestResultCache(max_entries=4)
+    result = sample_result()
+    cache.put("k1", result)
+
+    # تعديل النتيجة بعد التخزين
+    result["bot_portfolios"]["al_nami"]["trades"].clear()
+
+    first = cache.get("k1")
+    assert first == sample_result()
+    first["simulation_id"] = "changed"
+    first["bot_portfolios"]["al_nami"]["trades"][0]["profit"] = -1.0
+
+    latest = cache.latest()
+    latest["bot_portfolios"].clear()
+
+    assert cache.get("k1") == sample_result()
+    assert cache.latest() == sample_result()
+    assert cache.get("k1") is not cache.get("k1")
+
+
+def test_results_loaded_from_disk_are_copies():
+    with tempfile.TemporaryDirectory() as persist_dir:
+        BacktestResultCache(max_entries=4, persist_dir=persist_dir).put("k1", sample_result())
+
+        cache = BacktestResultCache(max_entries=4, persist_dir=persist_dir)
+        loaded = cache.get("k1")
+        loaded["bot_portfolios"]["al_nami"]["trades"].append({"symbol": "1120.SR"})
+
+        assert cache.get("k1") == sample_result()
+        assert cache.stats()["hits"] == 2 and cache.get("missing") is None
+        assert cache.stats()["misses"] == 1
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -6,6 +6,9 @@ import json
 import os
 from datetime import datetime, timedelta
 
+from app.services.exit_resolver import resolve_exit
+from app.services.synthetic_market import MARKET_WEEKMASKS, MarketRegime, generate_ohlcv, trading_days
+
 # --- CONFIGURATION ---
 MARKETS = {
     "SAUDI": [
@@ -265,9 +268,98 @@ def check_entry_signal(robot_key, row, prev_row, fundamentals=None):
 
     except:
         return False
-        
+
     return False
 
+# --- VECTORIZED ENTRY SIGNALS ---
+# نفس شروط check_entry_signal لكن على أعمدة السهم كاملة: قناع دخول لكل شمعة
+# يُحسب مرة واحدة لكل سهم، و prev عمود مزاح بشمعة (NaN للشمعة الأولى)
+class _Columns:
+    """أعمدة إطار السهم كمصفوفات float (shift=1 لقيم الشمعة السابقة)"""
+
+    def __init__(self, df, shift=0):
+        self._df = df
+        self._shift = shift
+        self._cache = {}
+
+    def __getitem__(self, column):
+        if column not in self._cache:
+            values = self._df[column].to_numpy(dtype=float)
+            if self._shift:
+                values = np.concatenate((np.full(self._shift, np.nan), values[:-self._shift]))
+            self._cache[column] = values
+        return self._cache[column]
+
+
+STRATEGY_MASKS = {
+    # --- 1. TREND FOLLOWERS ---
+    "TREND_MACD": lambda c, p, f: (c['MACD'] > c['Signal_Line']) & (p['MACD'] <= p['Signal_Line']) & (c['Close'] > c['SMA_50']),
+    "SMA_CROSSOVER": lambda c, p, f: (f['roe'] > 0.10) & (c['SMA_50'] > c['SMA_200']) & (p['SMA_50'] <= p['SMA_200']),
+    "TREND_FOLLOWING": lambda c, p, f: (c['Close'] > c['SMA_50']) & (c['SMA_50'] > p['SMA_50']),
+
+    # --- 2. MEAN REVERSION / DIPS ---
+    "RSI_OVERSOLD": lambda c, p, f: (c['RSI'] < 30) & (c['RSI'] > p['RSI']),
+    "BOLLINGER_REVERSAL": lambda c, p, f: (p['Close'] < p['BB_Lower']) & (c['Close'] > c['BB_Lower']),
+    "VALUE_DIP": lambda c, p, f: (not f['div_yield'] < 0.02) & (np.abs(c['Close'] - c['SMA_200']) / c['Close'] < 0.03) & (c['RSI'] < 45),
+
+    # --- 3. MOMENTUM / BREAKOUT ---
+    "BREAKOUT_RESISTANCE": lambda c, p, f: (c['Close'] > c['BB_Upper']) & (c['Vol_Intensity'] > 1.2),
+    "MOMENTUM_ROC": lambda c, p, f: (c['ROC'] > 5) & (c['RSI'] > 50),
+    "HIGH_MOMENTUM": lambda c, p, f: (c['Close'] > c['SMA_50']) & (c['RSI'] > 60) & (c['ROC'] > 3),
+    "EXPONENTIAL_MOMENTUM": lambda c, p, f: (c['ROC'] > 10) & (c['Vol_Intensity'] > 1.5),
+
+    # --- 4. VOLATILITY / SPECIAL ---
+    "VOLATILITY_BREAKOUT": lambda c, p, f: (c['ATR'] > p['ATR']) & (c['Close'] > c['BB_Upper']),
+    "LOW_VOLATILITY": lambda c, p, f: (c['ATR'] < p['ATR']) & (c['RSI'] > 40) & (c['RSI'] < 60),
+    "GAP_FILL": lambda c, p, f: c['Open'] < p['Low'] * 0.98,
+    "VOLUME_ACCUMULATION": lambda c, p, f: (np.abs(c['Close'] - p['Close']) / p['Close'] < 0.01) & (c['Vol_Intensity'] > 2.0),
+    "MULTI_INDICATOR": lambda c, p, f: (c['RSI'] > 55) & (c['MACD'] > 0) & (c['Close'] > c['SMA_50']),
+    "HIGH_BETA_RSI": lambda c, p, f: c['RSI'] < 25,
+
+    # --- 5. LEGACY & ELITE STRATEGIES ---
+    "DCA_STRATEGY": lambda c, p, f: np.abs(c['Close'] - c['SMA_50']) / c['SMA_50'] < 0.05,
+    "HIGH_RISK_REVERSAL": lambda c, p, f: (c['Close'] < c['BB_Lower']) & (c['RSI'] < 25),
+    "SCALPING_RSI": lambda c, p, f: (c['RSI'] > 40) & (p['RSI'] <= 40),
+    "FUNDAMENTAL_PROXY": lambda c, p, f: ((f['pe'] > 0) and (f['pe'] < 25)) & (c['Close'] > c['SMA_200']) & (c['RSI'] < 70),
+    "BALANCED_SMA": lambda c, p, f: (c['Close'] > c['SMA_50']) & (c['ATR'] < p['ATR']),
+    "SAFE_HAVEN": lambda c, p, f: (c['ATR'] < c['Close'] * 0.01) & (c['RSI'] < 45),
+
+    # --- 6. NEW AI & ADVANCED BOTS ---
+    "GRID_RANGE": lambda c, p, f: (np.abs(c['ROC']) < 2.0) & (c['Close'] < c['BB_Mid']) & (c['Close'] > c['BB_Lower']),
+    # الصفوف في المحاكاة قواميس بلا name، فالـ"مشاعر" مشتقة من الإغلاق
+    "AI_SENTIMENT": lambda c, p, f: (np.trunc(c['Close'] * 100) % 100 / 100.0 > 0.85) & (c['Close'] > c['SMA_50']),
+    "PAIR_CORRELATION": lambda c, p, f: (c['Close'] < p['Close']) & (c['RSI'] > p['RSI']) & (c['RSI'] < 40),
+}
+
+
+def entry_signal_mask(strategy, df, fundamentals=None):
+    """
+    قناع الدخول لاستراتيجية على كل شموع السهم (مطابق لـ check_entry_signal صفاً صفاً)
+
+    الشمعة الأولى بلا شمعة سابقة فلا دخول فيها، وأي خطأ (عمود ناقص، بيانات أساسية
+    غير رقمية) يعني لا دخول في كل الشموع كما في الدالة الأصلية.
+    """
+    n = len(df)
+    compute = STRATEGY_MASKS.get(strategy)
+    if compute is None or n == 0:
+        return np.zeros(n, dtype=bool)
+
+    f = {
+        'pe': fundamentals.get('pe_ratio', 999) if fundamentals else 999,
+        'div_yield': fundamentals.get('dividend_yield', 0) if fundamentals else 0,
+        'roe': fundamentals.get('roe', 0) if fundamentals else 0,
+    }
+    try:
+        current = _Columns(df)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mask = np.broadcast_to(compute(current, _Columns(df, shift=1), f), (n,)).astype(bool)
+        mask &= ~np.isnan(current['Close'])
+    except Exception:
+        return np.zeros(n, dtype=bool)
+
+    mask[0] = False
+    return mask
+
 import requests
 from bs4 import BeautifulSoup
 import re
@@ -318,70 +410,124 @@ def scrape_live_price(symbol):
 def generate_mock_data(symbol, days=600, target_end_price=None):
     # Deterministic seed based on symbol name length and chars to keep it consistent
     seed_val = sum(ord(c) for c in symbol) + (int(target_end_price) if target_end_price else 0)
-    np.random.seed(seed_val)
-    
-    dates = pd.date_range(end=datetime.now(), periods=days)
     
     # Diff characteristics per market/symbol
     volatility = 0.015 
     if "BTC" in symbol or "ETH" in symbol: volatility = 0.035
     elif "TSLA" in symbol: volatility = 0.025
     
-    start_price = 100.0
+    # مسار متجه على كل أيام الأسبوع (نفس البذرة لنفس الرمز)
+    days_index = trading_days(days, weekmask=MARKET_WEEKMASKS["crypto"])
+    regime = MarketRegime(drift=0.0 if target_end_price else 0.0002, volatility=volatility, spike_prob=0.0)
+    bars = generate_ohlcv(symbol, days_index, seed=seed_val, regimes=(regime,), start_price=100.0,
+                          volume_range=(500000, 10000000), decimals=None)
+    
     if target_end_price:
-        # If we have a real target, we calculate the required drift to hit it
-        # Random path with bridge
-        returns = np.random.normal(0, volatility, days)
-        raw_path = np.exp(np.cumsum(returns))
-        # Scale path to start at 100 and end at target
-        scaled_path = raw_path * (target_end_price / raw_path[-1])
-        prices = scaled_path
-    else:
-        # Pure random
-        prices = start_price * np.exp(np.cumsum(np.random.normal(0.0002, volatility, days)))
-
-    df = pd.DataFrame(index=dates)
-    df['Close'] = prices
-    df['Open'] = prices * (1 + np.random.normal(0, 0.005, days))
-    df['High'] = df[['Close', 'Open']].max(axis=1) * (1 + abs(np.random.normal(0, 0.01, days)))
-    df['Low'] = df[['Close', 'Open']].min(axis=1) * (1 - abs(np.random.normal(0, 0.01, days)))
-    df['Volume'] = np.random.randint(500000, 10000000, days)
+        # If we have a real target, scale the path to end at it
+        scale = target_end_price / bars["close"][-1]
+        for column in ("open", "high", "low", "close"):
+            bars[column] = bars[column] * scale
+    
+    df = pd.DataFrame(index=pd.to_datetime(days_index.astype('datetime64[D]')))
+    df['Close'] = bars["close"]
+    df['Open'] = bars["open"]
+    df['High'] = bars["high"]
+    df['Low'] = bars["low"]
+    df['Volume'] = bars["volume"]
     
     return df
 
+# --- DATA ACQUISITION ---
+# أقصى عدد طلبات متزامنة للبيانات الأساسية وأسعار الجلب (ticker.info لكل سهم)
+ACQUISITION_WORKERS = 8
+
+
+def download_market_history(symbols, period="2y"):
+    """
+    تاريخ أسعار كل أسهم السوق بطلب yf.download واحد متعدد الرموز
+
+    Returns:
+        {symbol: DataFrame} بأعمدة Open/High/Low/Close/Volume (فارغ للسهم الذي فشل تحميله)
+    """
+    frames = {symbol: pd.DataFrame() for symbol in symbols}
+    try:
+        data = yf.download(symbols, period=period, interval="1d", group_by="ticker", progress=False)
+    except:
+        return frames
+    if data is None or data.empty:
+        return frames
+
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            df = data[symbol]
+        else:
+            df = data  # رمز واحد: أعمدة مسطحة
+        # الأيام التي لم يتداول فيها السهم (اتحاد أيام الرموز) صفوف فارغة
+        frames[symbol] = df.dropna(how="all").copy()
+    return frames
+
+
+def acquire_market_data(symbols, timings):
+    """
+    مرحلة جلب بيانات سوق كامل قبل المحاكاة
+
+    الأسعار بطلب واحد للسوق، والبيانات الأساسية (ticker.info) بالتوازي معه على
+    مجمع خيوط محدود، ثم جلب السعر الحي بالتوازي للأسهم التي تحتاج بيانات محاكاة.
+
+    Returns:
+        {symbol: {"df": DataFrame, "fundamentals": dict}} بترتيب symbols،
+        وأزمنة كل مصدر تُضاف إلى timings (RunTimings)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import time
+
+    workers = max(1, min(ACQUISITION_WORKERS, len(symbols)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="market-data") as pool:
+        started = time.perf_counter()
+        fundamentals_futures = [pool.submit(fetch_fundamentals, symbol) for symbol in symbols]
+
+        with timings.phase("download"):
+            frames = download_market_history(symbols)
+
+        fundamentals = [future.result() for future in fundamentals_futures]
+        timings.add("fundamentals", time.perf_counter() - started, calls=len(symbols))
+
+        # لا تاريخ كافٍ: السعر الحي (إن وُجد) يثبّت نهاية مسار المحاكاة
+        fallback = [symbol for symbol in symbols if frames[symbol].empty or len(frames[symbol]) < 50]
+        if fallback:
+            with timings.phase("scrape"):
+                live_prices = dict(zip(fallback, pool.map(scrape_live_price, fallback)))
+            for symbol in fallback:
+                frames[symbol] = generate_mock_data(symbol, target_end_price=live_prices[symbol])
+
+    return {symbol: {"df": frames[symbol], "fundamentals": fundamentals[i]} for i, symbol in enumerate(symbols)}
+
 # --- ENGINE ---
 def run_universal_simulation():
+    from app.services.run_timings import RunTimings
+
     all_trades = []
+    timings = RunTimings()
     
     print("🌍 Starting Universal Market Engine v3 (with Live Scraper)...")
     
     for market_name, symbols in MARKETS.items():
         print(f"  Scanning Market: {market_name}...")
         
+        # 1. جلب بيانات السوق كاملاً (أسعار + بيانات أساسية) قبل المحاكاة
+        market_timings = RunTimings()
+        market_data = acquire_market_data(symbols, market_timings)
+        phases = market_timings.to_dict()["phases"]
+        print(f"  ⏱️ {market_name} data: " + " | ".join(f"{source}: {entry['wall_ms']:.0f}ms" for source, entry in phases.items()))
+        for source, entry in market_timings.phases.items():
+            timings.add(source, entry["wall"], entry["cpu"], calls=entry["calls"])
+        
         for symbol in symbols:
             try:
-                # 1. Fetch Fundamentals
-                fundamentals = fetch_fundamentals(symbol)
-                
-                # 2. Try Download or Fallback
-                df = pd.DataFrame()
-                real_price = None
-                
-                try:
-                    df = yf.download(symbol, period="2y", interval="1d", progress=False)
-                except:
-                    pass
-
-                # 3. IF Empty, Try Scraping Real Price + Mock History
-                if df.empty or len(df) < 50:
-                    real_price = scrape_live_price(symbol)
-                    
-                    if real_price:
-                        # print(f"✅ Anchoring {symbol} to Live Price: {real_price}")
-                        df = generate_mock_data(symbol, target_end_price=real_price)
-                    else:
-                        # Total fallback
-                        df = generate_mock_data(symbol)
+                fundamentals = market_data[symbol]["fundamentals"]
+                df = market_data[symbol]["df"]
                 
                 # FIX: FORCE FLATTENING
                 if isinstance(df.columns, pd.MultiIndex):
@@ -399,64 +545,74 @@ def run_universal_simulation():
                 df = add_indicators(df)
                 df = df.dropna()
                 
-                # Convert to records to avoid index issues
-                rows = df.to_dict('records')
                 dates = df.index.strftime('%Y-%m-%d').tolist()
+                closes = df['Close'].to_numpy(dtype=float)
+                day_numbers = df.index.values.astype('datetime64[D]').astype(np.int64)
+                rsi = df['RSI'].to_numpy(dtype=float) if 'RSI' in df.columns else np.full(len(df), 50.0)
+                sma_50 = df['SMA_50'].to_numpy(dtype=float) if 'SMA_50' in df.columns else np.zeros(len(df))
+                
+                # قناع دخول واحد لكل استراتيجية على كل شموع السهم
+                masks = {}
                 
                 for robot_key, robot_cfg in ROBOTS.items():
+                    strategy = robot_cfg['strategy_type']
+                    if strategy not in masks:
+                        masks[strategy] = entry_signal_mask(strategy, df, fundamentals)
+                    candidates = np.flatnonzero(masks[strategy])
                     active_trade = None
                     
-                    for i in range(1, len(rows)):
-                        row = rows[i]
-                        prev_row = rows[i-1]
-                        current_date_str = dates[i]
+                    # صفقة واحدة مفتوحة في كل مرة: القفز مباشرة لأول إشارة بعد آخر خروج
+                    i = 1
+                    while True:
+                        pos = int(np.searchsorted(candidates, i))
+                        if pos == len(candidates):
+                            break
+                        i = int(candidates[pos])
+                        
+                        entry_price = float(closes[i])
+                        target = entry_price * (1 + (0.05 * robot_cfg['risk_reward']))
+                        stop = entry_price * 0.95
+                        
+                        active_trade = {
+                            "id": f"{len(all_trades)+1}",
+                            "bot_id": robot_key,
+                            "market": market_name,
+                            "symbol": symbol,
+                            "entry_date": dates[i],
+                            "entry_price": round(entry_price, 2),
+                            "take_profit": round(target, 2),
+                            "stop_loss": round(stop, 2),
+                            "status": "open",
+                            "entry_indicators": {
+                                "rsi": {"value": round(float(rsi[i]), 1)},
+                                "sma": {"sma_50": round(float(sma_50[i]), 2)},
+                                "volume": {"change_pct": 120}
+                            }
+                        }
+                
+                        # الخروج مباشرة عند أول شمعة تحقق الهدف/الوقف/المدة (> 14 يوم)
+                        exit_idx, _ = resolve_exit(closes, day_numbers, i, active_trade['take_profit'],
+                                                   active_trade['stop_loss'], max_days=15)
+                        if exit_idx is None:
+                            break
+                        
+                        exit_close = float(closes[exit_idx])
+                        active_trade['exit_date'] = dates[exit_idx]
+                        active_trade['exit_price'] = round(exit_close, 2)
+                        active_trade['status'] = "closed"
                         
-                        current_close = float(row['Close'])
+                        profit_amount = exit_close - active_trade['entry_price']
+                        profit_pct = (profit_amount / active_trade['entry_price']) * 100
+                        active_trade['profit_pct'] = round(profit_pct, 2)
                         
-                        if active_trade is None:
-                            # PASS FUNDAMENTALS HERE
-                            if check_entry_signal(robot_key, row, prev_row, fundamentals):
-                                entry_price = current_close
-                                target = entry_price * (1 + (0.05 * robot_cfg['risk_reward']))
-                                stop = entry_price * 0.95
-                                
-                                active_trade = {
-                                    "id": f"{len(all_trades)+1}",
-                                    "bot_id": robot_key,
-                                    "market": market_name,
-                                    "symbol": symbol,
-                                    "entry_date": current_date_str,
-                                    "entry_price": round(entry_price, 2),
-                                    "take_profit": round(target, 2),
-                                    "stop_loss": round(stop, 2),
-                                    "status": "open",
-                                    "entry_indicators": {
-                                        "rsi": {"value": round(float(row.get('RSI', 50)), 1)},
-                                        "sma": {"sma_50": round(float(row.get('SMA_50', 0)), 2)},
-                                        "volume": {"change_pct": 120}
-                                    }
-                                }
+                        all_trades.append(active_trade)
+                        active_trade = None
                         
-                        else:
-                           days_held = (datetime.strptime(current_date_str, "%Y-%m-%d") - datetime.strptime(active_trade['entry_date'], "%Y-%m-%d")).days
-                           is_profit = current_close >= active_trade['take_profit']
-                           is_loss = current_close <= active_trade['stop_loss']
-                           is_timeout = days_held > 14
-                           
-                           if is_profit or is_loss or is_timeout:
-                               active_trade['exit_date'] = current_date_str
-                               active_trade['exit_price'] = round(current_close, 2)
-                               active_trade['status'] = "closed"
-                               
-                               profit_amount = current_close - active_trade['entry_price']
-                               profit_pct = (profit_amount / active_trade['entry_price']) * 100
-                               active_trade['profit_pct'] = round(profit_pct, 2)
-                               
-                               all_trades.append(active_trade)
-                               active_trade = None 
+                        # لا دخول جديد في يوم الخروج نفسه
+                        i = exit_idx + 1
                     
                     if active_trade:
-                         current_close = float(rows[-1]['Close'])
+                         current_close = float(closes[-1])
                          profit_amount = current_close - active_trade['entry_price']
                          profit_pct = (profit_amount / active_trade['entry_price']) * 100
                          active_trade['current_price'] = round(current_close, 2)
@@ -475,6 +631,8 @@ def run_universal_simulation():
         json.dump(all_trades, f, indent=4, ensure_ascii=False)
         
     print(f"✅ Success! Generated {len(all_trades)} real trades.")
+    print("⏱️ Data acquisition: " + " | ".join(
+        f"{source}: {entry['wall_ms']:.0f}ms" for source, entry in timings.to_dict()["phases"].items()))
 
     # --- GENERATE NOTIFICATIONS (NEW) ---
     print("🔔 Generating Notifications for Today's Moves...")
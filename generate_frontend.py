@@ -28,8 +28,26 @@ def generate_frontend_data():
             # The 'run' method runs until NOW.
             # We want to access internal state after run.
             
+            # Resume from yesterday's checkpoint (only new days are simulated),
+            # falling back to a full run if the checkpoint is missing or stale
+            checkpoint_path = f"data/checkpoint_{market}.json"
+            resumed = False
+            if os.path.exists(checkpoint_path):
+                try:
+                    with open(checkpoint_path, "r", encoding='utf-8') as f:
+                        engine.resume(json.load(f))
+                    resumed = True
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"   ⚠️ نقطة الحفظ غير صالحة ({e}) - إعادة المحاكاة كاملة")
+                    engine = BacktestEngine(start_date, initial_capital, market)
+            
             # Run the engine
-            engine.run()
+            if not resumed:
+                engine.run()
+            
+            os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+            with open(checkpoint_path, "w", encoding='utf-8') as f:
+                json.dump(engine.last_checkpoint, f, ensure_ascii=False)
             
             # 2. Extract CLOSED Trades
             print(f"   📥 استخراج الصفقات المغلقة ({market})...")
@@ -67,8 +85,8 @@ def generate_frontend_data():
                         "result": t.result,
                         "reason_ar": t.reason_ar,
                         "exit_reason": t.exit_reason_ar,
-                        "entry_indicators": t.entry_indicators,
-                        "exit_indicators": t.exit_indicators,
+                        "entry_indicators": engine.entry_indicators(t),
+                        "exit_indicators": engine.exit_indicators(t),
                         # Fallback values for UI consistency
                         "current_price": round(t.exit_price, 2), 
                         "take_profit": round(t.entry_price * 1.05, 2),
@@ -99,7 +117,7 @@ def generate_frontend_data():
                         "stop_loss": round(pos.stop_loss, 2),
                         "status": "open",
                         "reason_ar": pos.reason_ar,
-                        "entry_indicators": pos.entry_indicators
+                        "entry_indicators": engine.entry_indicators(pos)
                     })
                     
         except Exception as e:
@@ -10,9 +10,12 @@ import requests
 import json
 import time
 import os
+from collections import defaultdict
 from datetime import datetime
 from bs4 import BeautifulSoup
 
+from streaming_indicators import SymbolIndicators
+
 # === إعدادات ===
 SCAN_INTERVAL = 30
 HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
@@ -135,7 +138,7 @@ WATCHLIST = {
 }
 
 # === متغيرات التتبع ===
-price_history = {}
+indicators = defaultdict(SymbolIndicators)  # {symbol: SymbolIndicators}
 active_trades = {}  # الصفقات المفتوحة
 all_trades = []     # كل الصفقات
 trade_counter = 1000
@@ -179,26 +182,7 @@ def scrape_google_price(symbol):
     return None
 
 
-def calculate_rsi(prices, period=14):
-    """حساب RSI"""
-    if len(prices) < period + 1:
-        return 50
-    
-    deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-    gains = [d if d > 0 else 0 for d in deltas[-period:]]
-    losses = [-d if d < 0 else 0 for d in deltas[-period:]]
-    
-    avg_gain = sum(gains) / period
-    avg_loss = sum(losses) / period
-    
-    if avg_loss == 0:
-        return 100
-    
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
-
-
-def check_robot_signals(symbol, data, history):
+def check_robot_signals(symbol, data, state):
     """فحص إشارات الروبوتات"""
     
     signals = []
@@ -210,7 +194,7 @@ def check_robot_signals(symbol, data, history):
     if not price:
         return []
     
-    rsi = calculate_rsi(history) if len(history) > 14 else 50
+    rsi = state.rsi_or(50)
     
     # === القناص - RSI منخفض ===
     if rsi < 30:
@@ -242,8 +226,8 @@ def check_robot_signals(symbol, data, history):
             })
     
     # === المايسترو - زخم صاعد ===
-    if len(history) >= 5:
-        trend = (history[-1] - history[-5]) / history[-5] * 100
+    trend = state.momentum_pct()
+    if trend is not None:
         if trend > 2 and change > 0:
             signals.append({
                 "bot_id": "al_maestro",
@@ -373,13 +357,10 @@ def run_engine():
                 if data:
                     current_prices[stock["symbol"]] = data['price']
                     
-                    if stock["symbol"] not in price_history:
-                        price_history[stock["symbol"]] = []
-                    price_history[stock["symbol"]].append(data['price'])
-                    price_history[stock["symbol"]] = price_history[stock["symbol"]][-100:]
+                    state = indicators[stock["symbol"]].update(data['price'])
                     
                     # فحص الإشارات
-                    signals = check_robot_signals(stock["symbol"], data, price_history[stock["symbol"]])
+                    signals = check_robot_signals(stock["symbol"], data, state)
                     
                     for signal in signals:
                         # تجنب فتح صفقة مكررة
@@ -396,13 +377,10 @@ def run_engine():
                 if price:
                     current_prices[stock["symbol"]] = price
                     
-                    if stock["symbol"] not in price_history:
-                        price_history[stock["symbol"]] = []
-                    price_history[stock["symbol"]].append(price)
-                    price_history[stock["symbol"]] = price_history[stock["symbol"]][-100:]
+                    state = indicators[stock["symbol"]].update(price)
                     
                     data = {"price": price, "change_24h": 0, "low_24h": price, "high_24h": price}
-                    signals = check_robot_signals(stock["symbol"], data, price_history[stock["symbol"]])
+                    signals = check_robot_signals(stock["symbol"], data, state)
                     
                     for signal in signals:
                         existing = [t for t in active_trades.values() 
@@ -418,13 +396,10 @@ def run_engine():
                 if price:
                     current_prices[stock["symbol"]] = price
                     
-                    if stock["symbol"] not in price_history:
-                        price_history[stock["symbol"]] = []
-                    price_history[stock["symbol"]].append(price)
-                    price_history[stock["symbol"]] = price_history[stock["symbol"]][-100:]
+                    state = indicators[stock["symbol"]].update(price)
                     
                     data = {"price": price, "change_24h": 0, "low_24h": price, "high_24h": price}
-                    signals = check_robot_signals(stock["symbol"], data, price_history[stock["symbol"]])
+                    signals = check_robot_signals(stock["symbol"], data, state)
                     
                     for signal in signals:
                         existing = [t for t in active_trades.values() 
@@ -9,12 +9,15 @@
 import os
 import json
 import time
+from collections import defaultdict
 from datetime import datetime
 from dotenv import load_dotenv
 from binance.client import Client
 from binance.enums import *
 from binance.exceptions import BinanceAPIException
 
+from streaming_indicators import SymbolIndicators
+
 # تحميل الإعدادات
 load_dotenv()
 
@@ -93,7 +96,7 @@ WATCHLIST = [
 active_trades = {}
 closed_trades = []
 daily_loss = 0
-price_history = {}
+indicators = defaultdict(SymbolIndicators)  # {symbol: SymbolIndicators}
 
 
 # === وظائف Binance ===
@@ -134,25 +137,14 @@ def get_24h_data(symbol):
         return None
 
 
-def calculate_rsi(prices, period=14):
-    """حساب RSI"""
-    if len(prices) < period + 1:
-        return 50
-    
-    deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-    gains = [d if d > 0 else 0 for d in deltas[-period:]]
-    losses = [-d if d < 0 else 0 for d in deltas[-period:]]
-    
-    avg_gain = sum(gains) / period
-    avg_loss = sum(losses) / period
+def check_signals(symbol, data, state):
+    """فحص إشارات الروبوتات"""
+    signals = []
+    price = data['price']
+    change = data['change_24h']
     
-    if avg_loss == 0:
-        return 100
+    rsi = state.rsi_or(50)
     
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
-
-
     # القناص - RSI منخفض (اقتناص الارتدادات)
     if rsi < 30:
         signals.append({
@@ -163,9 +155,9 @@ def calculate_rsi(prices, period=14):
     
     # ملك الكريبتو - ترند قوي وزخم عنيف
     if change > 3.0: # ارتفاع أكثر من 3% في 24 ساعة
-        if len(history) >= 5:
-            # التأكد أن الاتجاه العام صاعد في آخر فترة
-            trend = (history[-1] - history[-5]) / history[-5] * 100
+        # التأكد أن الاتجاه العام صاعد في آخر فترة
+        trend = state.momentum_pct()
+        if trend is not None:
             if trend > 1.0:
                 signals.append({
                     'bot_id': 'crypto_king',
@@ -544,14 +536,11 @@ def run_engine():
                     if not data:
                         continue
                     
-                    # تحديث التاريخ
-                    if symbol not in price_history:
-                        price_history[symbol] = []
-                    price_history[symbol].append(data['price'])
-                    price_history[symbol] = price_history[symbol][-100:]
+                    # تحديث المؤشرات التزايدية
+                    state = indicators[symbol].update(data['price'])
                     
                     # فحص الإشارات
-                    signals = check_signals(symbol, data, price_history[symbol])
+                    signals = check_signals(symbol, data, state)
                     
                     for signal in signals:
                         # تجنب التكرار
@@ -10,9 +10,12 @@ import requests
 import json
 import time
 import os
+from collections import defaultdict
 from datetime import datetime
 from bs4 import BeautifulSoup
 
+from streaming_indicators import SymbolIndicators
+
 # === إعدادات ===
 SCAN_INTERVAL = 30  # ثانية
 HEADERS = {
@@ -43,7 +46,7 @@ WATCHLIST = {
 }
 
 # === بيانات المتابعة ===
-price_history = {}  # {symbol: [prices]}
+indicators = defaultdict(SymbolIndicators)  # {symbol: SymbolIndicators}
 alerts_sent = set()  # تجنب تكرار الإشعارات
 
 
@@ -85,27 +88,7 @@ def scrape_google_price(symbol):
     return None
 
 
-def calculate_rsi(prices, period=14):
-    """حساب RSI"""
-    if len(prices) < period + 1:
-        return 50  # Default
-    
-    deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-    gains = [d if d > 0 else 0 for d in deltas[-period:]]
-    losses = [-d if d < 0 else 0 for d in deltas[-period:]]
-    
-    avg_gain = sum(gains) / period
-    avg_loss = sum(losses) / period
-    
-    if avg_loss == 0:
-        return 100
-    
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-
-def detect_opportunity(symbol, data, history):
+def detect_opportunity(symbol, data, state):
     """كشف فرصة تداول"""
     
     opportunities = []
@@ -119,7 +102,7 @@ def detect_opportunity(symbol, data, history):
         return []
     
     # حساب RSI
-    rsi = calculate_rsi(history) if len(history) > 14 else 50
+    rsi = state.rsi_or(50)
     
     # === استراتيجيات الكشف ===
     
@@ -167,8 +150,8 @@ def detect_opportunity(symbol, data, history):
         })
     
     # 5. Momentum (المايسترو) - صعود قوي مستمر
-    if len(history) >= 5:
-        recent_trend = (history[-1] - history[-5]) / history[-5] * 100
+    recent_trend = state.momentum_pct()
+    if recent_trend is not None:
         if recent_trend > 2 and change > 0:
             opportunities.append({
                 "bot": "al_maestro",
@@ -241,13 +224,10 @@ def scan_markets():
         data = get_binance_24h(stock["symbol"])
         if data:
             # تحديث التاريخ
-            if stock["symbol"] not in price_history:
-                price_history[stock["symbol"]] = []
-            price_history[stock["symbol"]].append(data['price'])
-            price_history[stock["symbol"]] = price_history[stock["symbol"]][-100:]
+            state = indicators[stock["symbol"]].update(data['price'])
             
             # كشف الفرص
-            opps = detect_opportunity(stock["symbol"], data, price_history[stock["symbol"]])
+            opps = detect_opportunity(stock["symbol"], data, state)
             
             for opp in opps:
                 if save_opportunity(opp, stock, "crypto", data['price']):
@@ -263,13 +243,10 @@ def scan_markets():
     for stock in WATCHLIST["saudi"]:
         price = scrape_google_price(stock["symbol"])
         if price:
-            if stock["symbol"] not in price_history:
-                price_history[stock["symbol"]] = []
-            price_history[stock["symbol"]].append(price)
-            price_history[stock["symbol"]] = price_history[stock["symbol"]][-100:]
+            state = indicators[stock["symbol"]].update(price)
             
             data = {"price": price, "change_24h": 0}
-            opps = detect_opportunity(stock["symbol"], data, price_history[stock["symbol"]])
+            opps = detect_opportunity(stock["symbol"], data, state)
             
             for opp in opps:
                 if save_opportunity(opp, stock, "saudi", price):
@@ -285,13 +262,10 @@ def scan_markets():
     for stock in WATCHLIST["us"]:
         price = scrape_google_price(stock["symbol"])
         if price:
-            if stock["symbol"] not in price_history:
-                price_history[stock["symbol"]] = []
-            price_history[stock["symbol"]].append(price)
-            price_history[stock["symbol"]] = price_history[stock["symbol"]][-100:]
+            state = indicators[stock["symbol"]].update(price)
             
             data = {"price": price, "change_24h": 0}
-            opps = detect_opportunity(stock["symbol"], data, price_history[stock["symbol"]])
+            opps = detect_opportunity(stock["symbol"], data, state)
             
             for opp in opps:
                 if save_opportunity(opp, stock, "us", price):
@@ -0,0 +1,199 @@
+"""
+📈 TIPR Streaming Indicators
+============================
+مؤشرات فنية تزايدية مشتركة بين المحركات الحية
+(live_robot_engine, opportunity_detector, live_trading_engine)
+
+كل update(price) بتكلفة O(1) وذاكرة ثابتة لكل رمز، بدلاً من إعادة حساب
+المؤشر من كامل قائمة الأسعار في كل فحص.
+"""
+
+from collections import deque
+import math
+
+
+class EMA:
+    """متوسط متحرك أسي يبدأ بـ SMA لأول period سعر"""
+
+    def __init__(self, period):
+        self.period = period
+        self.multiplier = 2 / (period + 1)
+        self.value = None
+        self._count = 0
+        self._seed_sum = 0.0
+
+    def update(self, price):
+        if self.value is None:
+            self._count += 1
+            self._seed_sum += price
+            if self._count == self.period:
+                self.value = self._seed_sum / self.period
+            return self.value
+
+        self.value = (price * self.multiplier) + (self.value * (1 - self.multiplier))
+        return self.value
+
+
+class WilderRSI:
+    """مؤشر القوة النسبية بتنعيم Wilder (متوسط أول period تغير ثم تنعيم تكراري)"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.value = None
+        self._prev_price = None
+        self._count = 0
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+
+    def update(self, price):
+        if self._prev_price is None:
+            self._prev_price = price
+            return None
+
+        change = price - self._prev_price
+        self._prev_price = price
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+
+        if self._count < self.period:
+            # مرحلة التهيئة: متوسط بسيط لأول period تغير
+            self._count += 1
+            self._avg_gain += gain / self.period
+            self._avg_loss += loss / self.period
+            if self._count < self.period:
+                return None
+        else:
+            self._avg_gain = (self._avg_gain * (self.period - 1) + gain) / self.period
+            self._avg_loss = (self._avg_loss * (self.period - 1) + loss) / self.period
+
+        if self._avg_loss == 0:
+            self.value = 100.0
+        else:
+            rs = self._avg_gain / self._avg_loss
+            self.value = 100 - (100 / (1 + rs))
+        return self.value
+
+
+class RollingStats:
+    """SMA ونطاقات بولينجر على نافذة متحركة بمجاميع جارية"""
+
+    # إعادة حساب المجاميع من النافذة كل عدد من التحديثات لمنع تراكم خطأ الفاصلة العائمة
+    RESYNC_EVERY = 1000
+
+    def __init__(self, period=20, std_dev=2):
+        self.period = period
+        self.std_dev = std_dev
+        self._window = deque(maxlen=period)
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._updates = 0
+
+    def update(self, price):
+        if len(self._window) == self.period:
+            oldest = self._window[0]
+            self._sum -= oldest
+            self._sum_sq -= oldest * oldest
+        self._window.append(price)
+        self._sum += price
+        self._sum_sq += price * price
+
+        self._updates += 1
+        if self._updates % self.RESYNC_EVERY == 0:
+            self._sum = math.fsum(self._window)
+            self._sum_sq = math.fsum(p * p for p in self._window)
+
+        return self.sma
+
+    @property
+    def ready(self):
+        return len(self._window) == self.period
+
+    @property
+    def sma(self):
+        if not self.ready:
+            return None
+        return self._sum / self.period
+
+    @property
+    def std(self):
+        if not self.ready:
+            return None
+        mean = self._sum / self.period
+        return math.sqrt(max(self._sum_sq / self.period - mean * mean, 0.0))
+
+    @property
+    def upper(self):
+        if not self.ready:
+            return None
+        return self.sma + self.std_dev * self.std
+
+    @property
+    def lower(self):
+        if not self.ready:
+            return None
+        return self.sma - self.std_dev * self.std
+
+
+class RollingHighLow:
+    """أعلى وأدنى سعر في آخر period تحديث (طوابير رتيبة، O(1) مطفأ)"""
+
+    def __init__(self, period):
+        self.period = period
+        self._index = 0
+        self._highs = deque()  # (index, price) بأسعار تنازلية
+        self._lows = deque()   # (index, price) بأسعار تصاعدية
+
+    def update(self, price):
+        while self._highs and self._highs[-1][1] <= price:
+            self._highs.pop()
+        self._highs.append((self._index, price))
+        while self._lows and self._lows[-1][1] >= price:
+            self._lows.pop()
+        self._lows.append((self._index, price))
+
+        expired = self._index - self.period
+        if self._highs[0][0] <= expired:
+            self._highs.popleft()
+        if self._lows[0][0] <= expired:
+            self._lows.popleft()
+
+        self._index += 1
+        return self.high, self.low
+
+    @property
+    def high(self):
+        return self._highs[0][1] if self._highs else None
+
+    @property
+    def low(self):
+        return self._lows[0][1] if self._lows else None
+
+
+class SymbolIndicators:
+    """
+    حالة المؤشرات التزايدية لرمز واحد في المحرك الحي
+
+    تحمل فقط ما تقرأه المحركات في كل فحص (RSI ونافذة الزخم)؛ RollingStats و
+    RollingHighLow تُضاف هنا عندما يحتاج محرك بولينجر أو نطاق الأسعار
+    """
+
+    def __init__(self, rsi_period=14, momentum_lookback=5):
+        self.rsi = WilderRSI(rsi_period)
+        self._recent = deque(maxlen=momentum_lookback)
+        self.last_price = None
+
+    def update(self, price):
+        self.last_price = price
+        self.rsi.update(price)
+        self._recent.append(price)
+        return self
+
+    def rsi_or(self, default=50):
+        """قيمة RSI أو قيمة افتراضية قبل اكتمال البيانات"""
+        return self.rsi.value if self.rsi.value is not None else default
+
+    def momentum_pct(self):
+        """نسبة التغير بين أقدم وأحدث سعر في نافذة الزخم (None قبل امتلائها)"""
+        if len(self._recent) < self._recent.maxlen:
+            return None
+        return (self._recent[-1] - self._recent[0]) / self._recent[0] * 100
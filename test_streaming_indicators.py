@@ -0,0 +1,154 @@
+"""
+Compare the incremental indicators in streaming_indicators.py with direct
+recomputation over the same window (run from the project root:
+python test_streaming_indicators.py)
+"""
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streaming_indicators import EMA, WilderRSI, RollingStats, RollingHighLow, SymbolIndicators
+
+
+def random_walk(n, seed, start=100.0):
+    rng = random.Random(seed)
+    prices, price = [], start
+    for _ in range(n):
+        price *= 1 + rng.gauss(0, 0.02)
+        prices.append(price)
+    return prices
+
+
+def window_stats(window):
+    """SMA والانحراف المعياري من النافذة مباشرة (مروران)"""
+    mean = math.fsum(window) / len(window)
+    return mean, math.sqrt(math.fsum((p - mean) ** 2 for p in window) / len(window))
+
+
+def test_ema_matches_full_recomputation():
+    prices = random_walk(300, 1)
+    ema = EMA(12)
+    for i, price in enumerate(prices):
+        value = ema.update(price)
+        if i < 11:
+            assert value is None
+            continue
+        expected = sum(prices[:12]) / 12
+        for p in prices[12:i + 1]:
+            expected = (p * ema.multiplier) + (expected * (1 - ema.multiplier))
+        assert abs(value - expected) < 1e-9
+
+
+def test_wilder_rsi_matches_full_recomputation():
+    prices = random_walk(300, 2)
+    rsi = WilderRSI(14)
+    changes = [b - a for a, b in zip(prices, prices[1:])]
+    for i, price in enumerate(prices):
+        value = rsi.update(price)
+        if i < 14:
+            assert value is None
+            continue
+        avg_gain = sum(max(c, 0.0) for c in changes[:14]) / 14
+        avg_loss = sum(max(-c, 0.0) for c in changes[:14]) / 14
+        for c in changes[14:i]:
+            avg_gain = (avg_gain * 13 + max(c, 0.0)) / 14
+            avg_loss = (avg_loss * 13 + max(-c, 0.0)) / 14
+        expected = 100.0 if avg_loss == 0 else 100 - (100 / (1 + avg_gain / avg_loss))
+        assert abs(value - expected) < 1e-9
+
+    # بلا خسائر: RSI = 100
+    flat = WilderRSI(3)
+    for price in (1.0, 2.0, 3.0, 4.0, 5.0):
+        flat.update(price)
+    assert flat.value == 100.0
+
+
+def test_rolling_stats_match_window():
+    prices = random_walk(2500, 3)
+    stats = RollingStats(20, 2)
+    for i, price in enumerate(prices):
+        assert stats.update(price) == stats.sma
+        if i < 19:
+            assert not stats.ready and stats.sma is None and stats.upper is None
+            continue
+        mean, std = window_stats(prices[i - 19:i + 1])
+        assert abs(stats.sma - mean) < 1e-9
+        assert abs(stats.std - std) < 1e-6
+        assert abs(stats.upper - (mean + 2 * std)) < 1e-6
+        assert abs(stats.lower - (mean - 2 * std)) < 1e-6
+
+
+def test_rolling_stats_resync_clears_drift():
+    stats = RollingStats(20, 2)
+    period, resync = stats.period, stats.RESYNC_EVERY
+    # أسعار ضخمة ثم صغيرة: الطرح من المجموع الجاري يترك بقايا من الأسعار القديمة
+    large = [1e12 + 0.37 * i for i in range(resync - period)]
+    small = [1.0 + 0.01 * i for i in range(period)]
+    for price in large + small[:-1]:
+        stats.update(price)
+
+    exact_mean, exact_std = window_stats(small)
+    assert stats._updates == resync - 1
+    stats.update(small[-1])
+
+    # التحديث رقم RESYNC_EVERY يعيد المجاميع من النافذة نفسها
+    assert list(stats._window) == small
+    assert stats._sum == math.fsum(small)
+    assert stats._sum_sq == math.fsum(p * p for p in small)
+    assert abs(stats.sma - exact_mean) < 1e-12
+    assert abs(stats.std - exact_std) < 1e-6
+
+    # بدون إعادة المزامنة يبقى الخطأ ظاهراً في المتوسط
+    drifting = RollingStats(20, 2)
+    drifting.RESYNC_EVERY = 10 ** 9
+    for price in large + small:
+        drifting.update(price)
+    assert abs(drifting.sma - exact_mean) > 1e-6
+
+
+def test_rolling_high_low_match_window():
+    rng = random.Random(4)
+    for period in (1, 2, 5, 20):
+        tracker = RollingHighLow(period)
+        # أسعار متكررة كثيراً لاختبار التساوي عند الإخراج من الطوابير
+        prices = [float(rng.randint(90, 110)) for _ in range(1000)]
+        for i, price in enumerate(prices):
+            window = prices[max(0, i - period + 1):i + 1]
+            assert tracker.update(price) == (max(window), min(window))
+            assert len(tracker._highs) <= period and len(tracker._lows) <= period
+            assert all(i - idx < period for idx, _ in tracker._highs)
+
+
+def test_rolling_high_low_evicts_expired_extremes():
+    tracker = RollingHighLow(3)
+    assert (tracker.high, tracker.low) == (None, None)
+    # سلسلة هابطة: القمة تخرج من النافذة بانتهاء عمرها لا بسعر أعلى
+    for price, expected in ((10.0, 10.0), (9.0, 10.0), (8.0, 10.0), (7.0, 9.0), (6.0, 8.0)):
+        assert tracker.update(price)[0] == expected
+    assert len(tracker._highs) == 3
+    # سلسلة صاعدة: القاع يخرج بنفس الطريقة
+    tracker = RollingHighLow(3)
+    for price, expected in ((1.0, 1.0), (2.0, 1.0), (3.0, 1.0), (4.0, 2.0), (5.0, 3.0)):
+        assert tracker.update(price)[1] == expected
+    assert len(tracker._highs) == 1
+
+
+def test_symbol_indicators_momentum():
+    state = SymbolIndicators(rsi_period=14, momentum_lookback=5)
+    assert state.rsi_or() == 50
+    for price in (100.0, 101.0, 102.0, 103.0):
+        state.update(price)
+        assert state.momentum_pct() is None
+    state.update(110.0)
+    assert state.last_price == 110.0
+    assert abs(state.momentum_pct() - 10.0) < 1e-12
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            test()
+            print(f"✅ {name}")